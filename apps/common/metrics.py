@@ -0,0 +1,100 @@
+"""
+Prometheus metrics of the API, recorded per URL name by ``apps.common.middleware.MetricsMiddleware``.
+
+Every gunicorn worker is a separate process. When ``PROMETHEUS_MULTIPROC_DIR`` is set, prometheus_client keeps the
+values of every process in memory-mapped files of that directory and ``metrics_view`` aggregates all of them; the
+directory must be emptied before the server starts, see ``core/gunicorn.py``. Without it the values of the current
+process are exposed.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+
+class RequestMetrics:
+    """
+    Measurements of a request, see MetricsMiddleware.
+    """
+
+    __slots__ = ("request", "started_at", "queries", "query_seconds")
+
+    def __init__(self, request):
+        self.request = request
+        self.started_at = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    @property
+    def view(self) -> str:
+        # Set once the URL is resolved
+        resolver_match = getattr(self.request, "resolver_match", None)
+        return resolver_match.view_name if resolver_match is not None else ""
+
+
+# The request being handled, metrics recorded outside of requests (e.g. in Celery tasks) have no view
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latency of requests until the response is returned by the view.",
+    ["view", "method", "status"],
+)
+SQL_QUERIES = Counter("http_request_sql_queries", "SQL queries made by requests.", ["view"])
+SQL_DURATION = Counter("http_request_sql_duration_seconds", "Time spent in SQL queries by requests.", ["view"])
+ALLOCATION_DURATION = Histogram(
+    "warehouse_allocation_duration_seconds",
+    "Duration of material allocation of orders (calculate_materials and the planner).",
+    ["view"],
+)
+
+
+@contextmanager
+def measure_allocation():
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_request.get()
+        ALLOCATION_DURATION.labels(metrics.view if metrics is not None else "").observe(
+            time.perf_counter() - started_at
+        )
+
+
+def count_query(execute, sql, params, many, context):
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.query_seconds += time.perf_counter() - started_at
+
+
+def install_query_counter(connection, **kwargs):
+    """
+    Makes the connection count its queries into the current request, also a ``connection_created`` receiver.
+    """
+    if count_query not in connection.execute_wrappers:
+        # The outermost wrapper, so wrappers added and removed by ``execute_wrapper()`` blocks are not affected
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def metrics_view(request):
+    """
+    All metrics in the Prometheus text format.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
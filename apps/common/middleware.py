@@ -0,0 +1,118 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from apps.common.metrics import (REQUEST_LATENCY, SQL_DURATION, SQL_QUERIES,
+                                 RequestMetrics, current_request,
+                                 install_query_counter)
+from apps.common.routers import PRIMARY_COOKIE_NAME, replica_alias
+
+# Requests with these methods do not write
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class MetricsMiddleware:
+    """
+    Records latency, the number of SQL queries and the time spent in them per URL name, see ``apps.common.metrics``.
+    With ``METRICS_ENABLED`` off the middleware removes itself and costs nothing.
+
+    Queries are counted by an execute wrapper of every database connection, which adds a single function call per
+    query. Async views query from threads of their own, so every new connection gets the wrapper as well. Streaming
+    responses are measured until the view returns, the queries made while streaming are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_counter)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before the middleware was loaded
+        for alias in connections:
+            install_query_counter(connection=connections[alias])
+        metrics = RequestMetrics(request)
+        token = current_request.set(metrics)
+        response = self.get_response(request)
+        current_request.reset(token)
+        return self.record(metrics, response)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(request)
+        token = current_request.set(metrics)
+        response = await self.get_response(request)
+        current_request.reset(token)
+        return self.record(metrics, response)
+
+    def record(self, metrics, response):
+        # Unresolved URLs share a single label, so scanners can not create new series
+        view = metrics.view or "<unresolved>"
+        REQUEST_LATENCY.labels(view, metrics.request.method, response.status_code).observe(
+            time.perf_counter() - metrics.started_at
+        )
+        SQL_QUERIES.labels(view).inc(metrics.queries)
+        SQL_DURATION.labels(view).inc(metrics.query_seconds)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Serves the reads of requests with a safe method from a random read replica, see ``apps.common.routers``. Without
+    ``DATABASE_REPLICAS`` the middleware removes itself and costs nothing.
+
+    Replicas lag behind the primary, so a client which has just written must not read from them: responses to
+    requests with other methods set a cookie for ``DATABASE_REPLICA_PIN_SECONDS`` and the client reads from the
+    primary while it sends the cookie back.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replica_alias.set(self.get_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_alias.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = replica_alias.set(self.get_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_alias.reset(token)
+        return self.pin(request, response)
+
+    def get_alias(self, request):
+        if request.method not in SAFE_METHODS or PRIMARY_COOKIE_NAME in request.COOKIES:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PRIMARY_COOKIE_NAME, "1", max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,196 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, LimitOffsetPagination,
+                                       _positive_int)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class Cursor(NamedTuple):
+    created_at: str
+    id: int
+    # The page before the position instead of the page after it
+    reverse: bool
+
+
+def estimate_count(queryset) -> int:
+    """
+    Number of rows of the queryset as estimated by the PostgreSQL planner from the table statistics, no rows are read.
+    Other databases have no such statistics and count the rows.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def aestimate_count(queryset) -> int:
+    if connections[queryset.db].vendor != "postgresql":
+        return await queryset.acount()
+    plan = json.loads(await queryset.order_by().aexplain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pages of rows ordered by (created_at, id) which start right after (or before) the position of an opaque cursor.
+    The position is looked up with an index range scan, so every page costs the same however deep it is, and the
+    total number of rows is not counted. ``approximate_count=true`` adds the planner estimate of the total.
+    Models paginated this way need an index on (created_at, id), after the filtered columns if any.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    count_query_param = "approximate_count"
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare_page(queryset, request)
+        if request.query_params.get(self.count_query_param) in ("true", "1"):
+            self.count = estimate_count(queryset)
+        # One more row tells whether there is a page after this one
+        return self.set_page(list(page_queryset[: self.limit + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare_page(queryset, request)
+        if request.query_params.get(self.count_query_param) in ("true", "1"):
+            self.count = await aestimate_count(queryset)
+        return self.set_page([row async for row in page_queryset[: self.limit + 1]])
+
+    def prepare_page(self, queryset, request):
+        """
+        The queryset ordered and filtered to start at the position of the cursor.
+        """
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), LimitOffsetPagination.offset_query_param)
+        self.limit = self.get_limit(request)
+        self.cursor = self.decode_cursor(request)
+        self.count = None
+
+        cursor = self.cursor
+        if cursor is None:
+            return queryset.order_by("created_at", "id")
+        if cursor.reverse:
+            return queryset.filter(
+                Q(created_at__lt=cursor.created_at) | Q(created_at=cursor.created_at, id__lt=cursor.id),
+                created_at__lte=cursor.created_at,
+            ).order_by("-created_at", "-id")
+        return queryset.filter(
+            Q(created_at__gt=cursor.created_at) | Q(created_at=cursor.created_at, id__gt=cursor.id),
+            created_at__gte=cursor.created_at,
+        ).order_by("created_at", "id")
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.limit
+        self.page = rows[: self.limit]
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        fields = [("next", self.get_next_link()), ("previous", self.get_previous_link()), ("results", data)]
+        if self.count is not None:
+            fields.insert(0, ("count", self.count))
+        return Response(OrderedDict(fields))
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(request.query_params[self.limit_query_param], strict=True, cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        # Rows are model instances or dicts of .values() querysets
+        created_at, pk = (row["created_at"], row["id"]) if isinstance(row, dict) else (row.created_at, row.id)
+        position = json.dumps([created_at.isoformat(), pk, reverse], separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(position.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request) -> Optional[Cursor]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if parse_datetime(created_at) is None or not isinstance(pk, int) or not isinstance(reverse, bool):
+                raise ValueError
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(created_at, pk, reverse)
+
+
+class AsyncLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination which also pages with the async ORM, see ``apps.common.views.AsyncAPIViewMixin``.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        if self.count == 0 or self.offset > self.count:
+            return []
+        end = self.offset + self.limit
+        return [row async for row in queryset[self.offset : end]]  # noqa: E203
+
+
+class OptionalKeysetPagination(AsyncLimitOffsetPagination):
+    """
+    Limit/offset pagination by default. Clients opt in to keyset pagination per request with ``pagination=keyset``
+    or by following a cursor link, see KeysetPagination.
+    """
+
+    mode_query_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination()
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def use_keyset(self, request) -> bool:
+        return request.query_params.get(self.mode_query_param) == "keyset" or (
+            KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,40 @@
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline-delimited JSON. The body is not read at once: ``request.data`` is a lazy iterator of
+    (line number, raw line) pairs over the request stream, blank lines are skipped. Lines are decoded by the view,
+    so a malformed line can be reported on its own instead of failing the whole upload.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return ((line_number, line) for line_number, line in enumerate(stream or (), start=1) if line.strip())
+
+
+class CSVParser(BaseParser):
+    """
+    CSV with a header row. Like ``NDJSONParser`` the body is read lazily: ``request.data`` is an iterator of
+    (line number, row) pairs, where a row maps the column names to the values of its non-empty cells.
+    """
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        return self.read_rows(stream or (), encoding)
+
+    def read_rows(self, stream, encoding):
+        try:
+            reader = csv.DictReader(line.decode(encoding) for line in stream)
+            for row in reader:
+                # Empty cells are missing values, columns without a header are ignored
+                yield reader.line_num, {key: value for key, value in row.items() if key is not None and value}
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f"CSV parse error - {exc}")
@@ -0,0 +1,53 @@
+"""
+Routing of reads to the read replicas (``DATABASE_REPLICAS``, configured with ``DB_REPLICA_URLS``).
+
+Reads go to a replica only while ``replica_alias`` is set, which ``apps.common.middleware.ReplicaMiddleware`` does
+for requests with a safe method. Everything else reads from the primary: writes, requests which write, Celery tasks,
+management commands and the code wrapped into ``use_primary``. Writes always go to the primary, also for instances
+which were read from a replica.
+
+Replicas are not migrated, their schema comes from the primary by replication. To try the routing locally with
+SQLite, copy the database file of the primary and point ``DB_REPLICA_URLS`` at the copy.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# The replica which serves the reads of the current request, None reads from the primary
+replica_alias: ContextVar[Optional[str]] = ContextVar("replica_alias", default=None)
+
+# Set on the responses of requests which write, the client reads from the primary until it expires
+PRIMARY_COOKIE_NAME = "db_primary"
+
+
+@contextmanager
+def use_primary():
+    """
+    Reads from the primary inside the block, e.g. to lock or allocate what was just read.
+    """
+    token = replica_alias.set(None)
+    try:
+        yield
+    finally:
+        replica_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replica_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,69 @@
+from typing import Dict, Iterable, List, Tuple
+
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer of the rows of ``.values()`` querysets into plain dicts, without DRF field instances.
+
+    ``fields`` maps output keys to lookups of the queryset. The output must be the same as the one of the DRF
+    serializer it replaces, which is kept as the ``serializer_class`` of the view for the schema and the browsable
+    API. Rows also carry ``extra_lookups`` which are not in the output, e.g. the position used by keyset pagination.
+    """
+
+    fields: Dict[str, str] = {}
+    extra_lookups: Tuple[str, ...] = ("id", "created_at")
+
+    @classmethod
+    def values(cls, queryset):
+        # Related fields are joined by the lookups, prefetches of the view are not needed
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*cls.fields.values(), *cls.extra_lookups]))
+
+    @classmethod
+    def to_representation(cls, row: dict) -> dict:
+        return {key: row[lookup] for key, lookup in cls.fields.items()}
+
+    @classmethod
+    def serialize(cls, rows: Iterable[dict]) -> List[dict]:
+        return [cls.to_representation(row) for row in rows]
+
+    @classmethod
+    async def aserialize(cls, rows: Iterable[dict]) -> List[dict]:
+        """
+        ``serialize`` for async views, serializers which query more rows override it with the async ORM.
+        """
+        return cls.serialize(rows)
+
+
+class ValuesListMixin:
+    """
+    List views which serialize their pages with ``values_serializer_class`` (see ValuesSerializer) instead of the
+    DRF ``serializer_class``. The browsable API keeps the DRF serializer.
+    """
+
+    values_serializer_class = ValuesSerializer
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return super().list(request, *args, **kwargs)
+        serializer = self.values_serializer_class
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+    async def alist(self, request, *args, **kwargs):
+        """
+        ``list`` with the async ORM, for views with ``apps.common.views.AsyncAPIViewMixin``.
+        """
+        if request.accepted_renderer.format != "json":
+            return await sync_to_async(super().list)(request, *args, **kwargs)
+        serializer = self.values_serializer_class
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(await serializer.aserialize(page))
+        return Response(await serializer.aserialize([row async for row in queryset]))
@@ -0,0 +1,91 @@
+"""
+Test helpers shared by the apps.
+"""
+import re
+from collections import Counter
+from typing import Dict, List
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Literals and lists of them, so statements differing only in values are grouped together
+SQL_LITERALS = [
+    (re.compile(r"\bVALUES\s*\(.*?\)(?=\s*(?:RETURNING\b|$))", re.S), "VALUES (...)"),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_sql(sql: str) -> str:
+    for pattern, replacement in SQL_LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+# An insert of several rows, i.e. a batch of bulk_create
+MULTI_ROW_INSERT = re.compile(r"^INSERT .*\bVALUES\s*\([^()]*\)\s*,\s*\(", re.S)
+
+
+def count_queries(queries: List[str]) -> int:
+    """
+    Number of queries, counting consecutive batches of the same bulk insert once: their number only depends on the
+    limit of query parameters of the database (999 on SQLite, PostgreSQL inserts everything at once).
+    """
+    count = 0
+    previous = None
+    for sql in queries:
+        statement = normalize_sql(sql)
+        if statement != previous or not MULTI_ROW_INSERT.match(sql):
+            count += 1
+        previous = statement
+    return count
+
+
+def format_queries(queries: List[str]) -> str:
+    """
+    Queries grouped by normalized statement, the most repeated first.
+    """
+    groups = Counter(normalize_sql(sql) for sql in queries)
+    return "\n".join(f"{count:>5} x {sql}" for sql, count in groups.most_common())
+
+
+class QueryBudgetMixin:
+    """
+    Checks the number of SQL queries of every endpoint against a budget declared per URL name in ``query_budgets``.
+    Every endpoint is requested on a small and on a large dataset: the count must be within the budget and must not
+    grow with the data, so queries per row (N+1) fail even while the budget still holds.
+
+    Subclasses implement ``request(url_name, dataset)`` returning the response of the endpoint for the dataset, then
+    compare ``measure_queries`` of both datasets with ``assertQueryBudgets``.
+    """
+
+    query_budgets: Dict[str, int] = {}
+
+    def request(self, url_name, dataset):
+        raise NotImplementedError("Subclasses of QueryBudgetMixin must implement request(url_name, dataset)")
+
+    def measure_queries(self, dataset) -> Dict[str, List[str]]:
+        queries = {}
+        for url_name in self.query_budgets:
+            with CaptureQueriesContext(connection) as context:
+                response = self.request(url_name, dataset)
+                # Streaming responses query while their content is consumed
+                if getattr(response, "streaming", False):
+                    b"".join(response.streaming_content)
+            self.assertLess(response.status_code, 400, f"{url_name}: {response.status_code}")
+            queries[url_name] = [query["sql"] for query in context.captured_queries]
+        return queries
+
+    def assertQueryBudgets(self, small_queries: Dict[str, List[str]], large_queries: Dict[str, List[str]]):
+        failures = []
+        for url_name, budget in self.query_budgets.items():
+            small, large = count_queries(small_queries[url_name]), count_queries(large_queries[url_name])
+            if large > budget or large > small:
+                failures.append(
+                    f"{url_name}: budget {budget}, {small} queries on the small dataset, {large} on the large one\n"
+                    f"{format_queries(large_queries[url_name])}"
+                )
+        if failures:
+            self.fail("Query budgets exceeded\n\n" + "\n\n".join(failures))
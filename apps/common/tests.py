@@ -0,0 +1,245 @@
+import datetime
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import router
+from django.db.utils import ConnectionDoesNotExist
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+
+from apps.common.middleware import ReplicaMiddleware
+from apps.common.renderers import ORJSONRenderer
+from apps.common.routers import PRIMARY_COOKIE_NAME, replica_alias, use_primary
+from apps.common.testing import count_queries, format_queries, normalize_sql
+from apps.users.models import User
+from apps.warehouse.api_endpoints import (AsyncOrderListAPIView,
+                                          AsyncOrderProductMaterialListAPIView,
+                                          AsyncProductDetailAPIView,
+                                          AsyncProductListAPIView)
+from apps.warehouse.models import Order, OrderItem, Product
+
+
+def async_get(client, *args, **kwargs):
+    async def get():
+        return await client.get(*args, **kwargs)
+
+    return async_to_sync(get)()
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    def test_renders_as_json_renderer(self):
+        data = {
+            "id": 1,
+            "name": "Product",
+            "unicode": "Расходник",
+            "quantity": Decimal("12.50"),
+            "price": 1200.0,
+            "missing": None,
+            "label": _("Meter"),
+            "created_at": datetime.date(2024, 1, 2),
+            "items": [{"flag": True}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renders_non_string_keys(self):
+        # Errors of ListField and ListSerializer
+        data = {"orders": {0: ["A valid integer is required."]}, "items": [{1: {"quantity": ["Required."]}}]}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_json_renderer(self):
+        data = {"id": 1}
+        self.assertEqual(
+            ORJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+
+class MetricsMiddlewareTest(TestCase):
+    def get_sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_records_metrics_per_url_name(self):
+        Product.objects.create(name="Product", code="ProductCode")
+        view = "warehouse:product-list"
+        requests = self.get_sample("http_request_duration_seconds_count", view=view, method="GET", status="200")
+        queries = self.get_sample("http_request_sql_queries_total", view=view)
+
+        self.client.get(reverse("warehouse:product-list"))
+
+        self.assertEqual(
+            self.get_sample("http_request_duration_seconds_count", view=view, method="GET", status="200"),
+            requests + 1,
+        )
+        # COUNT and the page
+        self.assertEqual(self.get_sample("http_request_sql_queries_total", view=view), queries + 2)
+        self.assertGreater(self.get_sample("http_request_sql_duration_seconds_total", view=view), 0)
+
+    def test_records_allocation_duration(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        product = Product.objects.create(name="Product", code="ProductCode")
+        view = "warehouse:order-create"
+        allocations = self.get_sample("warehouse_allocation_duration_seconds_count", view=view)
+
+        self.client.force_login(user)
+        self.client.post(
+            reverse(view), data={"items": [{"product": product.id, "quantity": 1}]}, content_type="application/json"
+        )
+
+        self.assertEqual(self.get_sample("warehouse_allocation_duration_seconds_count", view=view), allocations + 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("warehouse:product-list"))
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="GET",', response.content.decode())
+        self.assertIn('view="warehouse:product-list"', response.content.decode())
+
+    @override_settings(ROOT_URLCONF="apps.warehouse.tests")
+    def test_records_metrics_of_async_requests(self):
+        view = "warehouse:product-list"
+        requests = self.get_sample("http_request_duration_seconds_count", view=view, method="GET", status="200")
+
+        response = async_get(self.async_client, reverse(view))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.get_sample("http_request_duration_seconds_count", view=view, method="GET", status="200"),
+            requests + 1,
+        )
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_metrics(self):
+        view = "warehouse:product-list"
+        requests = self.get_sample("http_request_duration_seconds_count", view=view, method="GET", status="200")
+        self.client.get(reverse("warehouse:product-list"))
+        self.assertEqual(
+            self.get_sample("http_request_duration_seconds_count", view=view, method="GET", status="200"), requests
+        )
+
+
+class AsyncAPIViewMixinTest(TestCase):
+    def test_views_are_async(self):
+        for view in [
+            AsyncProductListAPIView,
+            AsyncProductDetailAPIView,
+            AsyncOrderListAPIView,
+            AsyncOrderProductMaterialListAPIView,
+        ]:
+            self.assertTrue(iscoroutinefunction(view.as_view()), view)
+            # Same description in the schema
+            self.assertEqual(view.__doc__, view.__bases__[-1].__doc__)
+
+    @override_settings(ROOT_URLCONF="apps.warehouse.tests")
+    def test_async_requests(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        Product.objects.create(name="Product", code="ProductCode")
+        url = reverse("warehouse:order-list")
+
+        response = async_get(self.async_client, url)
+        self.assertEqual(response.json(), {"count": 0, "next": None, "previous": None, "results": []})
+        # The user of the session is loaded for DRF authentication
+        self.async_client.force_login(user)
+        response = async_get(self.async_client, reverse("warehouse:product-list"), {"pagination": "keyset"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["name"], "Product")
+        response = async_get(self.async_client, reverse("warehouse:order-product-materials", args=[1]))
+        self.assertEqual(response.status_code, 200)
+
+        self.async_client.logout()
+        response = async_get(self.async_client, reverse("warehouse:order-product-materials", args=[1]))
+        self.assertEqual(response.status_code, 403)
+
+
+class NormalizeSQLTest(SimpleTestCase):
+    def test_values_are_replaced(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE  id IN (1, 2, 3) AND name = 'it''s' AND price > 1.5"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? AND price > ?",
+        )
+
+    def test_queries_are_grouped(self):
+        queries = ["SELECT * FROM t WHERE id = 1", "SELECT * FROM u", "SELECT * FROM t WHERE id = 2"]
+        self.assertEqual(format_queries(queries), "    2 x SELECT * FROM t WHERE id = ?\n    1 x SELECT * FROM u")
+
+    def test_batches_of_a_bulk_insert_are_counted_once(self):
+        batch = 'INSERT INTO "t" ("a") VALUES (1), (2)'
+        single = 'INSERT INTO "t" ("a") VALUES (1)'
+        self.assertEqual(count_queries([batch, batch, single, "SELECT 1", batch]), 4)
+        # Inserts of single rows, e.g. save() in a loop, are all counted
+        self.assertEqual(count_queries([single, single, single]), 3)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+class ReplicaRoutingTest(TestCase):
+    def get_databases(self, request):
+        """
+        Databases of the reads and of the writes made by a view, and the response.
+        """
+        databases = {}
+
+        def view(request):
+            databases["read"] = Product.objects.all().db
+            databases["write"] = router.db_for_write(Product, instance=Product(name="Product", code="ProductCode"))
+            with use_primary():
+                databases["primary"] = Product.objects.all().db
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return databases, response
+
+    def test_safe_requests_read_from_a_replica(self):
+        databases, response = self.get_databases(RequestFactory().get("/"))
+        self.assertIn(databases["read"], ["replica1", "replica2"])
+        self.assertEqual(databases["write"], "default")
+        self.assertEqual(databases["primary"], "default")
+        self.assertNotIn(PRIMARY_COOKIE_NAME, response.cookies)
+        # Outside of requests
+        self.assertEqual(Product.objects.all().db, "default")
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        databases, response = self.get_databases(RequestFactory().post("/"))
+        self.assertEqual(databases["read"], "default")
+        self.assertEqual(response.cookies[PRIMARY_COOKIE_NAME]["max-age"], 10)
+
+        request = RequestFactory().get("/")
+        request.COOKIES[PRIMARY_COOKIE_NAME] = response.cookies[PRIMARY_COOKIE_NAME].value
+        databases, response = self.get_databases(request)
+        self.assertEqual(databases["read"], "default")
+
+    def test_async_requests(self):
+        databases = {}
+
+        async def view(request):
+            databases["read"] = Product.objects.all().db
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertIn(databases["read"], ["replica1", "replica2"])
+
+    def test_allocation_reads_from_the_primary(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        order = Order.objects.create(user=user)
+        OrderItem.objects.create(
+            order=order, product=Product.objects.create(name="Product", code="ProductCode"), quantity=1
+        )
+        token = replica_alias.set("replica1")
+        try:
+            # The replica is not configured in tests, so reads from it would fail
+            with self.assertRaises(ConnectionDoesNotExist):
+                Product.objects.count()
+            order.calculate_materials()
+        finally:
+            replica_alias.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(lambda request: HttpResponse())
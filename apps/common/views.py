@@ -0,0 +1,59 @@
+from asgiref.sync import markcoroutinefunction, sync_to_async
+
+
+class AsyncAPIViewMixin:
+    """
+    Serves a DRF view as a Django async view: the handlers (e.g. ``async def get``) are coroutines which query with
+    the async ORM, so under ASGI (``core/asgi.py``) the event loop is free while the database or the client is slow.
+    Under WSGI the view still works, Django runs it in an event loop of its own.
+
+    Authentication, content negotiation, permissions and exception handling are the ones of APIView; none of them
+    queries the database once the user of the session is loaded. The view class keeps the serializers and the
+    pagination of the sync view it extends, so the schema of the endpoint does not change.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__doc__ is None:
+            # The schema describes the endpoint with the docstring of the sync view
+            cls.__doc__ = next((base.__doc__ for base in cls.__bases__ if base is not AsyncAPIViewMixin), None)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # csrf_exempt of APIView wraps the view into a plain function
+        return markcoroutinefunction(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        if hasattr(request, "user"):
+            # The lazy user of AuthenticationMiddleware loads the session and the user synchronously
+            await sync_to_async(getattr)(request.user, "pk")
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.initial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, "__await__"):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        apaginate_queryset = getattr(self.paginator, "apaginate_queryset", None)
+        if apaginate_queryset is None:
+            # Paginators without async support query in a thread
+            return await sync_to_async(self.paginator.paginate_queryset)(queryset, self.request, view=self)
+        return await apaginate_queryset(queryset, self.request, view=self)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from apps.warehouse.models import (Order, OrderItem, Product,
+from apps.warehouse.allocation import release_items
+from apps.warehouse.models import (Order, OrderItem, Product, ProductComponent,
                                    ProductRawMaterial, RawMaterial,
                                    WarehouseBatch)
 
@@ -10,24 +11,30 @@ class ProductRawMaterialInline(admin.TabularInline):
     extra = 0
 
 
+class ProductComponentInline(admin.TabularInline):
+    model = ProductComponent
+    fk_name = "product"
+    extra = 0
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ["id", "name", "code"]
     list_display_links = ["id", "name"]
     search_fields = ["name", "code"]
-    inlines = [ProductRawMaterialInline]
+    inlines = [ProductRawMaterialInline, ProductComponentInline]
 
 
 @admin.register(RawMaterial)
 class RawMaterialAdmin(admin.ModelAdmin):
-    list_display = ["id", "name"]
+    list_display = ["id", "name", "allocation_strategy"]
     list_display_links = ["id", "name"]
     search_fields = ["name"]
 
 
 @admin.register(WarehouseBatch)
 class WarehouseBatchAdmin(admin.ModelAdmin):
-    list_display = ["id", "raw_material", "remainder", "price"]
+    list_display = ["id", "raw_material", "remainder", "price", "expiry_date"]
     list_display_links = ["id", "raw_material"]
     search_fields = ["raw_material__name"]
 
@@ -35,11 +42,32 @@ class WarehouseBatchAdmin(admin.ModelAdmin):
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    readonly_fields = ["materials_count", "shortage_quantity", "total_cost"]
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ["id", "user", "created_at"]
+    list_display = ["id", "user", "allocation_status", "items_count", "shortage_quantity", "total_cost", "created_at"]
     list_display_links = ["id", "user"]
+    list_filter = ["allocation_status"]
     search_fields = ["user__email", "user__username"]
+    readonly_fields = [
+        "materials_reserved",
+        "allocation_status",
+        "items_count",
+        "materials_count",
+        "shortage_quantity",
+        "total_cost",
+    ]
     inlines = [OrderItemInline]
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is OrderItem:
+            # Reserved stock of the deleted items has to be returned before their rows are deleted with them
+            release_items([item_form.instance.pk for item_form in formset.deleted_forms if item_form.instance.pk])
+        super().save_formset(request, form, formset, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Only the added and changed items are allocated again
+        form.instance.reallocate_materials()
@@ -0,0 +1,516 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from apps.common.metrics import measure_allocation
+from apps.common.routers import use_primary
+from apps.warehouse import kernels
+from apps.warehouse.bom import BOMLine, get_bom, required_quantity
+from apps.warehouse.models import (Order, OrderItem, OrderItemRawMaterials,
+                                   WarehouseBatch)
+from apps.warehouse.stock import apply_remainder_changes
+from apps.warehouse.strategies import get_strategy
+from apps.warehouse.totals import (EMPTY_ITEM_TOTALS, EMPTY_ORDER_TOTALS,
+                                   OrderTotals, item_totals, order_totals,
+                                   set_totals, totals_update)
+
+# A single allocation piece: the batch the quantity is taken from (None when there is not enough stock)
+# and the taken quantity.
+Allocation = Tuple[Optional[WarehouseBatch], Decimal]
+
+
+class StockSnapshot:
+    """
+    In-memory copy of the non-empty warehouse batches of a set of raw materials.
+    Batches are loaded once and then consumed in the order of the allocation strategy of their raw material (FIFO by
+    default, see ``apps.warehouse.strategies``) without touching the database.
+
+    Raw materials with many batches are allocated by the vectorized kernel when NumPy is installed, their remainders
+    are kept in arrays and written back to the batch objects by ``sync_remainders``. ``vectorize`` forces the choice.
+    """
+
+    def __init__(self, batches: Iterable[WarehouseBatch], vectorize: Optional[bool] = None):
+        self.vectorize = kernels.np is not None if vectorize is None else vectorize
+        self._batches: Dict[int, List[WarehouseBatch]] = defaultdict(list)
+        # Index of the first batch of each raw material which still may have a remainder
+        self._cursors: Dict[int, int] = defaultdict(int)
+        # Array state of the raw materials allocated by the vectorized kernel
+        self._vectors: Dict[int, VectorizedStock] = {}
+        # Remainders as they are stored in the database, used to find changed batches
+        self._stored_remainders: Dict[int, Decimal] = {}
+        for batch in batches:
+            self._batches[batch.raw_material_id].append(batch)
+            self._stored_remainders[batch.id] = batch.remainder
+
+    @classmethod
+    def load(
+        cls,
+        raw_material_ids: Iterable[int],
+        held: Optional[Dict[int, Decimal]] = None,
+        strategies: Optional[Dict[int, str]] = None,
+    ) -> "StockSnapshot":
+        """
+        Loads all candidate batches of the given raw materials with a single query per allocation strategy.
+        ``held`` maps batch ids to quantities which are already allocated without a reservation, they are not
+        available in the snapshot. ``strategies`` maps raw material ids to allocation strategies.
+        """
+        held = held or {}
+        strategies = strategies or {}
+        strategy_raw_material_ids: Dict[str, List[int]] = defaultdict(list)
+        for raw_material_id in set(raw_material_ids):
+            strategy_raw_material_ids[get_strategy(strategies.get(raw_material_id)).name].append(raw_material_id)
+        batches = []
+        for name, ids in strategy_raw_material_ids.items():
+            # Read with a range scan of the index of the strategy
+            batches.extend(
+                WarehouseBatch.objects.filter(raw_material_id__in=ids, remainder__gt=0).order_by(
+                    "raw_material_id", *get_strategy(name).ordering
+                )
+            )
+        snapshot = cls(batches)
+        for batch in batches:
+            batch.remainder -= held.get(batch.id, 0)
+        return snapshot
+
+    @classmethod
+    def lock(
+        cls,
+        raw_material_ids: Iterable[int],
+        released: Optional[Dict[int, Decimal]] = None,
+        strategies: Optional[Dict[int, str]] = None,
+    ) -> "StockSnapshot":
+        """
+        Loads and locks all candidate batches of the given raw materials with a single query.
+        Rows are locked in the order of their ids, so concurrent reservations never wait for each other in a cycle,
+        and then sorted by the allocation strategies of their raw materials.
+        ``released`` maps batch ids to quantities which are returned to the warehouse before allocation.
+        """
+        released = released or {}
+        strategies = strategies or {}
+        batches = list(
+            WarehouseBatch.objects.select_for_update()
+            .filter(Q(raw_material_id__in=set(raw_material_ids), remainder__gt=0) | Q(id__in=released.keys()))
+            .order_by("id")
+        )
+        snapshot = cls(
+            sorted(
+                batches,
+                key=lambda batch: (
+                    batch.raw_material_id,
+                    get_strategy(strategies.get(batch.raw_material_id)).sort_key(batch),
+                ),
+            )
+        )
+        for batch in batches:
+            batch.remainder += released.get(batch.id, 0)
+        return snapshot
+
+    def save(self) -> None:
+        """
+        Writes remainders of the changed batches and the availability of their raw materials to the database.
+        Must be called in the transaction which locked the batches.
+        """
+        self.sync_remainders()
+        now = timezone.now()
+        changed_batches = []
+        changes = []
+        for batches in self._batches.values():
+            for batch in batches:
+                if batch.remainder != self._stored_remainders[batch.id]:
+                    batch.updated_at = now
+                    changed_batches.append(batch)
+                    changes.append((batch.raw_material_id, self._stored_remainders[batch.id], batch.remainder))
+                    self._stored_remainders[batch.id] = batch.remainder
+        WarehouseBatch.objects.bulk_update(changed_batches, ["remainder", "updated_at"])
+        # Keep the availability of the raw materials in sync
+        apply_remainder_changes(changes)
+
+    def sync_remainders(self) -> None:
+        """
+        Writes remainders kept by the vectorized kernel back to the batch objects.
+        """
+        for vector in self._vectors.values():
+            vector.sync()
+
+    def take_many(self, raw_material_id: int, required_quantities: List[Decimal]) -> List[List[Allocation]]:
+        """
+        Takes the required quantities of the raw material one after another from the oldest batches and decrements
+        their remainders. If the stock is not enough, the missing quantity is returned as a piece without a batch.
+        """
+        batches = self._batches.get(raw_material_id, [])
+        if self.vectorize and len(batches) >= kernels.VECTORIZE_MIN_BATCHES:
+            try:
+                return self._take_many_vectorized(raw_material_id, batches, required_quantities)
+            except ValueError:
+                # Quantities can not be represented in hundredths, fall back to the exact Decimal walk
+                self.sync_remainders()
+                self._vectors.pop(raw_material_id, None)
+
+        cursor = self._cursors[raw_material_id]
+        batches = batches[cursor:]
+        result = kernels.python_fifo([batch.remainder for batch in batches], required_quantities)
+        for index, remainder in result.remainders.items():
+            batches[index].remainder = remainder
+        self._cursors[raw_material_id] = cursor + result.cursor
+        return [
+            [(None if index is None else batches[index], quantity) for index, quantity in pieces]
+            for pieces in result.takes
+        ]
+
+    def _take_many_vectorized(
+        self, raw_material_id: int, batches: List[WarehouseBatch], required_quantities: List[Decimal]
+    ) -> List[List[Allocation]]:
+        np = kernels.np
+        vector = self._vectors.get(raw_material_id)
+        if vector is None:
+            vector = self._vectors[raw_material_id] = VectorizedStock(batches)
+        result = kernels.numpy_fifo(vector.remainders, kernels.to_hundredths(required_quantities))
+
+        vector.remainders[:] = result.remainders
+        row_batches = [vector.batches[index] for index in result.batch_indexes.tolist()]
+        # Most rows take a whole batch which was not touched before, their quantity is the remainder of the object
+        row_quantities = [batch.remainder for batch in row_batches]
+        for row in np.nonzero(result.taken != vector.synced_remainders[result.batch_indexes])[0].tolist():
+            row_quantities[row] = kernels.from_hundredths(result.taken[row])
+
+        bounds = result.demand_bounds.tolist()
+        takes: List[List[Allocation]] = [
+            list(zip(row_batches[start:end], row_quantities[start:end])) for start, end in zip(bounds, bounds[1:])
+        ]
+        for index in np.nonzero(result.shortages)[0].tolist():
+            takes[index].append((None, kernels.from_hundredths(result.shortages[index])))
+        return takes
+
+
+class VectorizedStock:
+    """
+    Batches of a single raw material and their remainders as arrays for the vectorized kernel.
+    """
+
+    def __init__(self, batches: List[WarehouseBatch]):
+        self.batches = batches
+        # Remainders in hundredths: as they are in the batch objects and the current ones
+        self.synced_remainders = kernels.to_hundredths([batch.remainder for batch in batches])
+        self.remainders = self.synced_remainders.copy()
+
+    def sync(self) -> None:
+        changed = self.remainders != self.synced_remainders
+        # Most of the changed batches are used up, they share a single zero
+        zero = Decimal("0.00")
+        for index in kernels.np.nonzero(changed & (self.remainders == 0))[0].tolist():
+            self.batches[index].remainder = zero
+        for index in kernels.np.nonzero(changed & (self.remainders != 0))[0].tolist():
+            self.batches[index].remainder = kernels.from_hundredths(self.remainders[index])
+        self.synced_remainders[:] = self.remainders
+
+
+def reserved_quantities(order_ids: Iterable[int]) -> Dict[int, Decimal]:
+    """
+    Returns quantities reserved by the orders grouped by warehouse batch id.
+    """
+    return dict(
+        OrderItemRawMaterials.objects.filter(order_item__order_id__in=order_ids, warehouse_batch__isnull=False)
+        .values("warehouse_batch_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("warehouse_batch_id", "total")
+    )
+
+
+def allocate_items(
+    items: Iterable[OrderItem], bom: Dict[int, List[BOMLine]], snapshot: StockSnapshot
+) -> List[OrderItemRawMaterials]:
+    """
+    Walks over the order items and their BOM lines and builds (unsaved) OrderItemRawMaterials objects.
+    """
+    # Required quantities in allocation order: (order item, BOM line, quantity)
+    demands = [
+        (item, bom_line, required_quantity(bom_line, item.quantity))
+        for item in items
+        for bom_line in bom.get(item.product_id, [])
+    ]
+    # Batches of different raw materials are independent, so all quantities of a raw material are taken at once
+    demand_indexes: Dict[int, List[int]] = defaultdict(list)
+    for index, (_, bom_line, _) in enumerate(demands):
+        demand_indexes[bom_line.raw_material_id].append(index)
+    takes: List[List[Allocation]] = [[] for _ in demands]
+    for raw_material_id, indexes in demand_indexes.items():
+        required_quantities = [demands[index][2] for index in indexes]
+        for index, allocations in zip(indexes, snapshot.take_many(raw_material_id, required_quantities)):
+            takes[index] = allocations
+
+    order_item_raw_materials = []
+    for (item, bom_line, _), allocations in zip(demands, takes):
+        for warehouse_batch, quantity in allocations:
+            if warehouse_batch is None:
+                # Not enough stock, the rest is added without a warehouse batch
+                order_item_raw_materials.append(
+                    OrderItemRawMaterials(
+                        order_item=item,
+                        raw_material_id=bom_line.raw_material_id,
+                        quantity=quantity,
+                        unit=bom_line.unit,
+                    )
+                )
+            else:
+                order_item_raw_materials.append(
+                    OrderItemRawMaterials(
+                        order_item=item,
+                        warehouse_batch=warehouse_batch,
+                        raw_material_id=bom_line.raw_material_id,
+                        quantity=quantity,
+                        unit=warehouse_batch.unit,
+                        price=warehouse_batch.price,
+                    )
+                )
+    return order_item_raw_materials
+
+
+@measure_allocation()
+@use_primary()
+def allocate_orders(
+    orders: Iterable[Union[Order, int]],
+    reserve: bool = False,
+    strategy: Optional[str] = None,
+    items: Optional[Iterable[OrderItem]] = None,
+) -> List[OrderItemRawMaterials]:
+    """
+    Allocates materials of the orders (instances or ids) one after another over a single shared stock snapshot and
+    replaces their OrderItemRawMaterials with one bulk insert.
+
+    Every order only gets the stock left by the orders before it, so the results are the same as calling
+    ``calculate_materials(reserve=True)`` for each order in sequence. Without ``reserve`` the warehouse batches are not
+    changed, otherwise the allocated quantities are taken from them. Previous reservations of the orders are returned
+    to the warehouse first. The number of queries does not depend on the number of orders, items or batches.
+    ``strategy`` overrides the allocation strategies of the raw materials. ``items`` are all items of the orders when
+    they are already loaded, e.g. just created, so they are not read again. Totals of the orders and of their items
+    (see ``apps.warehouse.totals``) are computed from the new rows and written in the same transaction.
+    """
+    orders = list(orders)
+    # Keep the first occurrence of every order, the sequence defines the allocation priority
+    order_ids = list(dict.fromkeys(order.pk if isinstance(order, Order) else order for order in orders))
+    sequence = {order_id: index for index, order_id in enumerate(order_ids)}
+
+    if items is None:
+        items = OrderItem.objects.filter(order_id__in=order_ids)
+    items = sorted(items, key=lambda item: (sequence[item.order_id], item.id))
+    bom = get_bom(item.product_id for item in items)
+    strategies = {
+        bom_line.raw_material_id: strategy or bom_line.allocation_strategy
+        for lines in bom.values()
+        for bom_line in lines
+    }
+
+    with transaction.atomic():
+        # Lock the orders themselves, so the same order is never allocated concurrently
+        reserved_order_ids = {
+            order_id
+            for order_id, materials_reserved in Order.objects.select_for_update()
+            .filter(pk__in=order_ids)
+            .order_by("pk")
+            .values_list("pk", "materials_reserved")
+            if materials_reserved
+        }
+        if reserve or reserved_order_ids:
+            released = reserved_quantities(reserved_order_ids) if reserved_order_ids else {}
+            snapshot = StockSnapshot.lock(strategies.keys(), released=released, strategies=strategies)
+            if not reserve:
+                # Only return the previous reservations to the warehouse
+                snapshot.save()
+        else:
+            snapshot = StockSnapshot.load(strategies.keys(), strategies=strategies)
+
+        order_item_raw_materials = allocate_items(items, bom, snapshot)
+        if reserve:
+            snapshot.save()
+
+        # Delete existing OrderItemRawMaterials related to the orders
+        OrderItemRawMaterials.objects.filter(order_item__order_id__in=order_ids).delete()
+        # Bulk create the OrderItemRawMaterials for optimized database insertion.
+        OrderItemRawMaterials.objects.bulk_create(order_item_raw_materials)
+
+        # Totals are rolled up from the new rows in memory and written with a query per model
+        items_totals = item_totals(order_item_raw_materials)
+        items_totals = {item.id: items_totals.get(item.id, EMPTY_ITEM_TOTALS) for item in items}
+        orders_totals = {order_id: EMPTY_ORDER_TOTALS for order_id in order_ids}
+        orders_totals.update(order_totals(items, items_totals))
+        if items_totals:
+            OrderItem.objects.filter(pk__in=items_totals).update(**totals_update(OrderItem, items_totals))
+        Order.objects.filter(pk__in=order_ids).update(
+            materials_reserved=reserve,
+            allocation_status=Order.AllocationStatus.DONE,
+            **totals_update(Order, orders_totals),
+        )
+
+    for item in items:
+        set_totals(item, items_totals[item.id])
+    for order in orders:
+        if isinstance(order, Order):
+            order.materials_reserved = reserve
+            order.allocation_status = Order.AllocationStatus.DONE
+            set_totals(order, orders_totals[order.pk])
+    return order_item_raw_materials
+
+
+@use_primary()
+def release_items(item_ids: Iterable[int]) -> None:
+    """
+    Deletes OrderItemRawMaterials of the order items and returns their reserved quantities to the warehouse.
+    Must be called before reserved order items are deleted, otherwise their reservation is lost with their rows.
+    Totals of the orders are written by ``reallocate_order`` once the items are deleted.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    with transaction.atomic():
+        rows = OrderItemRawMaterials.objects.filter(order_item_id__in=item_ids)
+        released = dict(
+            rows.filter(order_item__order__materials_reserved=True, warehouse_batch__isnull=False)
+            .values("warehouse_batch_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("warehouse_batch_id", "total")
+        )
+        if released:
+            StockSnapshot.lock([], released=released).save()
+        rows.delete()
+
+
+def diff_rows(
+    old_rows: Sequence[OrderItemRawMaterials], new_rows: Sequence[OrderItemRawMaterials]
+) -> Tuple[List[OrderItemRawMaterials], List[OrderItemRawMaterials], List[OrderItemRawMaterials]]:
+    """
+    Matches newly allocated rows with the stored ones by (order item, raw material, warehouse batch) and returns the
+    rows to create, the stored rows to update and the stored rows to delete.
+    """
+    stored: Dict[Tuple[int, int, Optional[int]], List[OrderItemRawMaterials]] = defaultdict(list)
+    for row in old_rows:
+        stored[(row.order_item_id, row.raw_material_id, row.warehouse_batch_id)].append(row)
+
+    to_create, to_update = [], []
+    for row in new_rows:
+        matches = stored.get((row.order_item_id, row.raw_material_id, row.warehouse_batch_id))
+        if not matches:
+            to_create.append(row)
+            continue
+        old_row = matches.pop(0)
+        if (old_row.quantity, old_row.unit, old_row.price) != (row.quantity, row.unit, row.price):
+            old_row.quantity, old_row.unit, old_row.price = row.quantity, row.unit, row.price
+            to_update.append(old_row)
+    to_delete = [row for rows in stored.values() for row in rows]
+    return to_create, to_update, to_delete
+
+
+def save_allocated_order(
+    order: Order,
+    items: List[OrderItem],
+    rows: Dict[int, List[OrderItemRawMaterials]],
+    stored_status: str,
+    stored_totals: Sequence,
+) -> None:
+    """
+    Marks the order as allocated and writes its totals computed from the rows of its items (by item id), with a
+    single update and only when they differ from the stored ones, e.g. after items were deleted. Totals of the items
+    must be up to date.
+    """
+    totals = order_totals(items, item_totals(row for item in items for row in rows[item.id])).get(
+        order.pk, EMPTY_ORDER_TOTALS
+    )
+    fields = {}
+    if stored_status != Order.AllocationStatus.DONE:
+        fields["allocation_status"] = Order.AllocationStatus.DONE
+    if tuple(totals) != tuple(stored_totals):
+        fields.update(totals._asdict())
+    if fields:
+        Order.objects.filter(pk=order.pk).update(**fields)
+    order.allocation_status = Order.AllocationStatus.DONE
+    set_totals(order, totals)
+
+
+@measure_allocation()
+@use_primary()
+def reallocate_order(order: Order) -> List[OrderItem]:
+    """
+    Brings OrderItemRawMaterials of the order in line with its items after some of them were added or changed.
+
+    Only items whose stored rows no longer add up to their BOM (new items, changed quantities or products) are
+    allocated again, from the stock left by the other items; rows of the other items are not touched. A reserved
+    order stays reserved: the previous reservation of the changed items is returned to the warehouse first. The rows
+    are written as the minimal set of inserts, updates and deletes, the number of queries does not depend on the
+    size of the order. The order is marked as allocated. Returns the reallocated items.
+    """
+    with transaction.atomic():
+        reserved, stored_status, *stored_totals = (
+            Order.objects.select_for_update()
+            .values_list("materials_reserved", "allocation_status", *OrderTotals._fields)
+            .get(pk=order.pk)
+        )
+        items = list(OrderItem.objects.filter(order_id=order.pk).order_by("id"))
+        bom = get_bom(item.product_id for item in items)
+        rows: Dict[int, List[OrderItemRawMaterials]] = defaultdict(list)
+        for row in OrderItemRawMaterials.objects.filter(order_item__order_id=order.pk).order_by("id"):
+            rows[row.order_item_id].append(row)
+
+        changed_items = []
+        for item in items:
+            required: Dict[int, Decimal] = defaultdict(Decimal)
+            for bom_line in bom.get(item.product_id, []):
+                required[bom_line.raw_material_id] += required_quantity(bom_line, item.quantity)
+            allocated: Dict[int, Decimal] = defaultdict(Decimal)
+            for row in rows[item.id]:
+                allocated[row.raw_material_id] += row.quantity
+            if required != allocated:
+                changed_items.append(item)
+        if not changed_items:
+            save_allocated_order(order, items, rows, stored_status, stored_totals)
+            return []
+
+        old_rows = [row for item in changed_items for row in rows[item.id]]
+        strategies = {
+            bom_line.raw_material_id: bom_line.allocation_strategy
+            for item in changed_items
+            for bom_line in bom.get(item.product_id, [])
+        }
+        if reserved:
+            released: Dict[int, Decimal] = defaultdict(Decimal)
+            for row in old_rows:
+                if row.warehouse_batch_id is not None:
+                    released[row.warehouse_batch_id] += row.quantity
+            snapshot = StockSnapshot.lock(strategies.keys(), released=released, strategies=strategies)
+        else:
+            # Unchanged items keep their batches, changed ones get what is left
+            changed_item_ids = {item.id for item in changed_items}
+            held: Dict[int, Decimal] = defaultdict(Decimal)
+            for item_id, item_rows in rows.items():
+                if item_id not in changed_item_ids:
+                    for row in item_rows:
+                        if row.warehouse_batch_id is not None:
+                            held[row.warehouse_batch_id] += row.quantity
+            snapshot = StockSnapshot.load(strategies.keys(), held=held, strategies=strategies)
+
+        new_rows = allocate_items(changed_items, bom, snapshot)
+        to_create, to_update, to_delete = diff_rows(old_rows, new_rows)
+        if reserved:
+            snapshot.save()
+        if to_delete:
+            OrderItemRawMaterials.objects.filter(pk__in=[row.pk for row in to_delete]).delete()
+        if to_update:
+            now = timezone.now()
+            for row in to_update:
+                row.updated_at = now
+            OrderItemRawMaterials.objects.bulk_update(to_update, ["quantity", "unit", "price", "updated_at"])
+        OrderItemRawMaterials.objects.bulk_create(to_create)
+
+        changed_items_totals = item_totals(new_rows)
+        changed_items_totals = {item.id: changed_items_totals.get(item.id, EMPTY_ITEM_TOTALS) for item in changed_items}
+        OrderItem.objects.filter(pk__in=changed_items_totals).update(**totals_update(OrderItem, changed_items_totals))
+        for item in changed_items:
+            rows[item.id] = []
+        for row in new_rows:
+            rows[row.order_item_id].append(row)
+        save_allocated_order(order, items, rows, stored_status, stored_totals)
+
+    order.materials_reserved = reserved
+    return changed_items
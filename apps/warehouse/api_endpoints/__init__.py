@@ -1,2 +1,3 @@
 from .order import *  # noqa
 from .product import *  # noqa
+from .warehouse_batch import *  # noqa
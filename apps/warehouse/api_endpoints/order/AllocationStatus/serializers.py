@@ -0,0 +1,13 @@
+from rest_framework import serializers
+
+from apps.warehouse.models import Order
+
+
+class OrderAllocationStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = (
+            "id",
+            "allocation_status",
+            "materials_reserved",
+        )
@@ -0,0 +1,32 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.users.models import User
+from apps.warehouse.models import Order
+
+
+class OrderAllocationStatusAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.order = Order.objects.create(user=self.user)
+
+    def test_get_allocation_status(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("warehouse:order-allocation-status", kwargs={"pk": self.order.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(
+            response.json(), {"id": self.order.id, "allocation_status": "pending", "materials_reserved": False}
+        )
+
+        self.order.calculate_materials()
+        response = self.client.get(reverse("warehouse:order-allocation-status", kwargs={"pk": self.order.id}))
+        self.assertEqual(response.json()["allocation_status"], "done")
+
+    def test_get_allocation_status_of_foreign_order(self):
+        other_user = User.objects.create_user(username="otheruser", password="testpassword")
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(reverse("warehouse:order-allocation-status", kwargs={"pk": self.order.id}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,17 @@
+from rest_framework.generics import RetrieveAPIView
+from rest_framework.permissions import IsAuthenticated
+
+from apps.warehouse.models import Order
+
+from .serializers import OrderAllocationStatusSerializer
+
+
+class OrderAllocationStatusAPIView(RetrieveAPIView):
+    serializer_class = OrderAllocationStatusSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Order.objects.filter(user=self.request.user)
+
+
+__all__ = ["OrderAllocationStatusAPIView"]
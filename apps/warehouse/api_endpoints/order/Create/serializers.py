@@ -1,9 +1,36 @@
+from collections.abc import Mapping
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
-from apps.warehouse.models import Order, OrderItem
+from apps.warehouse.models import Order, OrderItem, Product, RawMaterial
+from apps.warehouse.tasks import allocate_order_materials
+
+
+class PreloadedProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Takes products from ``context["products"]`` preloaded by OrderCreateSerializer instead of a query per item.
+    """
+
+    def to_internal_value(self, data):
+        products = self.context.get("products")
+        if products is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return products[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = PreloadedProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = (
@@ -15,6 +42,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
+    reserve = serializers.BooleanField(write_only=True, required=False)
+    # Overrides the allocation strategies of the raw materials
+    strategy = serializers.ChoiceField(choices=RawMaterial.AllocationStrategy.choices, write_only=True, required=False)
 
     class Meta:
         model = Order
@@ -22,15 +52,40 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             "id",
             "user",
             "items",
+            "reserve",
+            "strategy",
+            "allocation_status",
         )
         extra_kwargs = {
             "user": {"read_only": True},
+            "allocation_status": {"read_only": True},
         }
 
+    def to_internal_value(self, data):
+        # Products of all items are loaded with a single query, see PreloadedProductField
+        items = data.get("items") if isinstance(data, Mapping) else None
+        product_ids = set()
+        for item in items if isinstance(items, list) else []:
+            try:
+                product_ids.add(int(item["product"]))
+            except (KeyError, TypeError, ValueError):
+                # Malformed items are reported by the items serializer
+                pass
+        self.context["products"] = Product.objects.in_bulk(product_ids)
+        return super().to_internal_value(data)
+
+    @transaction.atomic
     def create(self, validated_data):
         order_items_data = validated_data.pop("items")
+        reserve = validated_data.pop("reserve", settings.WAREHOUSE_RESERVE_STOCK)
+        strategy = validated_data.pop("strategy", None)
         order = Order.objects.create(**validated_data)
-        for order_item_data in order_items_data:
-            OrderItem.objects.create(order=order, **order_item_data)
-        order.calculate_materials()
+        items = OrderItem.objects.bulk_create(
+            [OrderItem(order=order, **order_item_data) for order_item_data in order_items_data]
+        )
+        if settings.WAREHOUSE_ASYNC_ALLOCATION:
+            # The worker must see the committed order
+            transaction.on_commit(partial(allocate_order_materials.delay, order.id, reserve=reserve, strategy=strategy))
+        else:
+            order.calculate_materials(reserve=reserve, strategy=strategy, items=items)
         return order
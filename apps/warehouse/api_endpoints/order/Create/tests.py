@@ -1,8 +1,14 @@
+import math
+
+from django.db import connection
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
 from apps.users.models import User
-from apps.warehouse.models import Product
+from apps.warehouse.models import (Order, OrderItem, OrderItemRawMaterials,
+                                   Product, ProductRawMaterial, RawMaterial,
+                                   WarehouseBatch)
 
 
 class OrderCreateAPITest(APITestCase):
@@ -58,6 +64,22 @@ class OrderCreateAPITest(APITestCase):
         self.assertEqual(response.status_code, 400)
         self.assertDictEqual(response.json(), {"items": [{"product": ['Invalid pk "100" - object does not exist.']}]})
 
+    def test_create_order_with_invalid_strategy(self):
+        self.client.force_authenticate(user=self.user)
+        data = {
+            "items": [
+                {
+                    "product": self.product_1.id,
+                    "quantity": 10,
+                },
+            ],
+            "strategy": "random",
+        }
+
+        response = self.client.post(self.url, data=data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertDictEqual(response.json(), {"strategy": ['"random" is not a valid choice.']})
+
     def test_create_order_without_authentication(self):
         data = {
             "items": [
@@ -70,3 +92,57 @@ class OrderCreateAPITest(APITestCase):
         response = self.client.post(self.url, data=data)
         self.assertEqual(response.status_code, 403)
         self.assertDictEqual(response.json(), {"detail": "Authentication credentials were not provided."})
+
+    @override_settings(WAREHOUSE_ASYNC_ALLOCATION=True, CELERY_TASK_ALWAYS_EAGER=True)
+    def test_create_order_with_async_allocation(self):
+        raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        ProductRawMaterial.objects.create(product=self.product_1, raw_material=raw_material, quantity=2)
+        self.client.force_authenticate(user=self.user)
+        data = {
+            "items": [
+                {
+                    "product": self.product_1.id,
+                    "quantity": 10,
+                },
+            ],
+        }
+
+        # Tasks run eagerly in tests, once the order is committed
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(self.url, data=data, format="json")
+            self.assertEqual(
+                Order.objects.get(pk=response.json()["id"]).allocation_status, Order.AllocationStatus.PENDING
+            )
+            self.assertFalse(OrderItemRawMaterials.objects.exists())
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["allocation_status"], "pending")
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Order.objects.get(pk=response.json()["id"]).allocation_status, Order.AllocationStatus.DONE)
+        self.assertEqual(
+            list(OrderItemRawMaterials.objects.values_list("raw_material_id", "warehouse_batch_id", "quantity")),
+            [(raw_material.id, None, 20)],
+        )
+
+    def test_create_order_with_many_items_query_count(self):
+        raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        ProductRawMaterial.objects.create(product=self.product_1, raw_material=raw_material, quantity=2)
+        WarehouseBatch.objects.create(raw_material=raw_material, remainder=5000, price=100)
+        products = [self.product_1, self.product_2] + [
+            Product.objects.create(name=f"Product{index}", code="ProductCode") for index in range(3, 51)
+        ]
+        self.client.force_authenticate(user=self.user)
+        data = {"items": [{"product": products[index % 50].id, "quantity": 1} for index in range(500)]}
+
+        # Inserts are split by the bulk batch size of the database, a single query on PostgreSQL
+        inserts = self.bulk_insert_queries(OrderItem, 500) + self.bulk_insert_queries(OrderItemRawMaterials, 10)
+        with self.assertNumQueries(14 + inserts):
+            response = self.client.post(self.url, data=data, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["items"]), 500)
+        self.assertEqual(OrderItemRawMaterials.objects.count(), 10)
+
+    def bulk_insert_queries(self, model, count):
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        return math.ceil(count / connection.ops.bulk_batch_size(fields, [model()] * count))
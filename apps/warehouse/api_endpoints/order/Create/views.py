@@ -1,3 +1,5 @@
+from django.conf import settings
+from rest_framework import status
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import IsAuthenticated
 
@@ -8,6 +10,13 @@ class OrderCreateAPIView(CreateAPIView):
     serializer_class = OrderCreateSerializer
     permission_classes = [IsAuthenticated]
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if settings.WAREHOUSE_ASYNC_ALLOCATION:
+            # Materials are allocated in the background, see OrderAllocationStatusAPIView
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -0,0 +1,37 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from apps.warehouse.models import RawMaterial
+
+
+class OrderImportSerializer(serializers.Serializer):
+    """
+    Options of an import, passed as query parameters.
+    """
+
+    reserve = serializers.BooleanField(required=False)
+    # Overrides the allocation strategies of the raw materials
+    strategy = serializers.ChoiceField(choices=RawMaterial.AllocationStrategy.choices, required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("reserve", settings.WAREHOUSE_RESERVE_STOCK)
+        return attrs
+
+
+class ImportedOrderItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0)
+
+    def validate_product(self, product):
+        # Product ids are loaded once per import, see OrderImportAPIView
+        if product not in self.context["product_ids"]:
+            raise serializers.ValidationError(f'Invalid pk "{product}" - object does not exist.')
+        return product
+
+
+class ImportedOrderSerializer(serializers.Serializer):
+    """
+    A single line of an import.
+    """
+
+    items = ImportedOrderItemSerializer(many=True)
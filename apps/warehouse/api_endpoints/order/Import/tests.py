@@ -0,0 +1,140 @@
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from apps.users.models import User
+from apps.warehouse.api_endpoints import OrderImportAPIView
+from apps.warehouse.models import (Order, OrderItem, OrderItemRawMaterials,
+                                   Product, ProductRawMaterial, RawMaterial,
+                                   WarehouseBatch)
+
+
+class OrderImportAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        self.product_1 = Product.objects.create(name="Product1", code="ProductCode1")
+        self.product_2 = Product.objects.create(name="Product2", code="ProductCode2")
+        ProductRawMaterial.objects.create(product=self.product_1, raw_material=self.raw_material, quantity=2)
+        self.batch = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=10, price=100)
+        self.url = reverse("warehouse:order-import")
+        self.client.force_authenticate(user=self.user)
+
+    def post_lines(self, lines, query=""):
+        response = self.client.post(
+            self.url + query, data="\n".join(lines).encode(), content_type="application/x-ndjson"
+        )
+        results = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        return response, results
+
+    def order_line(self, *items):
+        return json.dumps({"items": [{"product": product.id, "quantity": quantity} for product, quantity in items]})
+
+    def test_import_orders(self):
+        response, results = self.post_lines(
+            [
+                self.order_line((self.product_1, 2), (self.product_2, 1)),
+                "",
+                '{"items": [{"product": 100, "quantity": 1}]}',
+                "{not json",
+                self.order_line((self.product_1, 4)),
+            ],
+            query="?reserve=true",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        orders = list(Order.objects.order_by("id"))
+        self.assertEqual(
+            results,
+            [
+                {"line": 1, "order": orders[0].id, "allocation_status": "done"},
+                {"line": 3, "errors": {"items": [{"product": ['Invalid pk "100" - object does not exist.']}]}},
+                {"line": 4, "errors": {"non_field_errors": ["Invalid JSON."]}},
+                {"line": 5, "order": orders[1].id, "allocation_status": "done"},
+            ],
+        )
+        self.assertEqual(
+            list(OrderItem.objects.order_by("id").values_list("order_id", "product_id", "quantity")),
+            [
+                (orders[0].id, self.product_1.id, 2),
+                (orders[0].id, self.product_2.id, 1),
+                (orders[1].id, self.product_1.id, 4),
+            ],
+        )
+        # The first order is allocated first and both are reserved
+        self.assertEqual(
+            list(
+                OrderItemRawMaterials.objects.order_by("id").values_list(
+                    "order_item__order_id", "warehouse_batch_id", "quantity"
+                )
+            ),
+            [(orders[0].id, self.batch.id, 4), (orders[1].id, self.batch.id, 6), (orders[1].id, None, 2)],
+        )
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.remainder, 0)
+
+    @override_settings(WAREHOUSE_IMPORT_CHUNK_SIZE=10)
+    def test_import_query_count_does_not_depend_on_chunk_size(self):
+        with CaptureQueriesContext(connection) as small_import:
+            self.post_lines([self.order_line((self.product_1, 1))])
+        with CaptureQueriesContext(connection) as large_import:
+            _, results = self.post_lines([self.order_line((self.product_1, 1), (self.product_2, 1))] * 10)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(Order.objects.count(), 11)
+        self.assertEqual(len(small_import.captured_queries), len(large_import.captured_queries))
+
+    @override_settings(WAREHOUSE_IMPORT_CHUNK_SIZE=2, WAREHOUSE_ASYNC_ALLOCATION=True, CELERY_TASK_ALWAYS_EAGER=True)
+    def test_import_with_async_allocation(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response, results = self.post_lines([self.order_line((self.product_1, 1))] * 3)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual([result["allocation_status"] for result in results], ["pending"] * 3)
+        # One task per chunk
+        self.assertEqual(len(callbacks), 2)
+        self.assertFalse(Order.objects.exclude(allocation_status=Order.AllocationStatus.DONE).exists())
+        self.assertEqual(OrderItemRawMaterials.objects.count(), 3)
+
+    @override_settings(WAREHOUSE_IMPORT_CHUNK_SIZE=2)
+    def test_invalid_lines_are_flushed_in_chunks(self):
+        read_lines = []
+
+        def lines():
+            for line_number, line in enumerate(["{not json"] * 5 + [self.order_line((self.product_1, 1))], start=1):
+                read_lines.append(line_number)
+                yield line_number, line
+
+        request = Request(APIRequestFactory().post(self.url))
+        request.user = self.user
+        view = OrderImportAPIView(request=request, format_kwarg=None)
+        results = view.import_orders(lines(), reserve=False)
+
+        # The results of the first chunk are sent before the next line is read
+        self.assertEqual(json.loads(next(results))["line"], 1)
+        self.assertEqual(read_lines, [1, 2])
+        results = [json.loads(result) for result in [next(results), *results]]
+        self.assertEqual([result["line"] for result in results], [2, 3, 4, 5, 6])
+        self.assertEqual(results[-1]["order"], Order.objects.get().id)
+
+    def test_import_with_invalid_options(self):
+        response = self.client.post(
+            self.url + "?strategy=random",
+            data=self.order_line((self.product_1, 1)),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertDictEqual(response.json(), {"strategy": ['"random" is not a valid choice.']})
+        self.assertFalse(Order.objects.exists())
+
+    def test_import_with_unsupported_media_type(self):
+        response = self.client.post(self.url, data={"items": []}, format="json")
+        self.assertEqual(response.status_code, 415)
@@ -0,0 +1,73 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.generics import GenericAPIView
+from rest_framework.permissions import IsAuthenticated
+
+from apps.common.parsers import NDJSONParser
+from apps.warehouse.models import Product
+from apps.warehouse.orders import create_orders
+
+from .serializers import ImportedOrderSerializer, OrderImportSerializer
+
+
+class OrderImportAPIView(GenericAPIView):
+    """
+    Creates orders from an NDJSON body, one order per line, and streams back an NDJSON result per line:
+    the created order or the errors of the line.
+
+    The body is read line by line in chunks of ``WAREHOUSE_IMPORT_CHUNK_SIZE`` lines: the valid orders of a chunk are
+    created and allocated and the results of its lines are sent, so the memory does not grow with the size of the
+    upload. A chunk is created in its own transaction; invalid lines are skipped and do not affect the other ones.
+    """
+
+    serializer_class = ImportedOrderSerializer
+    parser_classes = [NDJSONParser]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        options = OrderImportSerializer(data=request.query_params)
+        options.is_valid(raise_exception=True)
+        return StreamingHttpResponse(
+            self.import_orders(request.data, **options.validated_data),
+            content_type=NDJSONParser.media_type,
+            status=status.HTTP_202_ACCEPTED if settings.WAREHOUSE_ASYNC_ALLOCATION else status.HTTP_200_OK,
+        )
+
+    def import_orders(self, lines, reserve, strategy=None):
+        context = {**self.get_serializer_context(), "product_ids": set(Product.objects.values_list("id", flat=True))}
+        # Results of the lines of the current chunk in their order, created orders are filled in on flush
+        results = []
+        orders_items = []
+        for line_number, line in lines:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                results.append({"line": line_number, "errors": {"non_field_errors": ["Invalid JSON."]}})
+            else:
+                serializer = self.get_serializer_class()(data=data, context=context)
+                if serializer.is_valid():
+                    results.append({"line": line_number, "order": len(orders_items)})
+                    orders_items.append(serializer.validated_data["items"])
+                else:
+                    results.append({"line": line_number, "errors": serializer.errors})
+            # Errors are kept until the flush too, so a chunk is also bounded by its results
+            if len(results) >= settings.WAREHOUSE_IMPORT_CHUNK_SIZE:
+                yield from self.flush(results, orders_items, reserve, strategy)
+                results, orders_items = [], []
+        yield from self.flush(results, orders_items, reserve, strategy)
+
+    def flush(self, results, orders_items, reserve, strategy):
+        orders = []
+        if orders_items:
+            orders = create_orders(self.request.user, orders_items, reserve=reserve, strategy=strategy)
+        for result in results:
+            if "order" in result:
+                order = orders[result["order"]]
+                result.update(order=order.id, allocation_status=order.allocation_status)
+            yield json.dumps(result) + "\n"
+
+
+__all__ = ["OrderImportAPIView"]
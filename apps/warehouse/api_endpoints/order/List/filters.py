@@ -0,0 +1,38 @@
+from django_filters import rest_framework as filters
+
+from apps.warehouse.models import Order
+
+
+class OrderOrderingFilter(filters.OrderingFilter):
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            # Orders with equal values keep the same order on every page
+            qs = qs.order_by(*qs.query.order_by, "id")
+        return qs
+
+
+class OrderFilter(filters.FilterSet):
+    """
+    Filters and orderings of the order list over the stored totals of the orders, see ``apps.warehouse.totals``.
+    """
+
+    has_shortage = filters.BooleanFilter(method="filter_has_shortage")
+    ordering = OrderOrderingFilter(
+        fields=("created_at", "items_count", "materials_count", "shortage_quantity", "total_cost")
+    )
+
+    class Meta:
+        model = Order
+        fields = {
+            "allocation_status": ["exact"],
+            "items_count": ["exact", "gte", "lte"],
+            "materials_count": ["exact", "gte", "lte"],
+            "shortage_quantity": ["gte", "lte"],
+            "total_cost": ["gte", "lte"],
+        }
+
+    def filter_has_shortage(self, queryset, name, value):
+        if value is None:
+            return queryset
+        return queryset.filter(shortage_quantity__gt=0) if value else queryset.filter(shortage_quantity=0)
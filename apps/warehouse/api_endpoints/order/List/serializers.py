@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from apps.common.serializers import ValuesSerializer
 from apps.warehouse.models import Order
 
 
@@ -9,4 +10,21 @@ class OrderListSerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "user",
+            "allocation_status",
+            "items_count",
+            "materials_count",
+            "shortage_quantity",
+            "total_cost",
         )
+
+
+class OrderListValuesSerializer(ValuesSerializer):
+    fields = {
+        "id": "id",
+        "user": "user_id",
+        "allocation_status": "allocation_status",
+        "items_count": "items_count",
+        "materials_count": "materials_count",
+        "shortage_quantity": "shortage_quantity",
+        "total_cost": "total_cost",
+    }
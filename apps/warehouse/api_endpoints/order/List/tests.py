@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
@@ -57,3 +60,66 @@ class OrderCreateAPITest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["count"], 1)
         self.assertEqual(response.json()["results"][0]["user"], self.user.id)
+
+    def test_get_order_list_with_keyset_pagination(self):
+        orders = [self.order_1] + [Order.objects.create(user=self.user) for _ in range(10)]
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url, {"pagination": "keyset"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order["id"] for order in response.json()["results"]], [order.id for order in orders[:10]])
+        response = self.client.get(response.json()["next"])
+        self.assertEqual([order["id"] for order in response.json()["results"]], [orders[10].id])
+        self.assertIsNone(response.json()["next"])
+
+    def test_get_order_list_with_totals(self):
+        self.client.force_authenticate(user=self.user)
+        Order.objects.filter(pk=self.order_1.pk).update(
+            allocation_status=Order.AllocationStatus.DONE,
+            items_count=2,
+            materials_count=3,
+            shortage_quantity=Decimal("1.5"),
+            total_cost=Decimal("12.25"),
+        )
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "id": self.order_1.id,
+                    "user": self.user.id,
+                    "allocation_status": "done",
+                    "items_count": 2,
+                    "materials_count": 3,
+                    "shortage_quantity": 1.5,
+                    "total_cost": 12.25,
+                }
+            ],
+        )
+
+    def test_filter_and_order_order_list_by_totals(self):
+        self.client.force_authenticate(user=self.user)
+        Order.objects.filter(pk=self.order_1.pk).update(total_cost=50, shortage_quantity=2)
+        cheap_order = Order.objects.create(user=self.user, total_cost=10)
+        expensive_order = Order.objects.create(user=self.user, total_cost=100)
+
+        response = self.client.get(self.url, {"ordering": "-total_cost"})
+        self.assertEqual(
+            [order["id"] for order in response.json()["results"]],
+            [expensive_order.id, self.order_1.id, cheap_order.id],
+        )
+        response = self.client.get(self.url, {"total_cost__gte": 20, "ordering": "total_cost"})
+        self.assertEqual([order["id"] for order in response.json()["results"]], [self.order_1.id, expensive_order.id])
+        response = self.client.get(self.url, {"has_shortage": "true"})
+        self.assertEqual([order["id"] for order in response.json()["results"]], [self.order_1.id])
+        response = self.client.get(self.url, {"has_shortage": "false", "ordering": "total_cost"})
+        self.assertEqual([order["id"] for order in response.json()["results"]], [cheap_order.id, expensive_order.id])
+
+
+@override_settings(ROOT_URLCONF="apps.warehouse.tests")
+class AsyncOrderListAPITest(OrderCreateAPITest):
+    """
+    The same tests against the async view.
+    """
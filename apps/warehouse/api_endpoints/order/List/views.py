@@ -1,15 +1,32 @@
 from rest_framework.generics import ListAPIView
 
+from apps.common.pagination import OptionalKeysetPagination
+from apps.common.serializers import ValuesListMixin
+from apps.common.views import AsyncAPIViewMixin
 from apps.warehouse.models import Order
 
-from .serializers import OrderListSerializer
+from .filters import OrderFilter
+from .serializers import OrderListSerializer, OrderListValuesSerializer
 
 
-class OrderListAPIView(ListAPIView):
+class OrderListAPIView(ValuesListMixin, ListAPIView):
+    """
+    Orders of the user with the totals of their materials. Orders can be filtered and ordered by the totals; keyset
+    pages are always ordered by creation.
+    """
+
     serializer_class = OrderListSerializer
+    values_serializer_class = OrderListValuesSerializer
+    pagination_class = OptionalKeysetPagination
+    filterset_class = OrderFilter
 
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user.id)
 
 
-__all__ = ["OrderListAPIView"]
+class AsyncOrderListAPIView(AsyncAPIViewMixin, OrderListAPIView):
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
+__all__ = ["OrderListAPIView", "AsyncOrderListAPIView"]
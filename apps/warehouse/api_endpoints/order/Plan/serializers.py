@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from apps.warehouse.allocation import allocate_orders
+from apps.warehouse.models import Order, OrderItemRawMaterials, RawMaterial
+
+
+class PlannedMaterialSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItemRawMaterials
+        fields = ("order_item", "raw_material", "warehouse_batch", "quantity", "unit", "price")
+
+
+class PlannedOrderSerializer(serializers.Serializer):
+    order = serializers.IntegerField()
+    product_materials = PlannedMaterialSerializer(many=True)
+
+
+class OrderPlanSerializer(serializers.Serializer):
+    orders = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, write_only=True)
+    reserve = serializers.BooleanField(default=False, write_only=True)
+    # Overrides the allocation strategies of the raw materials
+    strategy = serializers.ChoiceField(choices=RawMaterial.AllocationStrategy.choices, write_only=True, required=False)
+    results = PlannedOrderSerializer(many=True, read_only=True)
+
+    def validate_orders(self, orders):
+        order_ids = list(dict.fromkeys(orders))
+        existing_order_ids = set(
+            Order.objects.filter(pk__in=order_ids, user=self.context["request"].user).values_list("pk", flat=True)
+        )
+        for order_id in order_ids:
+            if order_id not in existing_order_ids:
+                raise serializers.ValidationError(f'Invalid pk "{order_id}" - object does not exist.')
+        return order_ids
+
+    def create(self, validated_data):
+        product_materials = defaultdict(list)
+        for order_item_raw_material in allocate_orders(
+            validated_data["orders"], reserve=validated_data["reserve"], strategy=validated_data.get("strategy")
+        ):
+            product_materials[order_item_raw_material.order_item.order_id].append(order_item_raw_material)
+        return {
+            "results": [
+                {"order": order_id, "product_materials": product_materials[order_id]}
+                for order_id in validated_data["orders"]
+            ]
+        }
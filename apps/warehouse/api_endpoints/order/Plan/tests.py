@@ -0,0 +1,119 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.users.models import User
+from apps.warehouse.allocation import allocate_orders
+from apps.warehouse.models import (Order, OrderItem, OrderItemRawMaterials,
+                                   Product, ProductRawMaterial, RawMaterial,
+                                   WarehouseBatch)
+
+
+class OrderPlanAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material_1 = RawMaterial.objects.create(name="RawMaterial1", unit="m")
+        self.raw_material_2 = RawMaterial.objects.create(name="RawMaterial2", unit="kg")
+        self.product_1 = Product.objects.create(name="Product1", code="ProductCode1")
+        self.product_2 = Product.objects.create(name="Product2", code="ProductCode2")
+        ProductRawMaterial.objects.create(product=self.product_1, raw_material=self.raw_material_1, quantity=2)
+        ProductRawMaterial.objects.create(product=self.product_1, raw_material=self.raw_material_2, quantity=1)
+        ProductRawMaterial.objects.create(product=self.product_2, raw_material=self.raw_material_2, quantity=3)
+        for remainder, price in [(5, 100), (4, 120), (7, 130)]:
+            WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=remainder, price=price)
+        for remainder, price in [(6, 200), (10, 250)]:
+            WarehouseBatch.objects.create(raw_material=self.raw_material_2, remainder=remainder, price=price)
+
+        self.url = reverse("warehouse:order-plan")
+        self.client.force_authenticate(user=self.user)
+
+    def create_orders(self, count):
+        orders = []
+        for index in range(count):
+            order = Order.objects.create(user=self.user)
+            OrderItem.objects.create(order=order, product=self.product_1, quantity=index % 3 + 1)
+            OrderItem.objects.create(order=order, product=self.product_2, quantity=1)
+            orders.append(order)
+        return orders
+
+    def get_rows(self, orders):
+        return [
+            list(
+                OrderItemRawMaterials.objects.filter(order_item__order=order)
+                .order_by("id")
+                .values_list("order_item_id", "raw_material_id", "warehouse_batch_id", "quantity", "price")
+            )
+            for order in orders
+        ]
+
+    def get_remainders(self):
+        return list(WarehouseBatch.objects.order_by("id").values_list("remainder", flat=True))
+
+    def test_plan_matches_sequential_allocation(self):
+        orders = self.create_orders(4)
+        initial_remainders = self.get_remainders()
+        for order in orders:
+            order.calculate_materials(reserve=True)
+        sequential_rows = self.get_rows(orders)
+        sequential_remainders = self.get_remainders()
+        # Return the stock to the warehouse
+        for order in orders:
+            order.calculate_materials()
+        self.assertEqual(self.get_remainders(), initial_remainders)
+
+        response = self.client.post(self.url, data={"orders": [order.id for order in orders], "reserve": True})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_rows(orders), sequential_rows)
+        self.assertEqual(self.get_remainders(), sequential_remainders)
+        self.assertEqual([result["order"] for result in response.json()["results"]], [order.id for order in orders])
+        self.assertEqual(
+            len(response.json()["results"][0]["product_materials"]),
+            OrderItemRawMaterials.objects.filter(order_item__order=orders[0]).count(),
+        )
+
+    def test_plan_without_reserve_does_not_change_warehouse(self):
+        orders = self.create_orders(3)
+        initial_remainders = self.get_remainders()
+
+        allocate_orders(orders)
+
+        self.assertEqual(self.get_remainders(), initial_remainders)
+        # The second order gets only the stock left by the first one
+        self.assertEqual(
+            list(
+                OrderItemRawMaterials.objects.filter(order_item__order=orders[1], raw_material=self.raw_material_1)
+                .order_by("id")
+                .values_list("warehouse_batch__price", "quantity")
+            ),
+            [(100, 3), (120, 1)],
+        )
+
+    def test_plan_query_count_does_not_depend_on_orders(self):
+        orders = self.create_orders(1)
+        with CaptureQueriesContext(connection) as small_plan:
+            allocate_orders(orders, reserve=True)
+        orders = self.create_orders(10)
+        with CaptureQueriesContext(connection) as large_plan:
+            allocate_orders(orders, reserve=True)
+        self.assertEqual(len(small_plan.captured_queries), len(large_plan.captured_queries))
+
+    def test_plan_with_foreign_order(self):
+        other_user = User.objects.create_user(username="otheruser", password="testpassword")
+        order = Order.objects.create(user=other_user)
+
+        response = self.client.post(self.url, data={"orders": [order.id]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertDictEqual(response.json(), {"orders": [f'Invalid pk "{order.id}" - object does not exist.']})
+
+    def test_plan_with_invalid_order(self):
+        response = self.client.post(self.url, data={"orders": ["abc"]}, format="json")
+
+        # Errors of the items are keyed by their index
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("0", response.json()["orders"])
@@ -0,0 +1,23 @@
+from rest_framework.generics import GenericAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .serializers import OrderPlanSerializer
+
+
+class OrderPlanAPIView(GenericAPIView):
+    """
+    Allocates materials of many orders at once, in the given sequence, over a single shared stock snapshot.
+    """
+
+    serializer_class = OrderPlanSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+__all__ = ["OrderPlanAPIView"]
@@ -1,3 +1,6 @@
+from .AllocationStatus import *  # noqa
 from .Create import *  # noqa
+from .Import import *  # noqa
 from .List import *  # noqa
 from .order_product_materials import *  # noqa
+from .Plan import *  # noqa
@@ -1,5 +1,8 @@
+from collections import defaultdict
+
 from rest_framework import serializers
 
+from apps.common.serializers import ValuesSerializer
 from apps.warehouse.models import OrderItem, OrderItemRawMaterials
 
 
@@ -13,8 +16,53 @@ class OrderItemRawMaterialsSerializer(serializers.ModelSerializer):
 
 class OrderProductMaterialSerializer(serializers.ModelSerializer):
     product = serializers.CharField(source="product.name")
-    product_materials = OrderItemRawMaterialsSerializer(many=True, source="raw_materials")
+    # Rows are loaded in bulk by the view, see OrderProductMaterialListAPIView
+    product_materials = OrderItemRawMaterialsSerializer(many=True, source="materials")
 
     class Meta:
         model = OrderItem
         fields = ("id", "product", "quantity", "product_materials")
+
+
+class OrderItemRawMaterialsValuesSerializer(ValuesSerializer):
+    fields = {
+        "material_name": "raw_material__name",
+        "warehouse_batch": "warehouse_batch_id",
+        "quantity": "quantity",
+        "unit": "unit",
+        "price": "price",
+    }
+    extra_lookups = ("order_item_id",)
+
+
+class OrderProductMaterialValuesSerializer(ValuesSerializer):
+    fields = {"id": "id", "product": "product__name", "quantity": "quantity"}
+    extra_lookups = ()
+
+    @classmethod
+    def serialize(cls, rows):
+        items = super().serialize(rows)
+        return cls.add_product_materials(items, cls.material_rows(items))
+
+    @classmethod
+    async def aserialize(cls, rows):
+        items = super().serialize(rows)
+        return cls.add_product_materials(items, [row async for row in cls.material_rows(items)])
+
+    @classmethod
+    def material_rows(cls, items):
+        # Rows of all items are loaded with a single query
+        return OrderItemRawMaterialsValuesSerializer.values(
+            OrderItemRawMaterials.objects.filter(order_item_id__in=[item["id"] for item in items]).order_by("id")
+        )
+
+    @classmethod
+    def add_product_materials(cls, items, material_rows):
+        product_materials = defaultdict(list)
+        for material_row in material_rows:
+            product_materials[material_row["order_item_id"]].append(
+                OrderItemRawMaterialsValuesSerializer.to_representation(material_row)
+            )
+        for item in items:
+            item["product_materials"] = product_materials[item["id"]]
+        return items
@@ -1,11 +1,20 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
+from apps.common.renderers import ORJSONRenderer
 from apps.users.models import User
 from apps.warehouse.models import (Order, OrderItem, Product,
                                    ProductRawMaterial, RawMaterial,
                                    WarehouseBatch)
 
+from .serializers import OrderProductMaterialSerializer
+
 
 class OrderProductMaterialsTest(APITestCase):
     def setUp(self):
@@ -192,3 +201,90 @@ class OrderProductMaterialsTest(APITestCase):
         self.assertEqual(self.warehouse_batch_3.remainder, 20)
         self.assertEqual(self.warehouse_batch_4.remainder, 40)
         self.assertEqual(self.warehouse_batch_5.remainder, 25)
+
+    def create_order(self, items_count):
+        order = Order.objects.create(user=self.user)
+        for index in range(items_count):
+            OrderItem.objects.create(order=order, product=[self.product_1, self.product_2][index % 2], quantity=1)
+        order.calculate_materials()
+        return order
+
+    def test_query_count_does_not_depend_on_order_size(self):
+        small_order = self.create_order(1)
+        large_order = self.create_order(10)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.get(self.url(small_order.id))
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.client.get(self.url(large_order.id))
+        self.assertEqual(len(small_queries.captured_queries), len(large_queries.captured_queries))
+        self.assertEqual(len(response.json()["results"]), 10)
+        self.assertEqual(len(response.json()["results"][1]["product_materials"]), 2)
+
+    def test_stream_order_product_materials(self):
+        order = self.create_order(25)
+        expected = []
+        offset = 0
+        while offset is not None:
+            page = self.client.get(self.url(order.id), {"offset": offset}).json()
+            expected.extend(page["results"])
+            offset = offset + 10 if page["next"] else None
+
+        response = self.client.get(self.url(order.id), {"stream": "ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([json.loads(line) for line in b"".join(response.streaming_content).splitlines()], expected)
+
+        response = self.client.get(self.url(order.id), {"stream": "json"})
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), expected)
+
+    def test_stream_empty_order(self):
+        order = Order.objects.create(user=self.user)
+        response = self.client.get(self.url(order.id), {"stream": "json"})
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), [])
+
+        response = self.client.get(self.url(order.id), {"stream": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_values_serializer_matches_serializer(self):
+        order = self.create_order(4)
+        items = OrderItem.objects.filter(order=order).order_by("id")
+        for item in items:
+            item.materials = list(item.raw_materials.order_by("id"))
+
+        response = self.client.get(self.url(order.id))
+        self.assertEqual(
+            response.content,
+            ORJSONRenderer().render(
+                {
+                    "count": 4,
+                    "next": None,
+                    "previous": None,
+                    "results": OrderProductMaterialSerializer(items, many=True).data,
+                }
+            ),
+        )
+
+
+@override_settings(ROOT_URLCONF="apps.warehouse.tests")
+class AsyncOrderProductMaterialsTest(OrderProductMaterialsTest):
+    """
+    The same tests against the async view.
+    """
+
+    def test_stream_under_asgi(self):
+        order = self.create_order(25)
+        expected = self.client.get(self.url(order.id), {"stream": "ndjson"}).getvalue()
+        self.async_client.force_login(self.user)
+
+        async def stream(query):
+            response = await self.async_client.get(self.url(order.id), query)
+            return response, b"".join([part async for part in response.streaming_content])
+
+        response, content = async_to_sync(stream)({"stream": "ndjson"})
+        self.assertTrue(response.is_async)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(content, expected)
+        response, content = async_to_sync(stream)({"stream": "json"})
+        self.assertEqual(json.loads(content), [json.loads(line) for line in expected.splitlines()])
@@ -1,17 +1,144 @@
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.common.pagination import AsyncLimitOffsetPagination
+from apps.common.serializers import ValuesListMixin
+from apps.common.views import AsyncAPIViewMixin
+from apps.warehouse.models import OrderItem, OrderItemRawMaterials
+
+from .serializers import (OrderItemRawMaterialsValuesSerializer,
+                          OrderProductMaterialSerializer,
+                          OrderProductMaterialValuesSerializer)
 
-from apps.warehouse.models import OrderItem
 
-from .serializers import OrderProductMaterialSerializer
+class OrderProductMaterialListAPIView(ValuesListMixin, ListAPIView):
+    """
+    Items of an order with their allocated materials, loaded with a constant number of queries.
 
+    ``stream=ndjson`` (one item per line) or ``stream=json`` (a single array) returns all items unpaginated as a
+    stream: items and rows are read with server-side chunked iterators and every item is serialized as soon as its
+    rows are read, so the memory does not grow with the size of the order.
+    """
 
-class OrderProductMaterialListAPIView(ListAPIView):
     serializer_class = OrderProductMaterialSerializer
+    values_serializer_class = OrderProductMaterialValuesSerializer
     permission_classes = (IsAuthenticated,)
+    stream_query_param = "stream"
+    stream_chunk_size = 2000
 
     def get_queryset(self):
-        return OrderItem.objects.filter(order_id=self.kwargs["order_id"], order__user=self.request.user)
+        return (
+            OrderItem.objects.filter(order_id=self.kwargs["order_id"], order__user=self.request.user)
+            .select_related("product")
+            .order_by("id")
+        )
+
+    def get_rows(self):
+        return OrderItemRawMaterials.objects.filter(
+            order_item__order_id=self.kwargs["order_id"], order_item__order__user=self.request.user
+        )
+
+    def list(self, request, *args, **kwargs):
+        stream = request.query_params.get(self.stream_query_param)
+        if stream is None:
+            return super().list(request, *args, **kwargs)
+        if stream == "ndjson":
+            lines = (json.dumps(data, cls=JSONEncoder) + "\n" for data in self.stream_data())
+            return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+        if stream == "json":
+            return StreamingHttpResponse(self.stream_array(), content_type="application/json")
+        raise ValidationError({self.stream_query_param: ['Expected "ndjson" or "json".']})
+
+    def get_stream_querysets(self):
+        """
+        Items and their rows ordered the same way, see ``stream_data``.
+        """
+        items = OrderProductMaterialValuesSerializer.values(self.get_queryset())
+        rows = OrderItemRawMaterialsValuesSerializer.values(self.get_rows().order_by("order_item_id", "id"))
+        return items, rows
+
+    def filter_queryset(self, queryset):
+        # Rows of the items of the page are loaded with a single query
+        queryset = super().filter_queryset(queryset)
+        rows = OrderItemRawMaterials.objects.select_related("raw_material").order_by("id")
+        return queryset.prefetch_related(Prefetch("raw_materials", queryset=rows, to_attr="materials"))
+
+    def stream_data(self):
+        """
+        Serialized items, merged with their rows from a second iterator ordered the same way.
+        """
+        items, rows = self.get_stream_querysets()
+        items = items.iterator(chunk_size=self.stream_chunk_size)
+        rows = rows.iterator(chunk_size=self.stream_chunk_size)
+        row = next(rows, None)
+        for item in items:
+            data = OrderProductMaterialValuesSerializer.to_representation(item)
+            data["product_materials"] = []
+            while row is not None and row["order_item_id"] == item["id"]:
+                data["product_materials"].append(OrderItemRawMaterialsValuesSerializer.to_representation(row))
+                row = next(rows, None)
+            yield data
+
+    def stream_array(self):
+        separator = "["
+        for data in self.stream_data():
+            yield separator + json.dumps(data, cls=JSONEncoder)
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+
+class AsyncOrderProductMaterialListAPIView(AsyncAPIViewMixin, OrderProductMaterialListAPIView):
+    pagination_class = AsyncLimitOffsetPagination
+
+    async def get(self, request, *args, **kwargs):
+        stream = request.query_params.get(self.stream_query_param)
+        if stream is None:
+            return await self.alist(request, *args, **kwargs)
+        if not isinstance(request._request, ASGIRequest):
+            # WSGI servers consume streams synchronously, an async one would be read into memory first
+            return self.list(request, *args, **kwargs)
+        if stream == "ndjson":
+            return StreamingHttpResponse(self.astream_lines(), content_type="application/x-ndjson")
+        if stream == "json":
+            return StreamingHttpResponse(self.astream_array(), content_type="application/json")
+        raise ValidationError({self.stream_query_param: ['Expected "ndjson" or "json".']})
+
+    async def astream_data(self):
+        items, rows = self.get_stream_querysets()
+        rows = rows.aiterator(chunk_size=self.stream_chunk_size)
+
+        async def next_row():
+            try:
+                return await rows.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        row = await next_row()
+        async for item in items.aiterator(chunk_size=self.stream_chunk_size):
+            data = OrderProductMaterialValuesSerializer.to_representation(item)
+            data["product_materials"] = []
+            while row is not None and row["order_item_id"] == item["id"]:
+                data["product_materials"].append(OrderItemRawMaterialsValuesSerializer.to_representation(row))
+                row = await next_row()
+            yield data
+
+    async def astream_lines(self):
+        async for data in self.astream_data():
+            yield json.dumps(data, cls=JSONEncoder) + "\n"
+
+    async def astream_array(self):
+        separator = "["
+        async for data in self.astream_data():
+            yield separator + json.dumps(data, cls=JSONEncoder)
+            separator = ","
+        yield "[]" if separator == "[" else "]"
 
 
-__all__ = ["OrderProductMaterialListAPIView"]
+__all__ = ["OrderProductMaterialListAPIView", "AsyncOrderProductMaterialListAPIView"]
@@ -0,0 +1,13 @@
+from rest_framework import serializers
+
+
+class ProductBuildableSerializer(serializers.Serializer):
+    product = serializers.IntegerField(source="product_id")
+    name = serializers.CharField()
+    code = serializers.CharField()
+    buildable_quantity = serializers.IntegerField(
+        source="quantity", allow_null=True, help_text="Null when the product needs no raw materials"
+    )
+    bottleneck_raw_material = serializers.IntegerField(
+        source="bottleneck_raw_material_id", allow_null=True, help_text="The raw material which runs out first"
+    )
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.warehouse.models import (Product, ProductComponent,
+                                   ProductRawMaterial, RawMaterial,
+                                   WarehouseBatch)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ProductBuildableListAPITest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.raw_material_1 = RawMaterial.objects.create(name="RawMaterial1", unit="m")
+        self.raw_material_2 = RawMaterial.objects.create(name="RawMaterial2", unit="kg")
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material_1, quantity=2)
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material_2, quantity=0.5)
+        self.assembly = Product.objects.create(name="Assembly", code="AssemblyCode")
+        ProductComponent.objects.create(product=self.assembly, component=self.product, quantity=3)
+        self.empty_product = Product.objects.create(name="Empty", code="EmptyCode")
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=10, price=1)
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=3.5, price=1)
+        self.batch = WarehouseBatch.objects.create(raw_material=self.raw_material_2, remainder=4, price=1)
+
+        self.url = reverse("warehouse:product-buildable")
+
+    def get_results(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (row["product"], row["buildable_quantity"], row["bottleneck_raw_material"])
+            for row in response.json()["results"]
+        ]
+
+    def test_get_buildable_quantities(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(
+            response.json()["results"][0],
+            {
+                "product": self.product.id,
+                "name": "Product",
+                "code": "ProductCode",
+                # 13.5 m / 2 m and 4 kg / 0.5 kg
+                "buildable_quantity": 6,
+                "bottleneck_raw_material": self.raw_material_1.id,
+            },
+        )
+        # An assembly needs 6 m and 1.5 kg; a product without raw materials is not limited
+        self.assertEqual(
+            self.get_results()[1:],
+            [(self.assembly.id, 2, self.raw_material_1.id), (self.empty_product.id, None, None)],
+        )
+
+    def test_results_are_cached_until_stock_changes(self):
+        self.get_results()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_results()[0], (self.product.id, 6, self.raw_material_1.id))
+
+        self.batch.remainder = 1
+        self.batch.save()
+
+        self.assertEqual(self.get_results()[0], (self.product.id, 2, self.raw_material_2.id))
+
+    def test_results_are_cached_until_bom_changes(self):
+        self.get_results()
+
+        ProductRawMaterial.objects.filter(product=self.product, raw_material=self.raw_material_1).delete()
+
+        self.assertEqual(
+            self.get_results()[:2],
+            [(self.product.id, 8, self.raw_material_2.id), (self.assembly.id, 2, self.raw_material_2.id)],
+        )
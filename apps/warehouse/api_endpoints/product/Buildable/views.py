@@ -0,0 +1,23 @@
+from rest_framework.generics import ListAPIView
+
+from apps.warehouse.buildable import get_buildable
+
+from .serializers import ProductBuildableSerializer
+
+
+class ProductBuildableListAPIView(ListAPIView):
+    """
+    How many units of every product can be built from the current stock, and the raw material which runs out first.
+    Products are ordered by id. The quantities of all products are computed at once from the flattened BOMs and the
+    availability of the raw materials, and cached until a BOM or the stock changes.
+    """
+
+    serializer_class = ProductBuildableSerializer
+    # The rows are computed, not a queryset
+    filter_backends = []
+
+    def get_queryset(self):
+        return get_buildable()
+
+
+__all__ = ["ProductBuildableListAPIView"]
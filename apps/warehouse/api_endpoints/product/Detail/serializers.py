@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from apps.warehouse.models import Product, ProductRawMaterial, RawMaterial
+from apps.warehouse.models import Product, ProductComponent, RawMaterial
 
 
 class RawMaterialSerializer(serializers.ModelSerializer):
@@ -9,17 +9,32 @@ class RawMaterialSerializer(serializers.ModelSerializer):
         fields = ("id", "name")
 
 
-class ProductRawMaterialSerializer(serializers.ModelSerializer):
+class ProductRawMaterialSerializer(serializers.Serializer):
     raw_material = RawMaterialSerializer()
+    # Quantities of components are multiplied without rounding, see apps.warehouse.bom.required_quantity
+    quantity = serializers.DecimalField(max_digits=None, decimal_places=None)
+    unit = serializers.CharField(allow_null=True)
+
+
+class ComponentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ("id", "name", "code")
+
+
+class ProductComponentSerializer(serializers.ModelSerializer):
+    component = ComponentSerializer()
 
     class Meta:
-        model = ProductRawMaterial
-        fields = ("raw_material", "quantity", "unit")
+        model = ProductComponent
+        fields = ("component", "quantity")
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
-    raw_materials = ProductRawMaterialSerializer(many=True)
+    # Raw materials of all levels of sub-assemblies, for a single unit of the product
+    raw_materials = ProductRawMaterialSerializer(many=True, source="flattened_raw_materials")
+    components = ProductComponentSerializer(many=True)
 
     class Meta:
         model = Product
-        fields = ("id", "name", "code", "raw_materials")
+        fields = ("id", "name", "code", "raw_materials", "components")
@@ -1,7 +1,10 @@
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
-from apps.warehouse.models import Product, ProductRawMaterial, RawMaterial
+from apps.warehouse.models import (Product, ProductComponent,
+                                   ProductRawMaterial, RawMaterial)
 
 
 class ProductDetailAPITest(APITestCase):
@@ -28,7 +31,105 @@ class ProductDetailAPITest(APITestCase):
         self.assertEqual(response.json()["raw_materials"][0]["quantity"], 4.0)
         self.assertEqual(response.json()["raw_materials"][0]["unit"], "m")
 
+    def test_get_product_detail_with_components(self):
+        assembly = Product.objects.create(name="Assembly", code="AssemblyCode")
+        raw_material_3 = RawMaterial.objects.create(name="RawMaterial3", unit="kg")
+        ProductRawMaterial.objects.create(product=assembly, raw_material=raw_material_3, quantity=1)
+        ProductComponent.objects.create(product=assembly, component=self.product, quantity=3)
+
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url(assembly.pk))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["components"][0]["component"]["id"], self.product.id)
+        self.assertEqual(response.json()["components"][0]["quantity"], 3.0)
+        self.assertEqual(
+            [
+                (raw_material["raw_material"]["name"], raw_material["quantity"], raw_material["unit"])
+                for raw_material in response.json()["raw_materials"]
+            ],
+            [("RawMaterial3", 1.0, "kg"), ("RawMaterial1", 12.0, "m"), ("RawMaterial2", 6.0, "pcs")],
+        )
+
+    def test_get_product_detail_with_repeated_raw_materials(self):
+        assembly = Product.objects.create(name="Assembly", code="AssemblyCode")
+        ProductRawMaterial.objects.create(product=assembly, raw_material=self.raw_material_1, quantity="0.5")
+        ProductComponent.objects.create(product=assembly, component=self.product, quantity="0.25")
+        ProductRawMaterial.objects.filter(product=self.product, raw_material=self.raw_material_2).update(quantity="0.5")
+
+        response = self.client.get(self.url(assembly.pk))
+
+        # Every line is listed, quantities of components are not rounded
+        self.assertEqual(
+            [
+                (raw_material["raw_material"]["name"], raw_material["quantity"])
+                for raw_material in response.json()["raw_materials"]
+            ],
+            [("RawMaterial1", 0.5), ("RawMaterial1", 1.0), ("RawMaterial2", 0.125)],
+        )
+
     def test_get_invalid_product_detail(self):
         response = self.client.get(self.url(100))
         self.assertEqual(response.status_code, 404)
         self.assertDictEqual(response.json(), {"detail": "Not found."})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ProductDetailCacheAPITest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material, quantity=4)
+        self.url = reverse("warehouse:product-detail", kwargs={"pk": self.product.pk})
+
+    def test_cached_product_detail(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response["ETag"], r'^"[0-9a-f]{64}"$')
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.url)
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cached_response["ETag"], response["ETag"])
+        self.assertEqual(cached_response.json()["raw_materials"][0]["raw_material"]["name"], "RawMaterial")
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_changes_invalidate_cached_product_detail(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.raw_material.name = "Renamed"
+        self.raw_material.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["raw_materials"][0]["raw_material"]["name"], "Renamed")
+
+        # An unrelated change replaces the cache entry but not the content, the ETag stays valid
+        Product.objects.create(name="Other", code="OtherCode")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+@override_settings(ROOT_URLCONF="apps.warehouse.tests")
+class AsyncProductDetailAPITest(ProductDetailAPITest):
+    """
+    The same tests against the async view.
+    """
+
+
+@override_settings(ROOT_URLCONF="apps.warehouse.tests")
+class AsyncProductDetailCacheAPITest(ProductDetailCacheAPITest):
+    """
+    The same tests against the async view.
+    """
@@ -1,13 +1,113 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.generics import RetrieveAPIView
 
-from apps.warehouse.models import Product
+from apps.common.views import AsyncAPIViewMixin
+from apps.warehouse.bom import get_bom, get_bom_version
+from apps.warehouse.models import Product, ProductComponent, RawMaterial
 
 from .serializers import ProductDetailSerializer
 
 
 class ProductDetailAPIView(RetrieveAPIView):
+    """
+    The rendered JSON is cached under the BOM version stamp, which is replaced on every change of products, their
+    components, raw materials and BOM lines (see ``apps.warehouse.signals``), so a stale detail is never served.
+    Responses carry a strong ETag of the content; a request with a matching ``If-None-Match`` gets 304 from the cache
+    without touching the database.
+    """
+
     serializer_class = ProductDetailSerializer
-    queryset = Product.objects.all()
+    queryset = Product.objects.prefetch_related(
+        Prefetch("components", queryset=ProductComponent.objects.select_related("component").order_by("id"))
+    )
+
+    def get_object(self):
+        product = super().get_object()
+        lines = get_bom([product.pk])[product.pk]
+        raw_materials = RawMaterial.objects.in_bulk([line.raw_material_id for line in lines])
+        self.set_flattened_raw_materials(product, lines, raw_materials)
+        return product
+
+    def set_flattened_raw_materials(self, product, lines, raw_materials):
+        product.flattened_raw_materials = [
+            {"raw_material": raw_materials[line.raw_material_id], "quantity": line.quantity, "unit": line.unit}
+            for line in lines
+        ]
+
+    def retrieve(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if renderer.format != "json":
+            # The browsable API is not cached
+            return super().retrieve(request, *args, **kwargs)
+
+        version = get_bom_version()
+        key = self.get_cache_key(version)
+        cached = cache.get(key) if version is not None else None
+        if cached is None:
+            cached = self.render_product(self.get_object())
+            if version is not None:
+                cache.set(key, cached, timeout=settings.WAREHOUSE_BOM_CACHE_TIMEOUT)
+        return self.get_cached_response(request, cached)
+
+    def get_cache_key(self, version):
+        return f"product-detail:{version}:{self.kwargs[self.lookup_url_kwarg or self.lookup_field]}"
+
+    def render_product(self, product):
+        """
+        The ETag and the rendered JSON of the product.
+        """
+        renderer = self.request.accepted_renderer
+        content = renderer.render(self.get_serializer(product).data, renderer.media_type, self.get_renderer_context())
+        return quote_etag(hashlib.sha256(content).hexdigest()), content
+
+    def get_cached_response(self, request, cached):
+        renderer = request.accepted_renderer
+        etag, content = cached
+        # If-None-Match uses the weak comparison
+        client_etags = [
+            client_etag.replace("W/", "", 1) for client_etag in parse_etags(request.headers.get("If-None-Match", ""))
+        ]
+        if etag in client_etags or "*" in client_etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=renderer.media_type)
+        response["ETag"] = etag
+        return response
+
+
+class AsyncProductDetailAPIView(AsyncAPIViewMixin, ProductDetailAPIView):
+    async def get(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return await sync_to_async(self.retrieve)(request, *args, **kwargs)
+
+        version = await sync_to_async(get_bom_version)()
+        key = self.get_cache_key(version)
+        cached = await cache.aget(key) if version is not None else None
+        if cached is None:
+            cached = self.render_product(await self.aget_object())
+            if version is not None:
+                await cache.aset(key, cached, timeout=settings.WAREHOUSE_BOM_CACHE_TIMEOUT)
+        return self.get_cached_response(request, cached)
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            product = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except Product.DoesNotExist:
+            raise Http404
+        self.check_object_permissions(self.request, product)
+        lines = (await sync_to_async(get_bom)([product.pk]))[product.pk]
+        raw_materials = await RawMaterial.objects.ain_bulk([line.raw_material_id for line in lines])
+        self.set_flattened_raw_materials(product, lines, raw_materials)
+        return product
 
 
-__all__ = ["ProductDetailAPIView"]
+__all__ = ["ProductDetailAPIView", "AsyncProductDetailAPIView"]
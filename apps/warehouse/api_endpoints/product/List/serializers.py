@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from apps.common.serializers import ValuesSerializer
 from apps.warehouse.models import Product
 
 
@@ -7,3 +8,7 @@ class ProductListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ("id", "name", "code")
+
+
+class ProductListValuesSerializer(ValuesSerializer):
+    fields = {"id": "id", "name": "name", "code": "code"}
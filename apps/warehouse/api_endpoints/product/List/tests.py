@@ -1,8 +1,13 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
 from apps.warehouse.models import Product
 
+from .serializers import ProductListSerializer
+
 
 class ProductListAPITest(APITestCase):
     def setUp(self):
@@ -23,3 +28,56 @@ class ProductListAPITest(APITestCase):
         self.assertEqual(response.json()["count"], 2)
         self.assertEqual(response.json()["results"][0]["name"], self.product_1.name)
         self.assertEqual(response.json()["results"][1]["name"], self.product_2.name)
+
+    def test_get_product_list_with_keyset_pagination(self):
+        products = [self.product_1, self.product_2] + [
+            Product.objects.create(name=f"Product{index}", code="ProductCode") for index in range(3, 8)
+        ]
+
+        response = self.client.get(self.url, {"pagination": "keyset", "limit": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("count", response.json())
+        self.assertIsNone(response.json()["previous"])
+        pages = [[product["id"] for product in response.json()["results"]]]
+        while response.json()["next"]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(response.json()["next"])
+            # A single query per page, without COUNT or OFFSET
+            self.assertEqual(len(queries.captured_queries), 1)
+            self.assertNotIn("COUNT", queries.captured_queries[0]["sql"])
+            self.assertNotIn("OFFSET", queries.captured_queries[0]["sql"])
+            pages.append([product["id"] for product in response.json()["results"]])
+        product_ids = [product.id for product in products]
+        self.assertEqual(pages, [product_ids[:3], product_ids[3:6], product_ids[6:]])
+
+        response = self.client.get(response.json()["previous"])
+        self.assertEqual([product["id"] for product in response.json()["results"]], pages[1])
+        self.assertIsNotNone(response.json()["next"])
+        response = self.client.get(response.json()["previous"])
+        self.assertEqual([product["id"] for product in response.json()["results"]], pages[0])
+        self.assertIsNone(response.json()["previous"])
+
+    def test_get_product_list_with_keyset_pagination_and_approximate_count(self):
+        response = self.client.get(self.url, {"pagination": "keyset", "approximate_count": "true"})
+        self.assertEqual(response.status_code, 200)
+        # SQLite has no planner statistics, the count is exact there
+        self.assertGreater(response.json()["count"], 0)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_get_product_list_with_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {"detail": "Invalid cursor"})
+
+    def test_values_serializer_matches_serializer(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.json()["results"], ProductListSerializer(Product.objects.order_by("id"), many=True).data
+        )
+
+
+@override_settings(ROOT_URLCONF="apps.warehouse.tests")
+class AsyncProductListAPITest(ProductListAPITest):
+    """
+    The same tests against the async view.
+    """
@@ -1,13 +1,23 @@
 from rest_framework.generics import ListAPIView
 
+from apps.common.pagination import OptionalKeysetPagination
+from apps.common.serializers import ValuesListMixin
+from apps.common.views import AsyncAPIViewMixin
 from apps.warehouse.models import Product
 
-from .serializers import ProductListSerializer
+from .serializers import ProductListSerializer, ProductListValuesSerializer
 
 
-class ProductListAPIView(ListAPIView):
+class ProductListAPIView(ValuesListMixin, ListAPIView):
     serializer_class = ProductListSerializer
+    values_serializer_class = ProductListValuesSerializer
+    pagination_class = OptionalKeysetPagination
     queryset = Product.objects.all()
 
 
-__all__ = ["ProductListAPIView"]
+class AsyncProductListAPIView(AsyncAPIViewMixin, ProductListAPIView):
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
+__all__ = ["ProductListAPIView", "AsyncProductListAPIView"]
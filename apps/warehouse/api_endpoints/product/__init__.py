@@ -1,2 +1,3 @@
+from .Buildable import *  # noqa
 from .Detail import *  # noqa
 from .List import *  # noqa
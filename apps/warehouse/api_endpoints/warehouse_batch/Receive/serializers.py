@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+from apps.warehouse.models import WarehouseBatch
+
+
+class ReceivedBatchSerializer(serializers.ModelSerializer):
+    """
+    A single line of a manifest.
+    """
+
+    raw_material = serializers.IntegerField()
+
+    class Meta:
+        model = WarehouseBatch
+        fields = ("raw_material", "remainder", "price", "expiry_date")
+        extra_kwargs = {"remainder": {"min_value": 0}, "price": {"min_value": 0}}
+
+    def validate_raw_material(self, raw_material):
+        # Units of the raw materials are loaded once per manifest, see WarehouseBatchReceiveAPIView
+        if raw_material not in self.context["units"]:
+            raise serializers.ValidationError(f'Invalid pk "{raw_material}" - object does not exist.')
+        return raw_material
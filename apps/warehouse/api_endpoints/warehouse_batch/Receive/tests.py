@@ -0,0 +1,191 @@
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.users.models import User
+from apps.warehouse.api_endpoints import WarehouseBatchReceiveAPIView
+from apps.warehouse.models import RawMaterial, RawMaterialStock, WarehouseBatch
+from apps.warehouse.receiving import copy_batches
+
+
+class WarehouseBatchReceiveAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material_1 = RawMaterial.objects.create(name="RawMaterial1", unit="m")
+        self.raw_material_2 = RawMaterial.objects.create(name="RawMaterial2", unit="kg")
+        self.old_batch = WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=5, price=1)
+        self.url = reverse("warehouse:batch-receive")
+        self.client.force_authenticate(user=self.user)
+
+    def post_csv(self, rows):
+        return self.client.post(self.url, data="\n".join(rows).encode(), content_type="text/csv")
+
+    def post_ndjson(self, lines):
+        return self.client.post(self.url, data="\n".join(lines).encode(), content_type="application/x-ndjson")
+
+    def test_receive_csv(self):
+        response = self.post_csv(
+            [
+                "raw_material,remainder,price,expiry_date",
+                f"{self.raw_material_1.id},10.5,2.5,2030-01-31",
+                "",
+                f"{self.raw_material_2.id},3,4,",
+                "100,1,1,",
+                f"{self.raw_material_2.id},-1,4,",
+            ]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["received"], 2)
+        self.assertEqual(
+            response.json()["errors"],
+            [
+                {"line": 5, "errors": {"raw_material": ['Invalid pk "100" - object does not exist.']}},
+                {"line": 6, "errors": {"remainder": ["Ensure this value is greater than or equal to 0."]}},
+            ],
+        )
+        self.assertEqual(
+            list(
+                WarehouseBatch.objects.exclude(pk=self.old_batch.pk)
+                .order_by("id")
+                .values_list("raw_material_id", "remainder", "unit", "price", "expiry_date")
+            ),
+            [
+                (self.raw_material_1.id, Decimal("10.5"), "m", 2.5, date(2030, 1, 31)),
+                (self.raw_material_2.id, Decimal("3"), "kg", 4.0, None),
+            ],
+        )
+
+    def test_receive_ndjson(self):
+        response = self.post_ndjson(
+            [
+                json.dumps({"raw_material": self.raw_material_1.id, "remainder": 1, "price": 1}),
+                "{not json",
+                json.dumps({"raw_material": self.raw_material_2.id, "price": 1}),
+                json.dumps({"raw_material": self.raw_material_2.id, "remainder": 2, "price": 3}),
+            ]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json(),
+            {
+                "received": 2,
+                "errors_count": 2,
+                "errors": [
+                    {"line": 2, "errors": {"non_field_errors": ["Invalid JSON."]}},
+                    {"line": 3, "errors": {"remainder": ["This field is required."]}},
+                ],
+            },
+        )
+        self.assertEqual(WarehouseBatch.objects.filter(raw_material=self.raw_material_2, unit="kg").count(), 1)
+
+    def test_receive_updates_stock(self):
+        self.post_csv(
+            [
+                "raw_material,remainder,price",
+                f"{self.raw_material_1.id},10,1",
+                f"{self.raw_material_1.id},0,1",
+                f"{self.raw_material_2.id},2.5,1",
+            ]
+        )
+
+        new_batch = WarehouseBatch.objects.get(raw_material=self.raw_material_2)
+        self.assertEqual(
+            list(
+                RawMaterialStock.objects.order_by("raw_material_id").values_list(
+                    "raw_material_id", "total_remainder", "batches_count", "oldest_batch_id"
+                )
+            ),
+            [
+                (self.raw_material_1.id, Decimal("15"), 2, self.old_batch.id),
+                (self.raw_material_2.id, Decimal("2.5"), 1, new_batch.id),
+            ],
+        )
+
+    @override_settings(WAREHOUSE_IMPORT_CHUNK_SIZE=2)
+    def test_queries_do_not_grow_with_lines(self):
+        def count_queries(lines):
+            rows = ["raw_material,remainder,price"]
+            rows += [f"{self.raw_material_1.id},1,1" for _ in range(lines)]
+            with CaptureQueriesContext(connection) as context:
+                response = self.post_csv(rows)
+            self.assertEqual(response.json()["received"], lines)
+            return len(context.captured_queries)
+
+        # A single insert per chunk, the units and the stock once per manifest
+        self.assertEqual(count_queries(20) - count_queries(10), 5)
+
+    @override_settings(WAREHOUSE_IMPORT_CHUNK_SIZE=2)
+    def test_errors_are_capped(self):
+        rows = ["raw_material,remainder,price"] + [f"{self.raw_material_1.id},-1,1"] * 150
+        rows += [f"{self.raw_material_1.id},1,1"] * 5
+
+        with mock.patch.object(WarehouseBatchReceiveAPIView, "max_errors", 3):
+            response = self.post_csv(rows)
+
+        self.assertEqual(response.json()["received"], 5)
+        self.assertEqual(response.json()["errors_count"], 150)
+        self.assertEqual([error["line"] for error in response.json()["errors"]], [2, 3, 4])
+        self.assertEqual(RawMaterialStock.objects.get(raw_material=self.raw_material_1).total_remainder, 10)
+
+    def test_invalid_csv_encoding(self):
+        response = self.client.post(self.url, data=b"raw_material,remainder\n\xff,1", content_type="text/csv")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(WarehouseBatch.objects.count(), 1)
+
+    def test_copy_batches(self):
+        batch = WarehouseBatch(raw_material_id=self.raw_material_1.id, remainder=Decimal("1.5"), unit="m", price=2)
+        cursor = mock.MagicMock()
+
+        with mock.patch.object(connection, "cursor") as connection_cursor:
+            connection_cursor.return_value.__enter__.return_value = cursor
+            copy_batches([batch])
+
+        sql, buffer = cursor.copy_expert.call_args.args
+        self.assertEqual(
+            sql,
+            'COPY "warehouse_warehousebatch" ("created_at", "updated_at", "raw_material_id", "remainder", "unit", '
+            '"price", "expiry_date") FROM STDIN WITH (FORMAT csv)',
+        )
+        created_at, updated_at, *values = buffer.getvalue().rstrip("\r\n").split(",")
+        self.assertEqual(values, [str(self.raw_material_1.id), "1.50", "m", "2.0", ""])
+        # Timestamps are set like on an insert
+        self.assertIsNotNone(batch.created_at)
+        self.assertTrue(created_at and updated_at)
+
+    @skipUnless(connection.vendor == "postgresql", "COPY is only used on PostgreSQL")
+    def test_copy_batches_on_postgresql(self):
+        copy_batches(
+            [
+                WarehouseBatch(
+                    raw_material_id=self.raw_material_1.id,
+                    remainder=Decimal("1.5"),
+                    unit="m",
+                    price=2.5,
+                    expiry_date=date(2030, 1, 31),
+                ),
+                WarehouseBatch(raw_material_id=self.raw_material_2.id, remainder=3, unit=None, price=4),
+            ]
+        )
+
+        batches = WarehouseBatch.objects.exclude(pk=self.old_batch.pk).order_by("id")
+        self.assertEqual(
+            list(batches.values_list("raw_material_id", "remainder", "unit", "price", "expiry_date")),
+            [
+                (self.raw_material_1.id, Decimal("1.50"), "m", 2.5, date(2030, 1, 31)),
+                (self.raw_material_2.id, Decimal("3.00"), None, 4.0, None),
+            ],
+        )
+        self.assertFalse(batches.filter(created_at__isnull=True).exists())
@@ -0,0 +1,72 @@
+import json
+
+from rest_framework import status
+from rest_framework.generics import GenericAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from apps.common.parsers import CSVParser, NDJSONParser
+from apps.warehouse.models import WarehouseBatch
+from apps.warehouse.receiving import raw_material_units, receive_batches
+
+from .serializers import ReceivedBatchSerializer
+
+
+class WarehouseBatchReceiveAPIView(GenericAPIView):
+    """
+    Receives a delivery manifest: a warehouse batch per line, as CSV with a header row (``text/csv``) or as NDJSON
+    (``application/x-ndjson``). Returns the number of received batches, the number of skipped lines and the errors of
+    the first 100 of them.
+
+    The body is read line by line and the batches are inserted in chunks of ``WAREHOUSE_IMPORT_CHUNK_SIZE`` in a
+    single transaction, so the memory does not grow with the size of the manifest. Units of the batches are copied
+    from their raw materials, which are loaded once per manifest; the availability of the raw materials is updated
+    once per manifest as well.
+    """
+
+    serializer_class = ReceivedBatchSerializer
+    parser_classes = [CSVParser, NDJSONParser]
+    permission_classes = [IsAuthenticated]
+    # Errors of the lines after these are only counted
+    max_errors = 100
+
+    def post(self, request, *args, **kwargs):
+        self.errors = []
+        self.errors_count = 0
+        received = receive_batches(self.read_batches(request.data))
+        return Response(
+            {"received": received, "errors_count": self.errors_count, "errors": self.errors},
+            status=status.HTTP_201_CREATED,
+        )
+
+    def add_error(self, line_number, errors):
+        self.errors_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_number, "errors": errors})
+
+    def read_batches(self, lines):
+        units = raw_material_units()
+        context = {**self.get_serializer_context(), "units": units}
+        for line_number, line in lines:
+            # CSV rows are already split into fields by the parser
+            if not isinstance(line, dict):
+                try:
+                    line = json.loads(line)
+                except ValueError:
+                    self.add_error(line_number, {"non_field_errors": ["Invalid JSON."]})
+                    continue
+            serializer = self.get_serializer_class()(data=line, context=context)
+            if not serializer.is_valid():
+                self.add_error(line_number, serializer.errors)
+                continue
+            data = serializer.validated_data
+            yield WarehouseBatch(
+                raw_material_id=data["raw_material"],
+                remainder=data["remainder"],
+                unit=units[data["raw_material"]],
+                price=data["price"],
+                expiry_date=data.get("expiry_date"),
+            )
+
+
+__all__ = ["WarehouseBatchReceiveAPIView"]
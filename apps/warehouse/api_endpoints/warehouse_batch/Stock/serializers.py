@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+from apps.warehouse.models import RawMaterialStock
+
+
+class RawMaterialStockSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="raw_material.name")
+    unit = serializers.CharField(source="raw_material.unit")
+    oldest_batch_created_at = serializers.DateTimeField(source="oldest_batch.created_at", default=None)
+
+    class Meta:
+        model = RawMaterialStock
+        fields = (
+            "raw_material",
+            "name",
+            "unit",
+            "total_remainder",
+            "batches_count",
+            "oldest_batch",
+            "oldest_batch_created_at",
+        )
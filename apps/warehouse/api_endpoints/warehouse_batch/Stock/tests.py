@@ -0,0 +1,48 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.warehouse.models import RawMaterial, WarehouseBatch
+
+
+class RawMaterialStockListAPITest(APITestCase):
+    def setUp(self):
+        self.raw_material_1 = RawMaterial.objects.create(name="RawMaterial1", unit="m")
+        self.raw_material_2 = RawMaterial.objects.create(name="RawMaterial2", unit="kg")
+        self.warehouse_batch_1 = WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=30, price=1)
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=20.5, price=2)
+        WarehouseBatch.objects.create(raw_material=self.raw_material_2, remainder=0, price=3)
+
+        self.url = reverse("warehouse:stock-list")
+
+    def test_get_stock_list(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # Raw material 2 never had stock
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(response.json()["results"][0]["raw_material"], self.raw_material_1.id)
+        self.assertEqual(response.json()["results"][0]["name"], self.raw_material_1.name)
+        self.assertEqual(response.json()["results"][0]["unit"], "m")
+        self.assertEqual(response.json()["results"][0]["total_remainder"], 50.5)
+        self.assertEqual(response.json()["results"][0]["batches_count"], 2)
+        self.assertEqual(response.json()["results"][0]["oldest_batch"], self.warehouse_batch_1.id)
+
+    def test_get_stock_list_of_used_up_raw_material(self):
+        WarehouseBatch.objects.filter(raw_material=self.raw_material_1).delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["total_remainder"], 0.0)
+        self.assertEqual(response.json()["results"][0]["batches_count"], 0)
+        self.assertEqual(response.json()["results"][0]["oldest_batch"], None)
+        self.assertEqual(response.json()["results"][0]["oldest_batch_created_at"], None)
+
+    def test_filter_stock_list_by_raw_material(self):
+        WarehouseBatch.objects.create(raw_material=self.raw_material_2, remainder=5, price=3)
+
+        response = self.client.get(self.url, {"raw_material": self.raw_material_2.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(response.json()["results"][0]["raw_material"], self.raw_material_2.id)
+        self.assertEqual(response.json()["results"][0]["total_remainder"], 5.0)
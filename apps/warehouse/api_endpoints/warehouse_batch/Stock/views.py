@@ -0,0 +1,14 @@
+from rest_framework.generics import ListAPIView
+
+from apps.warehouse.models import RawMaterialStock
+
+from .serializers import RawMaterialStockSerializer
+
+
+class RawMaterialStockListAPIView(ListAPIView):
+    serializer_class = RawMaterialStockSerializer
+    queryset = RawMaterialStock.objects.select_related("raw_material", "oldest_batch").order_by("raw_material_id")
+    filterset_fields = ("raw_material",)
+
+
+__all__ = ["RawMaterialStockListAPIView"]
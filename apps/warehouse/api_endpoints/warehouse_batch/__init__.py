@@ -0,0 +1,2 @@
+from .Receive import *  # noqa
+from .Stock import *  # noqa
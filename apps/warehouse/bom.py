@@ -0,0 +1,224 @@
+"""
+Bills of materials.
+
+A product consists of raw materials (``ProductRawMaterial``) and of other products used as sub-assemblies
+(``ProductComponent``). Explosion flattens this tree into the raw materials needed for a single unit of a product.
+
+Flattened BOMs are cached in the default cache (Redis) and in a per-process LRU in front of it. Cache keys contain a
+version stamp which is replaced whenever a BOM changes, see ``invalidate_bom_cache``.
+"""
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+from apps.warehouse.models import (Product, ProductComponent,
+                                   ProductRawMaterial, RawMaterial)
+
+# Quantities are stored with 2 decimal places
+QUANTITY_STEP = Decimal("0.01")
+
+
+class BOMLine(NamedTuple):
+    raw_material_id: int
+    quantity: Decimal
+    unit: Optional[str]
+    # Allocation strategy of the raw material
+    allocation_strategy: str = RawMaterial.AllocationStrategy.FIFO
+
+
+class BOMCycleError(ValueError):
+    pass
+
+
+def required_quantity(line: BOMLine, quantity: int) -> Decimal:
+    """
+    Quantity of the raw material of the line needed for ``quantity`` units of the product. Lines of components keep
+    the full precision of the multiplied quantities, the result is rounded once to the stored 2 decimal places.
+    """
+    return (line.quantity * quantity).quantize(QUANTITY_STEP, rounding=ROUND_HALF_UP)
+
+
+def subtree_sql(product_ids: Iterable[int]) -> RawSQL:
+    """
+    Ids of the given products and of all products they contain at any depth, as a recursive query which can be used
+    in ``__in`` lookups. UNION drops repeated rows, so the query terminates even if the components form a cycle.
+    """
+    product_ids = list(product_ids)
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    return RawSQL(
+        f"WITH RECURSIVE tree(product_id) AS ("
+        f"SELECT id FROM {Product._meta.db_table} WHERE id IN ({placeholders}) "
+        f"UNION SELECT component.component_id FROM {ProductComponent._meta.db_table} component "
+        f"JOIN tree ON component.product_id = tree.product_id"
+        f") SELECT product_id FROM tree",
+        product_ids,
+    )
+
+
+def subtree_ids(product_ids: Iterable[int]) -> Set[int]:
+    product_ids = set(product_ids)
+    if not product_ids:
+        return set()
+    return set(Product.objects.filter(pk__in=subtree_sql(product_ids)).values_list("pk", flat=True))
+
+
+def explode_bom(product_ids: Iterable[int]) -> Dict[int, List[BOMLine]]:
+    """
+    Returns the raw materials needed for a unit of each of the given products, over all levels of sub-assemblies.
+
+    The whole tree is loaded with two queries whatever its depth, and every product is flattened once however many
+    times it is used. Lines are kept as they are, so a raw material may be listed more than once: the own raw
+    materials of a product first, then the lines of its components multiplied by their quantities. The quantities are
+    not rounded, see ``required_quantity``. Raises BOMCycleError if a product contains itself.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    components: Dict[int, List[ProductComponent]] = defaultdict(list)
+    for component in ProductComponent.objects.filter(product_id__in=subtree_sql(product_ids)).order_by("id"):
+        components[component.product_id].append(component)
+    tree_ids = product_ids | {component.component_id for lines in components.values() for component in lines}
+    raw_materials: Dict[int, List[ProductRawMaterial]] = defaultdict(list)
+    for product_raw_material in (
+        ProductRawMaterial.objects.filter(product_id__in=tree_ids)
+        .annotate(allocation_strategy=F("raw_material__allocation_strategy"))
+        .order_by("id")
+    ):
+        raw_materials[product_raw_material.product_id].append(product_raw_material)
+
+    flattened: Dict[int, List[BOMLine]] = {}
+    # Products on the way from the exploded product to the current one, used to detect cycles
+    path: Dict[int, None] = {}
+
+    def flatten(product_id: int) -> List[BOMLine]:
+        if product_id in flattened:
+            return flattened[product_id]
+        if product_id in path:
+            ancestors = list(path)
+            start = ancestors.index(product_id)
+            cycle = ancestors[start:] + [product_id]
+            raise BOMCycleError(f"Product {product_id} contains itself: {' -> '.join(map(str, cycle))}")
+        path[product_id] = None
+
+        lines = [
+            BOMLine(
+                product_raw_material.raw_material_id,
+                product_raw_material.quantity,
+                product_raw_material.unit,
+                product_raw_material.allocation_strategy,
+            )
+            for product_raw_material in raw_materials[product_id]
+        ]
+        for component in components[product_id]:
+            # Not rounded, see required_quantity
+            lines.extend(
+                line._replace(quantity=line.quantity * component.quantity) for line in flatten(component.component_id)
+            )
+
+        del path[product_id]
+        flattened[product_id] = lines
+        return lines
+
+    return {product_id: flatten(product_id) for product_id in product_ids}
+
+
+BOM_VERSION_KEY = "bom:version"
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache which keeps at most ``maxsize`` of the recently used entries.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        return found
+
+    def set_many(self, entries: dict) -> None:
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+local_bom_cache = LRUCache(settings.WAREHOUSE_BOM_LOCAL_CACHE_SIZE)
+
+
+def get_bom_version() -> Optional[str]:
+    """
+    Returns the current version stamp of the cached BOMs, None when the cache is not available.
+    """
+    version = cache.get(BOM_VERSION_KEY)
+    if version is None:
+        # The first process to get here decides the version
+        cache.add(BOM_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(BOM_VERSION_KEY)
+    return version
+
+
+def invalidate_bom_cache() -> None:
+    """
+    Replaces the version stamp, so every cached BOM is computed again on the next use.
+
+    The stamp is replaced right away for the current transaction and once more after it is committed, so other
+    processes can not cache the old BOM in between.
+    """
+
+    def replace_version():
+        cache.set(BOM_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        local_bom_cache.clear()
+
+    replace_version()
+    transaction.on_commit(replace_version)
+
+
+def get_bom(product_ids: Iterable[int]) -> Dict[int, List[BOMLine]]:
+    """
+    Returns flattened BOMs of the given products like ``explode_bom``, from the cache where possible.
+    All products which are not cached are exploded together.
+    """
+    product_ids = set(product_ids)
+    version = get_bom_version()
+    if version is None:
+        # Without a shared cache other processes can not invalidate the local one
+        return explode_bom(product_ids)
+
+    keys = {product_id: f"bom:{version}:{product_id}" for product_id in product_ids}
+    found = local_bom_cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in found]
+    if missing:
+        shared = cache.get_many(missing)
+        local_bom_cache.set_many(shared)
+        found.update(shared)
+
+    missing_ids = [product_id for product_id, key in keys.items() if key not in found]
+    if missing_ids:
+        loaded = {keys[product_id]: lines for product_id, lines in explode_bom(missing_ids).items()}
+        cache.set_many(loaded, timeout=settings.WAREHOUSE_BOM_CACHE_TIMEOUT)
+        local_bom_cache.set_many(loaded)
+        found.update(loaded)
+    return {product_id: found[key] for product_id, key in keys.items()}
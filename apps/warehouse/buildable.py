@@ -0,0 +1,88 @@
+"""
+How many units of every product can be built from the current stock, and which raw material runs out first.
+
+Every product is reduced to its flattened BOM (see ``apps.warehouse.bom``) and compared with the available stock of
+the raw materials (``RawMaterialStock``), so nothing is allocated or written. Stock reserved by orders is already
+taken from the batches; orders allocated without a reservation are not taken into account.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.warehouse.bom import get_bom, get_bom_version
+from apps.warehouse.models import Product, RawMaterialStock
+from apps.warehouse.stock import get_stock_version
+
+
+class BuildableProduct(NamedTuple):
+    product_id: int
+    name: str
+    code: str
+    # None when the product needs no raw materials, so the stock does not limit it
+    quantity: Optional[int]
+    # The raw material which limits the quantity, the first one of the BOM on a tie
+    bottleneck_raw_material_id: Optional[int]
+
+
+# A line of a flattened BOM: (index of the product, raw material id, required quantity)
+BuildLine = Tuple[int, int, Decimal]
+
+
+def limit_products(products_count: int, lines: List[BuildLine], available: Dict[int, Decimal]) -> List[tuple]:
+    """
+    Walks over the lines of all products once, keeping the smallest quantity of every product and its raw material.
+    """
+    result: List[tuple] = [(None, None)] * products_count
+    for product_index, raw_material_id, required in lines:
+        quantity = int(available.get(raw_material_id, 0) // required)
+        if result[product_index][0] is None or quantity < result[product_index][0]:
+            result[product_index] = (quantity, raw_material_id)
+    return result
+
+
+def compute_buildable() -> List[BuildableProduct]:
+    """
+    Buildable quantities of all products ordered by id. The products, their BOMs (from the BOM cache where possible)
+    and the stock are loaded with a few queries whatever the number of products, then all products are computed in a
+    single pass over their BOM lines.
+    """
+    products = list(Product.objects.order_by("id").values_list("id", "name", "code"))
+    bom = get_bom(product_id for product_id, _, _ in products)
+    available = {
+        raw_material_id: max(total_remainder, 0)
+        for raw_material_id, total_remainder in RawMaterialStock.objects.values_list(
+            "raw_material_id", "total_remainder"
+        )
+    }
+    lines = []
+    for product_index, (product_id, _, _) in enumerate(products):
+        # A raw material may be listed more than once, in the order of its first line
+        required: Dict[int, Decimal] = defaultdict(Decimal)
+        for line in bom.get(product_id, []):
+            required[line.raw_material_id] += line.quantity
+        # Raw materials which are not needed do not limit the product
+        lines.extend((product_index, pk, quantity) for pk, quantity in required.items() if quantity > 0)
+
+    buildable = limit_products(len(products), lines, available)
+    return [
+        BuildableProduct(product_id, name, code, *limit) for (product_id, name, code), limit in zip(products, buildable)
+    ]
+
+
+def get_buildable() -> List[BuildableProduct]:
+    """
+    ``compute_buildable`` from the cache. The key contains the version stamps of the BOMs and of the stock, so the
+    result is computed again once either of them changes.
+    """
+    bom_version, stock_version = get_bom_version(), get_stock_version()
+    if bom_version is None or stock_version is None:
+        return compute_buildable()
+    key = f"buildable:{bom_version}:{stock_version}"
+    buildable = cache.get(key)
+    if buildable is None:
+        buildable = compute_buildable()
+        cache.set(key, buildable, timeout=settings.WAREHOUSE_BOM_CACHE_TIMEOUT)
+    return buildable
@@ -0,0 +1,137 @@
+"""
+FIFO allocation kernels.
+
+A kernel takes the remainders of the batches of one raw material (in allocation order) and a sequence of required
+quantities, and computes for every required quantity the batches it is taken from. The vectorized kernel needs
+NumPy; when it is not installed the pure-Python kernel is used.
+"""
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Below this number of batches the NumPy setup costs more than the Python loop
+VECTORIZE_MIN_BATCHES = 64
+
+# Quantities are stored with 2 decimal places, the vectorized kernel works with integer hundredths
+SCALE = 100
+
+
+class FIFOResult(NamedTuple):
+    # For every required quantity: (batch index or None when there is not enough stock, taken quantity)
+    takes: List[List[Tuple[Optional[int], Decimal]]]
+    # New remainders of the changed batches by batch index
+    remainders: Dict[int, Decimal]
+    # Index of the first batch which still may have a remainder
+    cursor: int
+
+
+def python_fifo(remainders: Sequence[Decimal], required_quantities: Sequence[Decimal]) -> FIFOResult:
+    """
+    Walks over the batches one by one, taking every required quantity from the oldest non-empty batches.
+    """
+    changed: Dict[int, Decimal] = {}
+    takes = []
+    cursor = 0
+    for required_quantity in required_quantities:
+        pieces: List[Tuple[Optional[int], Decimal]] = []
+        while cursor < len(remainders):
+            remainder = changed.get(cursor, remainders[cursor])
+            if remainder <= 0:
+                # Batch is already used up by previous allocations
+                cursor += 1
+                continue
+            if remainder >= required_quantity:
+                # Sufficient quantity available in the batch
+                pieces.append((cursor, required_quantity))
+                changed[cursor] = remainder - required_quantity
+                required_quantity = Decimal(0)
+                break
+            # Take everything from the batch and continue with the next one
+            pieces.append((cursor, remainder))
+            required_quantity -= remainder
+            changed[cursor] = Decimal(0)
+            cursor += 1
+
+        if required_quantity > 0:
+            pieces.append((None, required_quantity))
+        takes.append(pieces)
+    return FIFOResult(takes, changed, cursor)
+
+
+class VectorizedFIFOResult(NamedTuple):
+    # Rows of the i-th required quantity are rows[demand_bounds[i]:demand_bounds[i + 1]]
+    demand_bounds: "np.ndarray"
+    # Per row: index of the batch and the quantity taken from it, in hundredths
+    batch_indexes: "np.ndarray"
+    taken: "np.ndarray"
+    # Per required quantity: the quantity missing in the warehouse, in hundredths
+    shortages: "np.ndarray"
+    # New remainders of all batches, in hundredths
+    remainders: "np.ndarray"
+
+
+def to_hundredths(values: Sequence[Decimal]) -> "np.ndarray":
+    """
+    Converts quantities to an array of integer hundredths, raises ValueError if a quantity has more decimal places.
+    """
+    scaled = np.fromiter(map(float, values), dtype=np.float64, count=len(values)) * SCALE
+    hundredths = np.rint(scaled)
+    if (np.abs(scaled - hundredths) > 1e-6).any():
+        raise ValueError("Quantities with more than 2 decimal places can not be allocated by the vectorized kernel")
+    return hundredths.astype(np.int64)
+
+
+def from_hundredths(value: int) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
+
+
+def numpy_fifo(remainders: "np.ndarray", required_quantities: "np.ndarray") -> VectorizedFIFOResult:
+    """
+    Computes all takes at once, the same ones as ``python_fifo`` does. Quantities are integer hundredths.
+
+    Batches and required quantities are laid out as consecutive intervals on the cumulative quantity axis:
+    [supply_starts, supply_ends) for the batches and [demand_starts, demand_ends) for the required quantities.
+    A required quantity is taken from every batch its interval overlaps, and the first and the last batch of each
+    interval are found with ``searchsorted`` over the cumulative remainders.
+    """
+    remainders = np.maximum(remainders, 0)
+    batches_count = len(remainders)
+    demands_count = len(required_quantities)
+
+    supply_ends = np.cumsum(remainders)
+    supply_starts = supply_ends - remainders
+    total_supply = supply_ends[-1] if batches_count else 0
+    demand_ends = np.cumsum(required_quantities)
+    demand_starts = demand_ends - required_quantities
+
+    # The first batch which ends after the start of the demand and the first batch which covers its end
+    first_batches = np.searchsorted(supply_ends, demand_starts, side="right")
+    last_batches = np.minimum(np.searchsorted(supply_ends, demand_ends, side="left"), batches_count - 1)
+    # A zero quantity is still taken from the first non-empty batch, as the Python kernel does
+    zero_demands = required_quantities == 0
+    last_batches = np.where(zero_demands, first_batches, last_batches)
+    counts = np.where(first_batches < batches_count, np.maximum(last_batches - first_batches + 1, 0), 0)
+
+    # One row per (demand, overlapped batch) pair, rows of a demand are consecutive
+    demand_indexes = np.repeat(np.arange(demands_count), counts)
+    offsets = np.arange(len(demand_indexes)) - np.repeat(np.cumsum(counts) - counts, counts)
+    batch_indexes = np.repeat(first_batches, counts) + offsets
+    taken = np.minimum(supply_ends[batch_indexes], demand_ends[demand_indexes]) - np.maximum(
+        supply_starts[batch_indexes], demand_starts[demand_indexes]
+    )
+    # Batches which are already empty inside the interval are skipped
+    keep = (taken > 0) | zero_demands[demand_indexes]
+    demand_indexes, batch_indexes, taken = demand_indexes[keep], batch_indexes[keep], taken[keep]
+
+    consumed = min(demand_ends[-1] if demands_count else 0, total_supply)
+    return VectorizedFIFOResult(
+        demand_bounds=np.searchsorted(demand_indexes, np.arange(demands_count + 1)),
+        batch_indexes=batch_indexes,
+        taken=taken,
+        shortages=np.maximum(demand_ends - np.maximum(demand_starts, total_supply), 0),
+        remainders=supply_ends - np.clip(consumed, supply_starts, supply_ends),
+    )
@@ -0,0 +1,92 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.warehouse import kernels
+from apps.warehouse.allocation import StockSnapshot
+from apps.warehouse.models import WarehouseBatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the pure-Python and the NumPy FIFO allocation kernels on a single raw material with the given "
+        "numbers of batches: the kernels alone and a whole StockSnapshot.take_many call, which also converts "
+        "Decimal quantities and builds the allocation pieces. No database queries are made."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batches", type=int, nargs="+", default=[10, 1000, 100000], help="Numbers of batches per material"
+        )
+        parser.add_argument("--demands", type=int, default=50, help="Number of required quantities")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per kernel, the best one is reported")
+
+    def handle(self, *args, **options):
+        if kernels.np is None:
+            raise CommandError("NumPy is not installed, only the Python kernel is available")
+
+        self.stdout.write(
+            f"{'batches':>10} | {'kernel: python, ms':>18} {'numpy, ms':>10} {'speedup':>8} | "
+            f"{'snapshot: python, ms':>20} {'numpy, ms':>10} {'speedup':>8}"
+        )
+        for batches_count in options["batches"]:
+            remainders = [Decimal(random.randint(1, 2000)).scaleb(-2) for _ in range(batches_count)]
+            # Demand is 90% of the stock, so the kernels walk over almost all batches
+            required_quantity = (sum(remainders) * Decimal("0.9") / options["demands"]).quantize(Decimal("0.01"))
+            required_quantities = [required_quantity] * options["demands"]
+
+            remainder_hundredths = kernels.to_hundredths(remainders)
+            demand_hundredths = kernels.to_hundredths(required_quantities)
+            python_kernel_time = self.measure(
+                lambda: kernels.python_fifo(remainders, required_quantities), options["repeat"]
+            )
+            numpy_kernel_time = self.measure(
+                lambda: kernels.numpy_fifo(remainder_hundredths, demand_hundredths), options["repeat"]
+            )
+
+            python_snapshot_time, python_takes = self.measure_snapshot(
+                False, remainders, required_quantities, options["repeat"]
+            )
+            numpy_snapshot_time, numpy_takes = self.measure_snapshot(
+                True, remainders, required_quantities, options["repeat"]
+            )
+            if python_takes != numpy_takes:
+                raise CommandError(f"Kernels returned different allocations for {batches_count} batches")
+
+            self.stdout.write(
+                f"{batches_count:>10} | {python_kernel_time * 1000:>18.3f} {numpy_kernel_time * 1000:>10.3f} "
+                f"{python_kernel_time / numpy_kernel_time:>7.1f}x | {python_snapshot_time * 1000:>20.3f} "
+                f"{numpy_snapshot_time * 1000:>10.3f} {python_snapshot_time / numpy_snapshot_time:>7.1f}x"
+            )
+
+    def measure(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started_at)
+        return min(timings)
+
+    def measure_snapshot(self, vectorize, remainders, required_quantities, repeat):
+        timings = []
+        for _ in range(repeat):
+            batches = [
+                WarehouseBatch(id=index, raw_material_id=1, remainder=remainder, price=1)
+                for index, remainder in enumerate(remainders)
+            ]
+            # The vectorized snapshot falls back to the Python kernel below VECTORIZE_MIN_BATCHES, force it here
+            snapshot = StockSnapshot(batches, vectorize=vectorize)
+            kernels_min_batches, kernels.VECTORIZE_MIN_BATCHES = kernels.VECTORIZE_MIN_BATCHES, 0
+            try:
+                started_at = time.perf_counter()
+                takes = snapshot.take_many(1, required_quantities)
+                snapshot.sync_remainders()
+                timings.append(time.perf_counter() - started_at)
+            finally:
+                kernels.VECTORIZE_MIN_BATCHES = kernels_min_batches
+        return min(timings), (
+            [[(batch and batch.id, quantity) for batch, quantity in pieces] for pieces in takes],
+            [batch.remainder for batch in batches],
+        )
@@ -0,0 +1,73 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.warehouse.allocation import StockSnapshot
+from apps.warehouse.models import RawMaterial, WarehouseBatch
+from apps.warehouse.strategies import STRATEGIES
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a warehouse batch table of the given size, then shows the query plan and the latency of loading the "
+        "candidate batches of a single raw material with every allocation strategy. Everything runs in a transaction "
+        "which is rolled back at the end, so no data is left behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batches", type=int, default=1000000, help="Total number of warehouse batches")
+        parser.add_argument("--materials", type=int, default=100, help="Number of raw materials")
+        parser.add_argument("--empty", type=float, default=0.5, help="Share of used up batches")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per strategy, the best one is reported")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            raw_material_ids = self.seed(options["batches"], options["materials"], options["empty"])
+            raw_material_id = raw_material_ids[0]
+
+            for strategy in STRATEGIES.values():
+                queryset = WarehouseBatch.objects.filter(raw_material_id=raw_material_id, remainder__gt=0).order_by(
+                    "raw_material_id", *strategy.ordering
+                )
+                timings = []
+                for _ in range(options["repeat"]):
+                    started_at = time.perf_counter()
+                    snapshot = StockSnapshot.load([raw_material_id], strategies={raw_material_id: strategy.name})
+                    timings.append(time.perf_counter() - started_at)
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"{strategy.name}: {len(snapshot._batches[raw_material_id])} candidate batches loaded in "
+                        f"{min(timings) * 1000:.1f} ms, expected index {strategy.index_name}"
+                    )
+                )
+                self.stdout.write(queryset.explain())
+            transaction.set_rollback(True)
+
+    def seed(self, batches_count, materials_count, empty_share):
+        self.stdout.write(f"Seeding {batches_count} batches of {materials_count} raw materials...")
+        raw_materials = RawMaterial.objects.bulk_create(
+            [RawMaterial(name=f"bench-{index}", unit=RawMaterial.UnitChoices.M) for index in range(materials_count)]
+        )
+        now = timezone.now()
+        chunk = []
+        for index in range(batches_count):
+            chunk.append(
+                WarehouseBatch(
+                    raw_material=raw_materials[index % materials_count],
+                    remainder=0 if random.random() < empty_share else random.randint(1, 100),
+                    unit=RawMaterial.UnitChoices.M,
+                    price=random.randint(1, 1000),
+                    expiry_date=(now + timedelta(days=random.randint(1, 365))).date() if index % 10 else None,
+                )
+            )
+            if len(chunk) == 10000:
+                WarehouseBatch.objects.bulk_create(chunk)
+                chunk = []
+        WarehouseBatch.objects.bulk_create(chunk)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {WarehouseBatch._meta.db_table}")
+        return [raw_material.id for raw_material in raw_materials]
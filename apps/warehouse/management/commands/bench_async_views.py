@@ -0,0 +1,248 @@
+import asyncio
+import io
+import json
+import random
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from apps.users.models import User
+from apps.warehouse.models import Order, Product
+from apps.warehouse.urls import get_urlpatterns
+
+
+class InFlight:
+    """
+    Number of requests being handled at the same time and its maximum.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.maximum = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.maximum = max(self.maximum, self.current)
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.current -= 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test of the read endpoints served by the sync views through the WSGI handler and by the async views "
+        "through the ASGI handler, with a simulated slow database (every query sleeps --db-latency ms). Both stacks "
+        "run in this process: the sync one as --workers threads which handle one request at a time like sync "
+        "gunicorn workers, the async one as a single event loop like one uvicorn worker. --concurrency clients send "
+        "requests back to back; latency includes the time a request waits for a free worker. Reads the data of a "
+        "user seeded with seed_warehouse and uses the configured database and cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", default="seed", help="User of the orders, see seed_warehouse")
+        parser.add_argument("--requests", type=int, default=400, help="Requests per stack")
+        parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients")
+        parser.add_argument("--workers", type=int, default=4, help="Sync workers")
+        parser.add_argument("--db-latency", type=float, default=20, help="Milliseconds added to every query")
+        parser.add_argument("--random-seed", type=int, default=0)
+        parser.add_argument("--output", help="Path of the JSON results")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f'User "{options["username"]}" does not exist, run seed_warehouse first')
+        rng = random.Random(options["random_seed"])
+        order_ids = list(Order.objects.filter(user=user).values_list("id", flat=True)[:1000])
+        product_ids = list(Product.objects.values_list("id", flat=True)[:1000])
+        if not order_ids or not product_ids:
+            raise CommandError("There are no orders or products to read, run seed_warehouse first")
+
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        results = {
+            "started_at": timezone.now().isoformat(),
+            "database": connections["default"].vendor,
+            "db_latency_ms": options["db_latency"],
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "workers": options["workers"],
+            "stacks": {},
+        }
+
+        latency = options["db_latency"] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install_slow_query(connection, **kwargs):
+            if slow_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_query)
+
+        # Requests query from connections of their own threads
+        connection_created.connect(install_slow_query)
+        try:
+            for stack, async_views in [("wsgi", False), ("asgi", True)]:
+                module = types.ModuleType(f"bench_async_views_{stack}")
+                module.urlpatterns = [path("api/v1/", include((get_urlpatterns(async_views), "warehouse")))]
+                with override_settings(ROOT_URLCONF=module):
+                    urls = [
+                        self.get_url(name, rng, order_ids, product_ids)
+                        for name in ["product-list", "product-detail", "order-list", "order-product-materials"]
+                        for _ in range(options["requests"] // 4)
+                    ]
+                    rng.shuffle(urls)
+                    results["stacks"][stack] = self.run(stack, urls, cookie, options)
+        finally:
+            connection_created.disconnect(install_slow_query)
+            client.logout()
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results are written to {options['output']}"))
+
+    def get_url(self, name, rng, order_ids, product_ids):
+        if name == "product-detail":
+            return reverse("warehouse:product-detail", args=[rng.choice(product_ids)]), ""
+        if name == "order-product-materials":
+            return reverse("warehouse:order-product-materials", args=[rng.choice(order_ids)]), ""
+        return reverse(f"warehouse:{name}"), f"offset={rng.randrange(100)}"
+
+    def run(self, stack, urls, cookie, options):
+        in_flight = InFlight()
+        statuses = []
+        latencies = []
+        pending = list(reversed(urls))
+
+        if stack == "wsgi":
+            application = WSGIHandler()
+            executor = ThreadPoolExecutor(max_workers=options["workers"])
+
+            async def request(url, query):
+                def call():
+                    with in_flight:
+                        return self.wsgi_request(application, url, query, cookie)
+
+                return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+        else:
+            application = ASGIHandler()
+
+            async def request(url, query):
+                with in_flight:
+                    return await self.asgi_request(application, url, query, cookie)
+
+        async def client():
+            while pending:
+                url, query = pending.pop()
+                started_at = time.perf_counter()
+                statuses.append(await request(url, query))
+                latencies.append((time.perf_counter() - started_at) * 1000)
+
+        async def load():
+            await asyncio.gather(*(client() for _ in range(options["concurrency"])))
+
+        started_at = time.perf_counter()
+        asyncio.run(load())
+        elapsed = time.perf_counter() - started_at
+        if stack == "wsgi":
+            executor.shutdown()
+
+        failed = sum(status >= 400 for status in statuses)
+        latencies.sort()
+        result = {
+            "requests_per_second": len(latencies) / elapsed,
+            "p50_ms": self.percentile(latencies, 0.5),
+            "p99_ms": self.percentile(latencies, 0.99),
+            "max_ms": latencies[-1],
+            "max_in_flight": in_flight.maximum,
+            "failed": failed,
+        }
+        self.stdout.write(
+            f"{stack}: {result['requests_per_second']:>8.1f} requests/s, p50 {result['p50_ms']:>8.1f} ms, "
+            f"p99 {result['p99_ms']:>8.1f} ms, max {result['max_ms']:>8.1f} ms, "
+            f"{result['max_in_flight']:>4} requests in flight, {failed} failed"
+        )
+        return result
+
+    def percentile(self, values, share):
+        return values[min(len(values) - 1, int(len(values) * share))]
+
+    def wsgi_request(self, application, url, query, cookie):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "SCRIPT_NAME": "",
+            "PATH_INFO": url,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_COOKIE": cookie,
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        status = []
+        response = application(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+        try:
+            for _ in response:
+                pass
+        finally:
+            # Sends request_finished, which closes the connection of the request
+            response.close()
+        return int(status[0].split()[0])
+
+    async def asgi_request(self, application, url, query, cookie):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": url,
+            "raw_path": url.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+            "server": ("localhost", 80),
+            "client": ("127.0.0.1", 0),
+        }
+        done = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif not message.get("more_body"):
+                done.set()
+
+        await application(scope, receive, send)
+        return status[0]
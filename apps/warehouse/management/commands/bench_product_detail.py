@@ -0,0 +1,81 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from apps.warehouse.api_endpoints import ProductDetailAPIView
+from apps.warehouse.bom import get_bom_version, invalidate_bom_cache
+from apps.warehouse.models import (Product, ProductComponent,
+                                   ProductRawMaterial, RawMaterial)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures requests per second of the product detail endpoint with a cold cache (the BOM version is replaced "
+        "before every request), a hot cache and conditional requests answered with 304. Uses the configured cache; "
+        "the seeded product is created in a transaction which is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--materials", type=int, default=50, help="Number of BOM lines of the product")
+        parser.add_argument("--components", type=int, default=5, help="Number of sub-assemblies of the product")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+
+    def handle(self, *args, **options):
+        if get_bom_version() is None:
+            raise CommandError("The cache is not available, responses can not be cached")
+
+        view = ProductDetailAPIView.as_view()
+        factory = RequestFactory()
+        with transaction.atomic():
+            product = self.seed(options["materials"], options["components"])
+
+            def request(**headers):
+                response = view(factory.get(f"/api/warehouse/products/detail/{product.pk}/", **headers), pk=product.pk)
+                if hasattr(response, "render"):
+                    response.render()
+                return response
+
+            etag = request()["ETag"]
+
+            def cold():
+                invalidate_bom_cache()
+                request()
+
+            for name, function in [
+                ("cold cache", cold),
+                ("hot cache", request),
+                ("If-None-Match", lambda: request(HTTP_IF_NONE_MATCH=etag)),
+            ]:
+                started_at = time.perf_counter()
+                for _ in range(options["requests"]):
+                    function()
+                elapsed = time.perf_counter() - started_at
+                self.stdout.write(
+                    f"{name:>14}: {options['requests'] / elapsed:>8.0f} requests/s, "
+                    f"{elapsed / options['requests'] * 1000:.2f} ms per request"
+                )
+            cache.delete(f"product-detail:{get_bom_version()}:{product.pk}")
+            transaction.set_rollback(True)
+
+    def seed(self, materials_count, components_count):
+        product = Product.objects.create(name="bench", code="bench")
+        raw_materials = RawMaterial.objects.bulk_create(
+            [RawMaterial(name=f"bench-{index}", unit=RawMaterial.UnitChoices.M) for index in range(materials_count)]
+        )
+        components = Product.objects.bulk_create(
+            [Product(name=f"bench-{index}", code="bench") for index in range(components_count)]
+        )
+        ProductRawMaterial.objects.bulk_create(
+            [
+                ProductRawMaterial(product=owner, raw_material=raw_material, quantity=index + 1, unit=raw_material.unit)
+                for owner in [product, *components]
+                for index, raw_material in enumerate(raw_materials)
+            ]
+        )
+        ProductComponent.objects.bulk_create(
+            [ProductComponent(product=product, component=component, quantity=2) for component in components]
+        )
+        return product
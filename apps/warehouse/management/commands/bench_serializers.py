@@ -0,0 +1,114 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.common.renderers import ORJSONRenderer
+from apps.users.models import User
+from apps.warehouse.api_endpoints.order.List.serializers import (
+    OrderListSerializer, OrderListValuesSerializer)
+from apps.warehouse.api_endpoints.order.order_product_materials.serializers import (
+    OrderProductMaterialSerializer, OrderProductMaterialValuesSerializer)
+from apps.warehouse.api_endpoints.product.List.serializers import (
+    ProductListSerializer, ProductListValuesSerializer)
+from apps.warehouse.models import (Order, OrderItem, OrderItemRawMaterials,
+                                   Product, RawMaterial, WarehouseBatch)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the cost of serializing the given number of rows with the DRF serializers and the values() "
+        "serializers of the product list, order list and order product materials endpoints, reading the rows "
+        "included, and of rendering them with JSONRenderer and ORJSONRenderer. The rows are created in a transaction "
+        "which is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Number of rows per endpoint")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per serializer, the best one is reported")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        with transaction.atomic():
+            order = self.seed(rows)
+            items = OrderItem.objects.filter(order=order).select_related("product").order_by("id")
+            material_rows = OrderItemRawMaterials.objects.select_related("raw_material").order_by("id")
+
+            def prefetched_items():
+                items_list = list(items)
+                materials = {}
+                for row in material_rows.filter(order_item__order=order):
+                    materials.setdefault(row.order_item_id, []).append(row)
+                for item in items_list:
+                    item.materials = materials.get(item.id, [])
+                return items_list
+
+            cases = [
+                (
+                    "product list",
+                    lambda: ProductListSerializer(Product.objects.filter(code="bench"), many=True).data,
+                    lambda: ProductListValuesSerializer.serialize(
+                        ProductListValuesSerializer.values(Product.objects.filter(code="bench"))
+                    ),
+                ),
+                (
+                    "order list",
+                    lambda: OrderListSerializer(Order.objects.filter(user=order.user), many=True).data,
+                    lambda: OrderListValuesSerializer.serialize(
+                        OrderListValuesSerializer.values(Order.objects.filter(user=order.user))
+                    ),
+                ),
+                (
+                    "order materials",
+                    lambda: OrderProductMaterialSerializer(prefetched_items(), many=True).data,
+                    lambda: OrderProductMaterialValuesSerializer.serialize(
+                        OrderProductMaterialValuesSerializer.values(items)
+                    ),
+                ),
+            ]
+            scale = 10000 / rows
+            self.stdout.write(
+                f"{'ms per 10k rows':>16} | {'serializer':>10} {'values':>8} {'speedup':>8} | "
+                f"{'json':>8} {'orjson':>8} {'speedup':>8}"
+            )
+            for name, serialize, serialize_values in cases:
+                serializer_time, data = self.measure(serialize, options["repeat"])
+                values_time, values_data = self.measure(serialize_values, options["repeat"])
+                json_time, _ = self.measure(lambda: JSONRenderer().render(data), options["repeat"])
+                orjson_time, _ = self.measure(lambda: ORJSONRenderer().render(values_data), options["repeat"])
+                self.stdout.write(
+                    f"{name:>16} | {serializer_time * scale * 1000:>10.1f} {values_time * scale * 1000:>8.1f} "
+                    f"{serializer_time / values_time:>7.1f}x | {json_time * scale * 1000:>8.1f} "
+                    f"{orjson_time * scale * 1000:>8.1f} {json_time / orjson_time:>7.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - started_at)
+        return min(timings), result
+
+    def seed(self, rows):
+        user = User.objects.create_user(username="bench-serializers")
+        products = Product.objects.bulk_create([Product(name=f"bench-{index}", code="bench") for index in range(rows)])
+        Order.objects.bulk_create([Order(user=user) for _ in range(rows)])
+        order = Order.objects.filter(user=user).first()
+        raw_material = RawMaterial.objects.create(name="bench", unit=RawMaterial.UnitChoices.M)
+        batch = WarehouseBatch.objects.create(raw_material=raw_material, remainder=0, price=1)
+        # Half of the rows are items, every item has one allocated row
+        items = OrderItem.objects.bulk_create(
+            [OrderItem(order=order, product=products[index], quantity=1) for index in range(rows // 2)]
+        )
+        OrderItemRawMaterials.objects.bulk_create(
+            [
+                OrderItemRawMaterials(
+                    order_item=item, warehouse_batch=batch, raw_material=raw_material, quantity=1, unit="m", price=1
+                )
+                for item in items
+            ]
+        )
+        return order
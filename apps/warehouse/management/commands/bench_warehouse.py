@@ -0,0 +1,135 @@
+import json
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.warehouse.bom import invalidate_bom_cache
+from apps.warehouse.models import Order
+from apps.warehouse.seeding import SeedSize, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Times calculate_materials, order creation and every read endpoint on synthetic datasets of the given "
+        "numbers of products (see seed_warehouse). Every dataset is seeded in a transaction which is rolled back at "
+        "the end. Results can be written as JSON to compare runs over time. Works on SQLite and PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, nargs="+", default=[100, 1000], help="Dataset sizes")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per operation, on different rows")
+        parser.add_argument("--random-seed", type=int, default=0, help="The same seed creates the same data")
+        parser.add_argument("--output", help="Path of the JSON results")
+
+    def handle(self, *args, **options):
+        results = {
+            "started_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "cache": settings.CACHES["default"]["BACKEND"],
+            "repeat": options["repeat"],
+            "datasets": [],
+        }
+        # Orders are allocated in the request, queued allocations would never run in the rolled back transaction
+        with override_settings(WAREHOUSE_ASYNC_ALLOCATION=False):
+            for products in options["products"]:
+                results["datasets"].append(self.run(SeedSize.scaled(products), options))
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results are written to {options['output']}"))
+
+    def run(self, size, options):
+        repeat = options["repeat"]
+        rng = random.Random(options["random_seed"])
+        with transaction.atomic():
+            started_at = time.perf_counter()
+            data = seed(size, username=f"bench-{size.products}", random_seed=options["random_seed"])
+            seed_seconds = time.perf_counter() - started_at
+            self.stdout.write(f"{size}: seeded in {seed_seconds:.1f} s")
+
+            client = APIClient()
+            client.force_authenticate(user=data.user)
+            orders = list(Order.objects.filter(id__in=rng.sample(data.order_ids, min(repeat, len(data.order_ids)))))
+            products = rng.sample(data.product_ids, min(repeat, len(data.product_ids)))
+
+            def create_order():
+                items = [
+                    {"product": product, "quantity": rng.randint(1, 10)}
+                    for product in rng.sample(data.product_ids, min(size.items, len(data.product_ids)))
+                ]
+                return client.post(reverse("warehouse:order-create"), {"items": items}, format="json")
+
+            # Materials are calculated first, so the materials endpoint has rows to read
+            operations = [
+                ("calculate_materials", lambda index: orders[index % len(orders)].calculate_materials()),
+                ("order-create", lambda index: create_order()),
+                ("product-list", lambda index: client.get(reverse("warehouse:product-list"))),
+                (
+                    "product-detail",
+                    lambda index: client.get(
+                        reverse("warehouse:product-detail", kwargs={"pk": products[index % len(products)]})
+                    ),
+                ),
+                ("order-list", lambda index: client.get(reverse("warehouse:order-list"))),
+                (
+                    "order-allocation-status",
+                    lambda index: client.get(
+                        reverse("warehouse:order-allocation-status", kwargs={"pk": orders[index % len(orders)].id})
+                    ),
+                ),
+                (
+                    "order-product-materials",
+                    lambda index: client.get(
+                        reverse(
+                            "warehouse:order-product-materials", kwargs={"order_id": orders[index % len(orders)].id}
+                        )
+                    ),
+                ),
+                ("stock-list", lambda index: client.get(reverse("warehouse:stock-list"))),
+                # Computed on the first run, then read from the cache
+                ("product-buildable", lambda index: client.get(reverse("warehouse:product-buildable"))),
+            ]
+            timings = {}
+            for name, operation in operations:
+                timings[name] = self.measure(operation, repeat)
+                self.stdout.write(
+                    f"{name:>24}: median {timings[name]['median_ms']:>9.2f} ms, "
+                    f"max {timings[name]['max_ms']:>9.2f} ms, {timings[name]['queries']:>5} queries"
+                )
+            transaction.set_rollback(True)
+        # The cached BOMs of the rolled back products are stale
+        invalidate_bom_cache()
+        return {"size": size._asdict(), "seed_seconds": seed_seconds, "timings": timings}
+
+    def measure(self, operation, repeat):
+        timings = []
+        queries = 0
+        for index in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started_at = time.perf_counter()
+                response = operation(index)
+                timings.append((time.perf_counter() - started_at) * 1000)
+            if getattr(response, "status_code", 200) >= 400:
+                raise CommandError(f"Request failed with {response.status_code}: {response.content[:200]!r}")
+            queries = max(queries, len(context.captured_queries))
+        return {
+            "median_ms": statistics.median(timings),
+            "min_ms": min(timings),
+            "max_ms": max(timings),
+            # The most queries of a single run
+            "queries": queries,
+        }
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.warehouse.stock import rebuild_stock
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the availability of every raw material from its warehouse batches and reports any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the drift, do not fix it")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = rebuild_stock(dry_run=options["dry_run"])
+
+        for raw_material_id, stored, actual in drift:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Raw material {raw_material_id}: stored {self.format(stored)}, actual {self.format(actual)}"
+                )
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Stock is consistent"))
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} raw materials drifted"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(drift)} raw materials rebuilt"))
+
+    def format(self, state):
+        if state is None:
+            return "nothing"
+        return f"total {state.total_remainder}, {state.batches_count} batches, oldest batch {state.oldest_batch_id}"
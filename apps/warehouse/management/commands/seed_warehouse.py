@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.users.models import User
+from apps.warehouse.allocation import allocate_orders
+from apps.warehouse.seeding import SeedSize, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds synthetic products, raw materials, BOM lines, warehouse batches and orders with bulk inserts. "
+        "Counts default to a dataset proportional to --products. Works on SQLite and PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000, help="Number of products")
+        parser.add_argument(
+            "--raw-materials", type=int, help="Number of raw materials, half of the products by default"
+        )
+        parser.add_argument("--bom-lines", type=int, help="BOM lines per product")
+        parser.add_argument("--batches", type=int, help="Warehouse batches per raw material")
+        parser.add_argument("--orders", type=int, help="Number of orders, as many as products by default")
+        parser.add_argument("--items", type=int, help="Items per order")
+        parser.add_argument("--assemblies", type=float, help="Share of products with a sub-assembly")
+        parser.add_argument("--username", default="seed", help="Owner of the orders, must not exist")
+        parser.add_argument("--random-seed", type=int, default=0, help="The same seed creates the same data")
+        parser.add_argument("--allocate", action="store_true", help="Allocate materials of the orders (no reservation)")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=options["username"]).exists():
+            raise CommandError(f'User "{options["username"]}" already exists, pass another --username')
+        size = SeedSize.scaled(options["products"])._replace(
+            **{
+                field: options[field]
+                for field in ("raw_materials", "bom_lines", "batches", "orders", "items", "assemblies")
+                if options[field] is not None
+            }
+        )
+
+        started_at = time.perf_counter()
+        with transaction.atomic():
+            data = seed(size, username=options["username"], random_seed=options["random_seed"])
+        self.stdout.write(self.style.SUCCESS(f"Seeded {size} in {time.perf_counter() - started_at:.1f} s"))
+
+        if options["allocate"]:
+            started_at = time.perf_counter()
+            chunk_size = settings.WAREHOUSE_IMPORT_CHUNK_SIZE
+            for start in range(0, len(data.order_ids), chunk_size):
+                end = start + chunk_size
+                allocate_orders(data.order_ids[start:end])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Allocated {len(data.order_ids)} orders in {time.perf_counter() - started_at:.1f} s"
+                )
+            )
@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.users.models import User
+from apps.warehouse.api_endpoints import OrderCreateAPIView
+from apps.warehouse.models import (OrderItemRawMaterials, Product,
+                                   ProductRawMaterial, RawMaterial,
+                                   WarehouseBatch)
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates orders with stock reservation from many threads at once, checks that no warehouse batch is "
+        "over-allocated and reports the throughput. Seeded data is removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=200, help="Number of orders to create")
+        parser.add_argument("--workers", type=int, default=8, help="Number of concurrent threads")
+        parser.add_argument("--materials", type=int, default=5, help="Number of raw materials")
+        parser.add_argument("--batches", type=int, default=10, help="Number of warehouse batches per raw material")
+        parser.add_argument("--retries", type=int, default=50, help="Retries of an order on a database lock error")
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(username=f"stress-{run_id}")
+        raw_materials = [
+            RawMaterial.objects.create(name=f"stress-{run_id}-{index}", unit=RawMaterial.UnitChoices.PCS)
+            for index in range(options["materials"])
+        ]
+        products = []
+        for index in range(options["materials"]):
+            product = Product.objects.create(name=f"stress-{run_id}-{index}", code=run_id)
+            for raw_material in random.sample(raw_materials, k=min(2, len(raw_materials))):
+                ProductRawMaterial.objects.create(product=product, raw_material=raw_material, quantity=1)
+            products.append(product)
+        for raw_material in raw_materials:
+            for _ in range(options["batches"]):
+                WarehouseBatch.objects.create(raw_material=raw_material, remainder=random.randint(1, 20), price=100)
+        batches = WarehouseBatch.objects.filter(raw_material__in=raw_materials)
+        initial_remainders = dict(batches.values_list("id", "remainder"))
+
+        self.retries = 0
+        self.retries_lock = threading.Lock()
+        try:
+            started_at = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                status_codes = list(
+                    executor.map(
+                        lambda _: self.create_order(user, products, options["retries"]), range(options["orders"])
+                    )
+                )
+            elapsed = time.perf_counter() - started_at
+
+            failed = len([status_code for status_code in status_codes if status_code != 201])
+            if failed:
+                raise CommandError(f"{failed} of {options['orders']} orders were not created")
+            self.check_allocation(initial_remainders, batches)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{options['orders']} orders with {options['workers']} workers in {elapsed:.2f}s "
+                    f"({options['orders'] / elapsed:.1f} orders/s, {self.retries} retries), no over-allocation"
+                )
+            )
+        finally:
+            Product.objects.filter(code=run_id).delete()
+            RawMaterial.objects.filter(pk__in=[raw_material.pk for raw_material in raw_materials]).delete()
+            user.delete()
+
+    def create_order(self, user, products, retries):
+        items = [
+            {"product": product.pk, "quantity": random.randint(1, 3)}
+            for product in random.sample(products, min(2, len(products)))
+        ]
+        request_factory = APIRequestFactory()
+        try:
+            for attempt in range(retries + 1):
+                request = request_factory.post("/", {"items": items, "reserve": True}, format="json")
+                force_authenticate(request, user=user)
+                try:
+                    return OrderCreateAPIView.as_view()(request).status_code
+                except OperationalError as exc:
+                    # SQLite has no row level locks and reports busy tables instead of waiting for them
+                    if "locked" not in str(exc) or attempt == retries:
+                        raise
+                    with self.retries_lock:
+                        self.retries += 1
+                    # Back off further on every attempt, so busy workers do not starve the same order
+                    time.sleep(random.uniform(0.001, 0.01) * (attempt + 1))
+        finally:
+            connection.close()
+
+    def check_allocation(self, initial_remainders, batches):
+        allocated = dict(
+            OrderItemRawMaterials.objects.filter(warehouse_batch__in=batches)
+            .values("warehouse_batch_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("warehouse_batch_id", "total")
+        )
+        for batch_id, remainder in batches.values_list("id", "remainder"):
+            if remainder < 0:
+                raise CommandError(f"Warehouse batch {batch_id} is over-allocated: remainder is {remainder}")
+            if initial_remainders[batch_id] - remainder != allocated.get(batch_id, Decimal(0)):
+                raise CommandError(
+                    f"Warehouse batch {batch_id}: {initial_remainders[batch_id] - remainder} taken from the "
+                    f"remainder, but {allocated.get(batch_id, 0)} allocated to orders"
+                )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0005_orderitemrawmaterials"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="materials_reserved",
+            field=models.BooleanField(default=False, verbose_name="Materials reserved"),
+        ),
+    ]
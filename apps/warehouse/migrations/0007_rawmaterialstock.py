@@ -0,0 +1,87 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_stock(apps, schema_editor):
+    RawMaterial = apps.get_model("warehouse", "RawMaterial")
+    RawMaterialStock = apps.get_model("warehouse", "RawMaterialStock")
+    WarehouseBatch = apps.get_model("warehouse", "WarehouseBatch")
+
+    stock = []
+    for raw_material in RawMaterial.objects.all():
+        batches = WarehouseBatch.objects.filter(raw_material=raw_material, remainder__gt=0)
+        oldest_batch = batches.order_by("created_at", "id").first()
+        stock.append(
+            RawMaterialStock(
+                raw_material=raw_material,
+                total_remainder=batches.aggregate(total=models.Sum("remainder"))["total"] or 0,
+                batches_count=batches.count(),
+                oldest_batch=oldest_batch,
+            )
+        )
+    RawMaterialStock.objects.bulk_create(stock)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0006_order_materials_reserved"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RawMaterialStock",
+            fields=[
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                (
+                    "raw_material",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stock",
+                        serialize=False,
+                        to="warehouse.rawmaterial",
+                    ),
+                ),
+                (
+                    "total_remainder",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Total remainder",
+                    ),
+                ),
+                (
+                    "batches_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Batches count"
+                    ),
+                ),
+                (
+                    "oldest_batch",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="warehouse.warehousebatch",
+                        verbose_name="Oldest batch",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Raw Material Stock",
+                "verbose_name_plural": "Raw Material Stocks",
+            },
+        ),
+        migrations.RunPython(fill_stock, migrations.RunPython.noop),
+    ]
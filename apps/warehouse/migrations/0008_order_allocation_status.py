@@ -0,0 +1,42 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0007_rawmaterialstock"),
+    ]
+
+    operations = [
+        # Existing orders were allocated in the request which created them
+        migrations.AddField(
+            model_name="order",
+            name="allocation_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="done",
+                max_length=10,
+                verbose_name="Allocation status",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="allocation_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=10,
+                verbose_name="Allocation status",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0008_order_allocation_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductComponent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                (
+                    "quantity",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=10, verbose_name="Quantity"
+                    ),
+                ),
+                (
+                    "component",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="used_in",
+                        to="warehouse.product",
+                        verbose_name="Component",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="components",
+                        to="warehouse.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Product Component",
+                "verbose_name_plural": "Product Components",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="productcomponent",
+            constraint=models.UniqueConstraint(
+                fields=("product", "component"), name="unique_product_component"
+            ),
+        ),
+    ]
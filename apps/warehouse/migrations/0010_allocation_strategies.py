@@ -0,0 +1,65 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0009_productcomponent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rawmaterial",
+            name="allocation_strategy",
+            field=models.CharField(
+                choices=[
+                    ("fifo", "First in, first out"),
+                    ("lifo", "Last in, first out"),
+                    ("cheapest", "Cheapest first"),
+                    ("fefo", "First expiring, first out"),
+                ],
+                default="fifo",
+                max_length=10,
+                verbose_name="Allocation strategy",
+            ),
+        ),
+        migrations.AddField(
+            model_name="warehousebatch",
+            name="expiry_date",
+            field=models.DateField(blank=True, null=True, verbose_name="Expiry date"),
+        ),
+        migrations.AddIndex(
+            model_name="warehousebatch",
+            index=models.Index(
+                condition=models.Q(("remainder__gt", 0)),
+                fields=["raw_material", "created_at", "id"],
+                name="batch_fifo_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="warehousebatch",
+            index=models.Index(
+                condition=models.Q(("remainder__gt", 0)),
+                fields=["raw_material", "-created_at", "-id"],
+                name="batch_lifo_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="warehousebatch",
+            index=models.Index(
+                condition=models.Q(("remainder__gt", 0)),
+                fields=["raw_material", "price", "created_at", "id"],
+                name="batch_cheapest_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="warehousebatch",
+            index=models.Index(
+                condition=models.Q(("remainder__gt", 0)),
+                fields=["raw_material", "expiry_date", "created_at", "id"],
+                name="batch_fefo_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0010_allocation_strategies"),
+    ]
+
+    operations = [
+        # The composite indexes are built before the single-column indexes they replace are dropped
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(fields=["order", "id"], name="orderitem_order_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="orderitemrawmaterials",
+            index=models.Index(fields=["order_item", "id"], name="orderitem_material_item_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="orderitemrawmaterials",
+            index=models.Index(
+                condition=models.Q(("warehouse_batch__isnull", False)),
+                fields=["warehouse_batch"],
+                name="orderitem_material_batch_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderitem",
+            name="order",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="items",
+                to="warehouse.order",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderitemrawmaterials",
+            name="order_item",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="raw_materials",
+                to="warehouse.orderitem",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderitemrawmaterials",
+            name="warehouse_batch",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="order_items",
+                to="warehouse.warehousebatch",
+            ),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:13
+
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def fill_totals(apps, schema_editor):
+    Order = apps.get_model("warehouse", "Order")
+    OrderItem = apps.get_model("warehouse", "OrderItem")
+    OrderItemRawMaterials = apps.get_model("warehouse", "OrderItemRawMaterials")
+
+    materials_counts = defaultdict(int)
+    shortages = defaultdict(Decimal)
+    costs = defaultdict(Decimal)
+    for item_id, batch_id, quantity, price in OrderItemRawMaterials.objects.values_list(
+        "order_item_id", "warehouse_batch_id", "quantity", "price"
+    ).iterator():
+        materials_counts[item_id] += 1
+        if batch_id is None:
+            shortages[item_id] += quantity
+        if price is not None:
+            costs[item_id] += quantity * Decimal(repr(price))
+
+    items = []
+    orders = {}
+    for item in OrderItem.objects.only("id", "order_id").iterator():
+        item.materials_count = materials_counts[item.id]
+        item.shortage_quantity = shortages[item.id]
+        item.total_cost = costs[item.id].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        items.append(item)
+        order = orders.setdefault(item.order_id, Order(pk=item.order_id))
+        order.items_count += 1
+        order.materials_count += item.materials_count
+        order.shortage_quantity += item.shortage_quantity
+        order.total_cost += item.total_cost
+    fields = ["materials_count", "shortage_quantity", "total_cost"]
+    OrderItem.objects.bulk_update(items, fields, batch_size=1000)
+    Order.objects.bulk_update(orders.values(), ["items_count", *fields], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0012_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="items_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Items count"),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="materials_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Materials count"),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="shortage_quantity",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                max_digits=14,
+                verbose_name="Shortage quantity",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total_cost",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name="Total cost"),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="materials_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Materials count"),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="shortage_quantity",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                max_digits=14,
+                verbose_name="Shortage quantity",
+            ),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="total_cost",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name="Total cost"),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,6 @@
+from typing import Optional
+
+from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
@@ -11,6 +14,10 @@ class Product(TimeStampedModel):
     class Meta:
         verbose_name = _("Product")
         verbose_name_plural = _("Products")
+        indexes = [
+            # Keyset pagination, see apps.common.pagination
+            models.Index(fields=["created_at", "id"], name="product_keyset_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -23,8 +30,20 @@ class RawMaterial(TimeStampedModel):
         KG = "kg", _("Kilogram")
         PCS = "pcs", _("Piece")
 
+    class AllocationStrategy(models.TextChoices):
+        FIFO = "fifo", _("First in, first out")
+        LIFO = "lifo", _("Last in, first out")
+        CHEAPEST = "cheapest", _("Cheapest first")
+        FEFO = "fefo", _("First expiring, first out")
+
     name = models.CharField(max_length=255, verbose_name=_("Name"))
     unit = models.CharField(max_length=10, choices=UnitChoices.choices, verbose_name=_("Unit"), null=True)
+    allocation_strategy = models.CharField(
+        max_length=10,
+        choices=AllocationStrategy.choices,
+        default=AllocationStrategy.FIFO,
+        verbose_name=_("Allocation strategy"),
+    )
 
     class Meta:
         verbose_name = _("Raw Material")
@@ -54,6 +73,36 @@ class ProductRawMaterial(TimeStampedModel):
         return f"{self.product.name} - {self.raw_material.name}"
 
 
+class ProductComponent(TimeStampedModel):
+    """
+    A product used as a sub-assembly of another product.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="components")
+    component = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="used_in", verbose_name=_("Component")
+    )
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Quantity"))
+
+    class Meta:
+        verbose_name = _("Product Component")
+        verbose_name_plural = _("Product Components")
+        constraints = [
+            models.UniqueConstraint(fields=["product", "component"], name="unique_product_component"),
+        ]
+
+    def clean(self):
+        from apps.warehouse.bom import subtree_ids
+
+        if self.product_id is None or self.component_id is None:
+            return
+        if self.product_id in subtree_ids([self.component_id]):
+            raise ValidationError({"component": _("A product can not contain itself.")})
+
+    def __str__(self):
+        return f"{self.product.name} - {self.component.name}"
+
+
 class WarehouseBatch(TimeStampedModel):
     raw_material = models.ForeignKey(RawMaterial, on_delete=models.CASCADE, related_name="batches")
     remainder = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Remainder"))
@@ -61,119 +110,179 @@ class WarehouseBatch(TimeStampedModel):
         max_length=10, choices=RawMaterial.UnitChoices.choices, verbose_name=_("Unit"), null=True, blank=True
     )
     price = models.FloatField(verbose_name=_("Price"))
+    expiry_date = models.DateField(verbose_name=_("Expiry date"), null=True, blank=True)
 
     class Meta:
         verbose_name = _("Warehouse Batch")
         verbose_name_plural = _("Warehouse Batches")
+        # Non-empty batches of a raw material in the order of every allocation strategy, see apps.warehouse.strategies
+        indexes = [
+            models.Index(
+                fields=["raw_material", "created_at", "id"], condition=models.Q(remainder__gt=0), name="batch_fifo_idx"
+            ),
+            models.Index(
+                fields=["raw_material", "-created_at", "-id"],
+                condition=models.Q(remainder__gt=0),
+                name="batch_lifo_idx",
+            ),
+            models.Index(
+                fields=["raw_material", "price", "created_at", "id"],
+                condition=models.Q(remainder__gt=0),
+                name="batch_cheapest_idx",
+            ),
+            models.Index(
+                fields=["raw_material", "expiry_date", "created_at", "id"],
+                condition=models.Q(remainder__gt=0),
+                name="batch_fefo_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
+        from apps.warehouse.stock import apply_remainder_changes
+
         self.unit = self.raw_material.unit
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            stored_remainder = None
+            if not self._state.adding:
+                # The row as it is stored now, locked until the availability is updated: the remainder loaded with
+                # the instance may be stale, e.g. after a reservation or a save of another instance
+                stored_remainder = (
+                    WarehouseBatch.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("raw_material_id", "remainder")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+
+            # The remainder may be assigned as an int or a float, the stock is counted in decimals
+            remainder = self._meta.get_field("remainder").to_python(self.remainder)
+            if stored_remainder is None:
+                changes = [(self.raw_material_id, 0, remainder)]
+            elif stored_remainder[0] == self.raw_material_id:
+                changes = [(self.raw_material_id, stored_remainder[1], remainder)]
+            else:
+                changes = [(stored_remainder[0], stored_remainder[1], 0), (self.raw_material_id, 0, remainder)]
+            # Keep the availability of the raw material in sync in the same transaction
+            apply_remainder_changes(changes)
 
     def __str__(self):
         return f"{self.raw_material.name} - {self.remainder} {self.unit}"
 
 
+class RawMaterialStock(TimeStampedModel):
+    """
+    Availability of a raw material in the warehouse, aggregated over its non-empty batches.
+    It is updated together with the batches, see ``apps.warehouse.stock``.
+    """
+
+    raw_material = models.OneToOneField(RawMaterial, on_delete=models.CASCADE, primary_key=True, related_name="stock")
+    total_remainder = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_("Total remainder"))
+    batches_count = models.PositiveIntegerField(default=0, verbose_name=_("Batches count"))
+    oldest_batch = models.ForeignKey(
+        WarehouseBatch, on_delete=models.SET_NULL, related_name="+", null=True, verbose_name=_("Oldest batch")
+    )
+
+    class Meta:
+        verbose_name = _("Raw Material Stock")
+        verbose_name_plural = _("Raw Material Stocks")
+
+    def __str__(self):
+        return f"{self.raw_material.name} - {self.total_remainder} {self.raw_material.unit}"
+
+
 class Order(TimeStampedModel):
-    user = models.ForeignKey("users.User", on_delete=models.CASCADE, related_name="orders")
+    class AllocationStatus(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        DONE = "done", _("Done")
+        FAILED = "failed", _("Failed")
+
+    # Indexed together with the keyset columns, see Meta.indexes
+    user = models.ForeignKey("users.User", on_delete=models.CASCADE, related_name="orders", db_index=False)
+    materials_reserved = models.BooleanField(default=False, verbose_name=_("Materials reserved"))
+    allocation_status = models.CharField(
+        max_length=10,
+        choices=AllocationStatus.choices,
+        default=AllocationStatus.PENDING,
+        verbose_name=_("Allocation status"),
+    )
+    # Rollups of the allocated materials, written together with them, see apps.warehouse.totals
+    items_count = models.PositiveIntegerField(default=0, verbose_name=_("Items count"))
+    materials_count = models.PositiveIntegerField(default=0, verbose_name=_("Materials count"))
+    shortage_quantity = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name=_("Shortage quantity")
+    )
+    total_cost = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_("Total cost"))
 
     class Meta:
         verbose_name = _("Order")
         verbose_name_plural = _("Orders")
+        indexes = [
+            # Keyset pagination of the orders of a user, see apps.common.pagination
+            models.Index(fields=["user", "created_at", "id"], name="order_user_keyset_idx"),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.user}"
 
-    def calculate_materials(self) -> None:
+    def calculate_materials(
+        self, reserve: bool = False, strategy: Optional[str] = None, items: Optional[list] = None
+    ) -> None:
         """
         Calculates the required materials for each item in the order and creates corresponding OrderItemRawMaterials objects.  # noqa
         This function ensures that the available warehouse batches are appropriately utilized to fulfill the order.
+
+        All candidate warehouse batches are loaded with a single query and consumed in memory, so the number of
+        queries does not depend on the number of items or batches. By default the state of the warehouse is not
+        changed. With ``reserve`` the allocated quantities are taken from the warehouse batches for real; batches are
+        locked in the order of their ids, so concurrent reservations wait for each other instead of deadlocking.
+        Recalculating a reserved order first returns its previous reservation to the warehouse.
+        Batches are consumed in the order of the allocation strategy of each raw material, ``strategy`` overrides it.
+        ``items`` are all items of the order when they are already loaded, so they are not read again.
         """
+        from apps.warehouse.allocation import allocate_orders
 
-        # Delete existing OrderItemRawMaterials related to the current order
-        OrderItemRawMaterials.objects.filter(order_item__order=self).delete()
+        allocate_orders([self], reserve=reserve, strategy=strategy, items=items)
 
-        with transaction.atomic():
-            order_item_raw_materials = []
-            # Create a savepoint to rollback changes of WarehouseBatch model
-            sid = transaction.savepoint()
-            for item in self.items.all():
-                # Iterate over each item in the order to determine required raw materials.
-                for raw_material in item.product.raw_materials.all():
-                    # Calculate the required quantity of the raw material
-                    required_quantity = raw_material.quantity * item.quantity
-                    # Iterate over each available warehouse batch to fulfill the required quantity.
-                    for warehouse_batch in WarehouseBatch.objects.filter(
-                        raw_material=raw_material.raw_material, remainder__gt=0
-                    ).order_by("created_at"):
-
-                        if warehouse_batch.remainder >= required_quantity:
-                            # Sufficient quantity available in the warehouse batch
-                            order_item_raw_materials.append(
-                                OrderItemRawMaterials(
-                                    order_item=item,
-                                    warehouse_batch=warehouse_batch,
-                                    raw_material=raw_material.raw_material,
-                                    quantity=required_quantity,
-                                    unit=warehouse_batch.unit,
-                                    price=warehouse_batch.price,
-                                )
-                            )
-                            warehouse_batch.remainder -= required_quantity
-                            warehouse_batch.save()
-                            required_quantity = 0
-                            # Exit the loop to proceed to the next item.
-                            break
-                        else:
-                            # If required quantity exceeds available stock, allocate remaining quantity from subsequent batches.  # noqa
-                            # If still insufficient, create a new OrderItemRawMaterial without a warehouse batch.
-                            order_item_raw_materials.append(
-                                OrderItemRawMaterials(
-                                    order_item=item,
-                                    warehouse_batch=warehouse_batch,
-                                    raw_material=raw_material.raw_material,
-                                    quantity=warehouse_batch.remainder,
-                                    unit=warehouse_batch.unit,
-                                    price=warehouse_batch.price,
-                                )
-                            )
-                            required_quantity -= warehouse_batch.remainder
-                            warehouse_batch.remainder = 0
-                            warehouse_batch.save()
-
-                    if required_quantity > 0:
-                        # Add remaining required quantity as a new OrderItemRawMaterial with no warehouse batch
-                        order_item_raw_materials.append(
-                            OrderItemRawMaterials(
-                                order_item=item,
-                                raw_material=raw_material.raw_material,
-                                quantity=required_quantity,
-                                unit=raw_material.unit,
-                            )
-                        )
-            # Rollback changes of WarehouseBatch model. We should not change the state of the warehouse
-            transaction.savepoint_rollback(sid)
-
-            # Bulk create the OrderItemRawMaterials for optimized database insertion.
-            OrderItemRawMaterials.objects.bulk_create(order_item_raw_materials)
+    def reallocate_materials(self) -> list:
+        """
+        Recalculates the materials of the added and changed items only, keeping the rows of the other items.
+        Returns the reallocated items, see ``apps.warehouse.allocation.reallocate_order``.
+        """
+        from apps.warehouse.allocation import reallocate_order
+
+        return reallocate_order(self)
 
 
 class OrderItem(TimeStampedModel):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    # Indexed together with the id, see Meta.indexes
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items", db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="order_items")
     quantity = models.PositiveIntegerField(verbose_name=_("Quantity"))
+    # Rollups of the allocated materials of the item, see apps.warehouse.totals
+    materials_count = models.PositiveIntegerField(default=0, verbose_name=_("Materials count"))
+    shortage_quantity = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name=_("Shortage quantity")
+    )
+    total_cost = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_("Total cost"))
 
     class Meta:
         verbose_name = _("Order Item")
         verbose_name_plural = _("Order Items")
+        indexes = [
+            # Items of orders in allocation order
+            models.Index(fields=["order", "id"], name="orderitem_order_idx"),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity}"
 
 
 class OrderItemRawMaterials(TimeStampedModel):
-    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name="raw_materials")
-    warehouse_batch = models.ForeignKey(WarehouseBatch, on_delete=models.CASCADE, related_name="order_items", null=True)
+    # Both foreign keys are indexed in Meta.indexes
+    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name="raw_materials", db_index=False)
+    warehouse_batch = models.ForeignKey(
+        WarehouseBatch, on_delete=models.CASCADE, related_name="order_items", null=True, db_index=False
+    )
     raw_material = models.ForeignKey(RawMaterial, on_delete=models.CASCADE, related_name="order_items")
     quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Quantity"))
     unit = models.CharField(
@@ -184,6 +293,16 @@ class OrderItemRawMaterials(TimeStampedModel):
     class Meta:
         verbose_name = _("Order Item Raw Material")
         verbose_name_plural = _("Order Item Raw Materials")
+        indexes = [
+            # Rows of order items in allocation order
+            models.Index(fields=["order_item", "id"], name="orderitem_material_item_idx"),
+            # Shortage rows have no batch and are never looked up by it
+            models.Index(
+                fields=["warehouse_batch"],
+                condition=models.Q(warehouse_batch__isnull=False),
+                name="orderitem_material_batch_idx",
+            ),
+        ]
 
     def __str__(self):
         return (
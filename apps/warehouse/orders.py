@@ -0,0 +1,41 @@
+from functools import partial
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.warehouse.allocation import allocate_orders
+from apps.warehouse.models import Order, OrderItem
+from apps.warehouse.tasks import allocate_orders_materials
+
+
+def create_orders(
+    user, orders_items: Sequence[Sequence[dict]], reserve: bool = False, strategy: Optional[str] = None
+) -> List[Order]:
+    """
+    Creates an order of the user for every list of item fields (product id and quantity) and allocates their
+    materials. Orders and items are inserted with one query each and allocated together in a single planner run, or
+    by a single background task with ``WAREHOUSE_ASYNC_ALLOCATION``. Product ids must already be validated.
+    """
+    with transaction.atomic():
+        orders = Order.objects.bulk_create([Order(user=user) for _ in orders_items])
+        items = OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product_id=item["product"], quantity=item["quantity"])
+                for order, items in zip(orders, orders_items)
+                for item in items
+            ]
+        )
+        if settings.WAREHOUSE_ASYNC_ALLOCATION:
+            # The worker must see the committed orders
+            transaction.on_commit(
+                partial(
+                    allocate_orders_materials.delay,
+                    [order.id for order in orders],
+                    reserve=reserve,
+                    strategy=strategy,
+                )
+            )
+        else:
+            allocate_orders(orders, reserve=reserve, strategy=strategy, items=items)
+    return orders
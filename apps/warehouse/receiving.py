@@ -0,0 +1,80 @@
+"""
+Receiving of new stock: warehouse batches of a delivery manifest are inserted in chunks, with ``COPY`` on PostgreSQL
+and with bulk inserts elsewhere, and the availability of the raw materials is updated once for the whole manifest.
+
+Bulk inserts bypass ``WarehouseBatch.save``: units of the batches must already be set from their raw materials, see
+``raw_material_units``.
+"""
+import csv
+import io
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from apps.warehouse.models import RawMaterial, WarehouseBatch
+from apps.warehouse.stock import StockDeltas
+
+
+def raw_material_units() -> Dict[int, str]:
+    """
+    Units of all raw materials by id, loaded with a single query.
+    """
+    return dict(RawMaterial.objects.values_list("id", "unit"))
+
+
+def copy_batches(batches: List[WarehouseBatch]) -> None:
+    """
+    Inserts the batches with a single ``COPY ... FROM STDIN`` (PostgreSQL only). Ids are not set on the instances.
+    """
+    fields = [field for field in WarehouseBatch._meta.concrete_fields if not field.primary_key]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for batch in batches:
+        # pre_save sets created_at and updated_at like an insert would; None is written as NULL
+        writer.writerow(
+            [field.get_db_prep_save(field.pre_save(batch, add=True), connection=connection) for field in fields]
+        )
+    buffer.seek(0)
+    quote_name = connection.ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        quote_name(WarehouseBatch._meta.db_table), ", ".join(quote_name(field.column) for field in fields)
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def insert_batches(batches: List[WarehouseBatch]) -> None:
+    if connection.vendor == "postgresql":
+        copy_batches(batches)
+    else:
+        WarehouseBatch.objects.bulk_create(batches)
+
+
+def receive_batches(batches: Iterable[WarehouseBatch]) -> int:
+    """
+    Inserts the batches in chunks of ``WAREHOUSE_IMPORT_CHUNK_SIZE`` and returns their number. The batches are
+    consumed lazily and only the instances of the current chunk are kept. The whole manifest is received in a single
+    transaction and the availability of the raw materials is updated once at the end, from changes summed per raw
+    material.
+    """
+    received = 0
+    chunk = []
+    deltas = StockDeltas()
+
+    def flush():
+        insert_batches(chunk)
+        for batch in chunk:
+            deltas.add(batch.raw_material_id, 0, batch.remainder)
+        chunk.clear()
+
+    with transaction.atomic():
+        for batch in batches:
+            chunk.append(batch)
+            received += 1
+            if len(chunk) >= settings.WAREHOUSE_IMPORT_CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+        deltas.apply()
+    return received
@@ -0,0 +1,141 @@
+"""
+Synthetic warehouse data of a configurable size for benchmarks and query budget tests.
+
+Everything is inserted with bulk inserts in chunks, so seeding works the same on SQLite and PostgreSQL. Bulk inserts
+bypass ``save`` and signals: the availability of the raw materials is rebuilt and the BOM cache is invalidated at the
+end, as the regular code paths would do.
+"""
+import random
+from datetime import timedelta
+from typing import List, NamedTuple
+
+from django.utils import timezone
+
+from apps.users.models import User
+from apps.warehouse.bom import invalidate_bom_cache
+from apps.warehouse.models import (Order, OrderItem, Product, ProductComponent,
+                                   ProductRawMaterial, RawMaterial,
+                                   WarehouseBatch)
+from apps.warehouse.stock import rebuild_stock
+
+BULK_SIZE = 5000
+
+
+class SeedSize(NamedTuple):
+    products: int
+    raw_materials: int
+    # Per product, per raw material and per order
+    bom_lines: int
+    batches: int
+    orders: int
+    items: int
+    # Share of the products which contain one of the previous products as a sub-assembly
+    assemblies: float = 0.1
+
+    @classmethod
+    def scaled(cls, products: int) -> "SeedSize":
+        """
+        A dataset proportional to the number of products.
+        """
+        return cls(
+            products=products, raw_materials=max(products // 2, 1), bom_lines=5, batches=20, orders=products, items=5
+        )
+
+
+class SeededData(NamedTuple):
+    user: User
+    product_ids: List[int]
+    raw_material_ids: List[int]
+    order_ids: List[int]
+
+
+def bulk_create(model, objects, batch_size=BULK_SIZE) -> list:
+    created = []
+    for start in range(0, len(objects), batch_size):
+        end = start + batch_size
+        created.extend(model.objects.bulk_create(objects[start:end]))
+    return created
+
+
+def seed(size: SeedSize, username: str = "seed", random_seed: int = 0) -> SeededData:
+    """
+    Creates a user and the products, raw materials, BOM lines, warehouse batches and orders (not allocated) of the
+    given size. The same random seed creates the same data.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    user = User.objects.create_user(username=username)
+    units = [choice for choice, _ in RawMaterial.UnitChoices.choices]
+    strategies = [choice for choice, _ in RawMaterial.AllocationStrategy.choices]
+
+    raw_materials = bulk_create(
+        RawMaterial,
+        [
+            RawMaterial(
+                name=f"{username}-material-{index}",
+                unit=rng.choice(units),
+                # Most raw materials keep the default strategy
+                allocation_strategy=rng.choice(strategies)
+                if rng.random() < 0.2
+                else RawMaterial.AllocationStrategy.FIFO,
+            )
+            for index in range(size.raw_materials)
+        ],
+    )
+    products = bulk_create(
+        Product, [Product(name=f"{username}-product-{index}", code=f"P{index}") for index in range(size.products)]
+    )
+    bulk_create(
+        ProductRawMaterial,
+        [
+            ProductRawMaterial(
+                product=product,
+                raw_material=raw_material,
+                quantity=rng.randint(1, 1000) / 100,
+                unit=raw_material.unit,
+            )
+            for product in products
+            for raw_material in rng.sample(raw_materials, min(size.bom_lines, len(raw_materials)))
+        ],
+    )
+    # Sub-assemblies only point to earlier products, so there are no cycles
+    bulk_create(
+        ProductComponent,
+        [
+            ProductComponent(product=product, component=products[rng.randrange(index)], quantity=rng.randint(1, 3))
+            for index, product in enumerate(products)
+            if index and rng.random() < size.assemblies
+        ],
+    )
+    bulk_create(
+        WarehouseBatch,
+        [
+            WarehouseBatch(
+                raw_material=raw_material,
+                remainder=rng.randint(0, 10000) / 100,
+                unit=raw_material.unit,
+                price=rng.randint(100, 100000) / 100,
+                expiry_date=(now + timedelta(days=rng.randint(1, 365))).date(),
+            )
+            for raw_material in raw_materials
+            for _ in range(size.batches)
+        ],
+    )
+    orders = bulk_create(Order, [Order(user=user) for _ in range(size.orders)])
+    bulk_create(
+        OrderItem,
+        [
+            OrderItem(order=order, product=product, quantity=rng.randint(1, 10))
+            for order in orders
+            for product in rng.sample(products, min(size.items, len(products)))
+        ],
+    )
+
+    rebuild_stock()
+    invalidate_bom_cache()
+    return SeededData(
+        user=user,
+        product_ids=[product.id for product in products],
+        raw_material_ids=[raw_material.id for raw_material in raw_materials],
+        order_ids=[order.id for order in orders],
+    )
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.warehouse.allocation import release_items
+from apps.warehouse.bom import invalidate_bom_cache
+from apps.warehouse.models import (Order, OrderItem, Product, ProductComponent,
+                                   ProductRawMaterial, RawMaterial,
+                                   WarehouseBatch)
+from apps.warehouse.stock import apply_remainder_changes
+
+
+@receiver(post_delete, sender=WarehouseBatch)
+def remove_deleted_batch_from_stock(sender, instance, **kwargs):
+    # Deletion runs in a transaction, so the stock is updated together with the batch
+    apply_remainder_changes([(instance.raw_material_id, instance.remainder, 0)])
+
+
+@receiver(pre_delete, sender=Order)
+def release_deleted_order(sender, instance, **kwargs):
+    # Also on cascade deletes, e.g. of the user; the reservation would be lost with the rows of the items
+    release_items(OrderItem.objects.filter(order_id=instance.pk).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductRawMaterial)
+@receiver(post_delete, sender=ProductRawMaterial)
+@receiver(post_save, sender=ProductComponent)
+@receiver(post_delete, sender=ProductComponent)
+@receiver(post_save, sender=RawMaterial)
+@receiver(post_delete, sender=RawMaterial)
+def invalidate_bom(sender, instance, **kwargs):
+    invalidate_bom_cache()
@@ -0,0 +1,197 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (Case, Count, DecimalField, F, IntegerField,
+                              OuterRef, Subquery, Sum, Value, When)
+from django.utils import timezone
+
+from apps.warehouse.models import RawMaterial, RawMaterialStock, WarehouseBatch
+
+# A change of a warehouse batch: (raw material id, old remainder, new remainder). New batches have an old remainder
+# of 0 and deleted batches have a new remainder of 0.
+RemainderChange = Tuple[int, Decimal, Decimal]
+
+
+class StockState(NamedTuple):
+    total_remainder: Decimal
+    batches_count: int
+    oldest_batch_id: Optional[int]
+
+
+EMPTY_STOCK = StockState(Decimal(0), 0, None)
+
+STOCK_VERSION_KEY = "stock:version"
+
+
+def get_stock_version() -> Optional[str]:
+    """
+    Returns the current version stamp of the availability of the raw materials, None when the cache is not
+    available. Values cached under a key with the stamp are computed again once the stock changes.
+    """
+    version = cache.get(STOCK_VERSION_KEY)
+    if version is None:
+        cache.add(STOCK_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(STOCK_VERSION_KEY)
+    return version
+
+
+def invalidate_stock_cache() -> None:
+    """
+    Replaces the version stamp right away and once more after the transaction is committed, like
+    ``apps.warehouse.bom.invalidate_bom_cache``.
+    """
+
+    def replace_version():
+        cache.set(STOCK_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+    replace_version()
+    transaction.on_commit(replace_version)
+
+
+def oldest_batch_subquery() -> Subquery:
+    """
+    Id of the oldest non-empty batch of the raw material whose id is the primary key of the outer query.
+    """
+    return Subquery(
+        WarehouseBatch.objects.filter(raw_material_id=OuterRef("pk"), remainder__gt=0)
+        .order_by("created_at", "id")
+        .values("id")[:1]
+    )
+
+
+class StockDeltas:
+    """
+    Differences of the availability of the raw materials summed up per raw material from changes of batches, so
+    their size does not depend on the number of changes. ``apply`` writes and clears them.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.total_deltas: Dict[int, Decimal] = defaultdict(Decimal)
+        self.count_deltas: Dict[int, int] = defaultdict(int)
+        self.refresh_oldest: Set[int] = set()
+
+    def add(self, raw_material_id: int, old_remainder: Decimal, new_remainder: Decimal) -> None:
+        # Only batches with a positive remainder are available
+        old_remainder, new_remainder = max(old_remainder, 0), max(new_remainder, 0)
+        self.total_deltas[raw_material_id] += new_remainder - old_remainder
+        if (old_remainder > 0) != (new_remainder > 0):
+            self.count_deltas[raw_material_id] += 1 if new_remainder > 0 else -1
+            self.refresh_oldest.add(raw_material_id)
+
+    def apply(self) -> None:
+        """
+        Updates availability of the raw materials in place with a single query whatever the number of changes; the
+        oldest batch is looked up again only for raw materials which got a new non-empty batch or lost one. Values
+        cached for the stock are invalidated, see ``get_stock_version``. Must be called in the transaction which
+        changes the batches.
+        """
+        total_deltas, count_deltas, refresh_oldest = self.total_deltas, self.count_deltas, self.refresh_oldest
+        self.clear()
+        raw_material_ids = [
+            raw_material_id
+            for raw_material_id in total_deltas
+            if total_deltas[raw_material_id] or raw_material_id in refresh_oldest
+        ]
+        if not raw_material_ids:
+            return
+
+        # Rows are created on the first stock of a raw material, a missing row can not lose stock
+        new_raw_material_ids = [pk for pk in raw_material_ids if total_deltas[pk] > 0 or count_deltas[pk] > 0]
+        if new_raw_material_ids:
+            RawMaterialStock.objects.bulk_create(
+                [RawMaterialStock(raw_material_id=raw_material_id) for raw_material_id in new_raw_material_ids],
+                ignore_conflicts=True,
+            )
+        RawMaterialStock.objects.filter(pk__in=raw_material_ids).update(
+            total_remainder=F("total_remainder")
+            + Case(
+                *[When(pk=pk, then=Value(total_deltas[pk])) for pk in raw_material_ids],
+                default=Value(Decimal(0)),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            batches_count=F("batches_count")
+            + Case(
+                *[When(pk=pk, then=Value(count_deltas[pk])) for pk in raw_material_ids],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            oldest_batch=Case(When(pk__in=refresh_oldest, then=oldest_batch_subquery()), default=F("oldest_batch")),
+            updated_at=timezone.now(),
+        )
+        invalidate_stock_cache()
+
+
+def apply_remainder_changes(changes: Iterable[RemainderChange]) -> None:
+    """
+    Updates availability of the raw materials with the differences of the changed batches, see ``StockDeltas``.
+    Must be called in the transaction which changes the batches.
+    """
+    deltas = StockDeltas()
+    for raw_material_id, old_remainder, new_remainder in changes:
+        deltas.add(raw_material_id, old_remainder, new_remainder)
+    deltas.apply()
+
+
+def compute_stock() -> Dict[int, StockState]:
+    """
+    Aggregates availability of every raw material from scratch over all warehouse batches.
+    """
+    stock = {raw_material_id: EMPTY_STOCK for raw_material_id in RawMaterial.objects.values_list("id", flat=True)}
+    for raw_material_id, total_remainder, batches_count in (
+        WarehouseBatch.objects.filter(remainder__gt=0)
+        .values("raw_material_id")
+        .annotate(total_remainder=Sum("remainder"), batches_count=Count("id"))
+        .values_list("raw_material_id", "total_remainder", "batches_count")
+    ):
+        stock[raw_material_id] = StockState(total_remainder, batches_count, None)
+    for raw_material_id, oldest_batch_id in (
+        RawMaterial.objects.filter(pk__in=[pk for pk, state in stock.items() if state.batches_count])
+        .annotate(oldest_batch_id=oldest_batch_subquery())
+        .values_list("id", "oldest_batch_id")
+    ):
+        stock[raw_material_id] = stock[raw_material_id]._replace(oldest_batch_id=oldest_batch_id)
+    return stock
+
+
+def rebuild_stock(dry_run: bool = False) -> List[Tuple[int, StockState, StockState]]:
+    """
+    Rebuilds availability of every raw material from scratch and returns the drifted ones as
+    (raw material id, stored state, actual state). With ``dry_run`` nothing is written.
+    """
+    actual = compute_stock()
+    stored = {
+        raw_material_id: StockState(total_remainder, batches_count, oldest_batch_id)
+        for raw_material_id, total_remainder, batches_count, oldest_batch_id in RawMaterialStock.objects.values_list(
+            "raw_material_id", "total_remainder", "batches_count", "oldest_batch_id"
+        )
+    }
+    drift = [
+        (raw_material_id, stored.get(raw_material_id), state)
+        for raw_material_id, state in sorted(actual.items())
+        # A raw material which never had stock has no row
+        if stored.get(raw_material_id, EMPTY_STOCK) != state
+    ]
+    if not dry_run and drift:
+        RawMaterialStock.objects.bulk_create(
+            [
+                RawMaterialStock(
+                    raw_material_id=raw_material_id,
+                    total_remainder=state.total_remainder,
+                    batches_count=state.batches_count,
+                    oldest_batch_id=state.oldest_batch_id,
+                )
+                for raw_material_id, _, state in drift
+            ],
+            update_conflicts=True,
+            unique_fields=["raw_material"],
+            update_fields=["total_remainder", "batches_count", "oldest_batch", "updated_at"],
+        )
+        invalidate_stock_cache()
+    return drift
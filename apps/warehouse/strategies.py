@@ -0,0 +1,63 @@
+"""
+Allocation strategies: the order in which the non-empty batches of a raw material are consumed.
+
+Every strategy declares its ordering twice: as ``order_by`` arguments for loading the batches, matching one of the
+partial indexes of ``WarehouseBatch`` so the candidates are read with an index range scan, and as a sort key for
+batches which are locked in the order of their ids and sorted in memory.
+"""
+import datetime
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from django.db.models import F
+
+from apps.warehouse.models import RawMaterial, WarehouseBatch
+
+
+class AllocationStrategy(NamedTuple):
+    name: str
+    ordering: Tuple[Any, ...]
+    sort_key: Callable[[WarehouseBatch], tuple]
+    index_name: str
+
+
+def _fefo_sort_key(batch: WarehouseBatch) -> tuple:
+    # Batches without an expiry date are used after all expiring ones
+    return batch.expiry_date is None, batch.expiry_date or datetime.date.min, batch.created_at, batch.id
+
+
+STRATEGIES: Dict[str, AllocationStrategy] = {
+    strategy.name: strategy
+    for strategy in [
+        AllocationStrategy(
+            RawMaterial.AllocationStrategy.FIFO,
+            ("created_at", "id"),
+            lambda batch: (batch.created_at, batch.id),
+            "batch_fifo_idx",
+        ),
+        AllocationStrategy(
+            RawMaterial.AllocationStrategy.LIFO,
+            ("-created_at", "-id"),
+            # Negated timestamps keep the key comparable with a plain ascending sort
+            lambda batch: (-batch.created_at.timestamp(), -batch.id),
+            "batch_lifo_idx",
+        ),
+        AllocationStrategy(
+            RawMaterial.AllocationStrategy.CHEAPEST,
+            ("price", "created_at", "id"),
+            lambda batch: (batch.price, batch.created_at, batch.id),
+            "batch_cheapest_idx",
+        ),
+        AllocationStrategy(
+            RawMaterial.AllocationStrategy.FEFO,
+            (F("expiry_date").asc(nulls_last=True), "created_at", "id"),
+            _fefo_sort_key,
+            "batch_fefo_idx",
+        ),
+    ]
+}
+
+DEFAULT_STRATEGY = STRATEGIES[RawMaterial.AllocationStrategy.FIFO]
+
+
+def get_strategy(name: Optional[str]) -> AllocationStrategy:
+    return STRATEGIES.get(name, DEFAULT_STRATEGY)
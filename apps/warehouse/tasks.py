@@ -0,0 +1,68 @@
+from typing import List, Optional
+
+from celery import Task, shared_task
+from django.db import OperationalError, transaction
+
+from apps.warehouse.allocation import allocate_orders
+from apps.warehouse.models import Order
+
+
+class AllocationTask(Task):
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        # Retries are exhausted or the error can not be retried.
+        # Tasks take either a single order id or a list of order ids as the first argument.
+        order_ids = kwargs.get("order_ids", kwargs.get("order_id", args[0] if args else None))
+        if not isinstance(order_ids, list):
+            order_ids = [order_ids]
+        Order.objects.filter(pk__in=order_ids).exclude(allocation_status=Order.AllocationStatus.DONE).update(
+            allocation_status=Order.AllocationStatus.FAILED
+        )
+
+
+@shared_task(
+    base=AllocationTask,
+    acks_late=True,
+    autoretry_for=(OperationalError,),
+    retry_backoff=True,
+    max_retries=5,
+    ignore_result=True,
+)
+def allocate_order_materials(order_id: int, reserve: bool = False, strategy: Optional[str] = None) -> None:
+    """
+    Allocates materials of a created order in the background.
+
+    The order is locked and allocated in a single transaction which also marks it as done, so the task is safe to
+    deliver more than once: a repeated run finds the order done and does nothing. Database lock errors are retried.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().filter(pk=order_id).first()
+        if order is None or order.allocation_status == Order.AllocationStatus.DONE:
+            return
+        allocate_orders([order], reserve=reserve, strategy=strategy)
+
+
+@shared_task(
+    base=AllocationTask,
+    acks_late=True,
+    autoretry_for=(OperationalError,),
+    retry_backoff=True,
+    max_retries=5,
+    ignore_result=True,
+)
+def allocate_orders_materials(order_ids: List[int], reserve: bool = False, strategy: Optional[str] = None) -> None:
+    """
+    Allocates materials of a batch of created orders in the background with a single planner run.
+    Orders which are already done are skipped, so the task is safe to deliver more than once.
+    """
+    with transaction.atomic():
+        pending_order_ids = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids)
+            .exclude(allocation_status=Order.AllocationStatus.DONE)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if pending_order_ids:
+            # Keep the sequence of the batch, it defines the allocation priority
+            pending = set(pending_order_ids)
+            allocate_orders([order_id for order_id in order_ids if order_id in pending], reserve, strategy)
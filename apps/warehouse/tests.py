@@ -1 +1,971 @@
-# Create your tests here.
+import json
+import random
+import re
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.common.testing import QueryBudgetMixin
+from apps.users.models import User
+from apps.warehouse import kernels, urls
+from apps.warehouse.allocation import StockSnapshot, allocate_orders
+from apps.warehouse.bom import (BOMCycleError, BOMLine, LRUCache, explode_bom,
+                                get_bom, get_bom_version, invalidate_bom_cache,
+                                local_bom_cache, subtree_sql)
+from apps.warehouse.buildable import compute_buildable
+from apps.warehouse.models import (Order, OrderItem, OrderItemRawMaterials,
+                                   Product, ProductComponent,
+                                   ProductRawMaterial, RawMaterial,
+                                   RawMaterialStock, WarehouseBatch)
+from apps.warehouse.seeding import SeedSize, seed
+from apps.warehouse.stock import oldest_batch_subquery, rebuild_stock
+from apps.warehouse.strategies import STRATEGIES
+from apps.warehouse.tasks import allocate_order_materials
+
+# URLs with the async read views, for the async variants of the endpoint tests:
+# @override_settings(ROOT_URLCONF="apps.warehouse.tests")
+urlpatterns = [path("api/v1/", include((urls.get_urlpatterns(async_views=True), "warehouse")))]
+
+
+class OrderCalculateMaterialsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material_1 = RawMaterial.objects.create(name="RawMaterial1", unit="m")
+        self.raw_material_2 = RawMaterial.objects.create(name="RawMaterial2", unit="kg")
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material_1, quantity=2)
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material_2, quantity=3)
+
+    def create_order(self, items_count):
+        order = Order.objects.create(user=self.user)
+        for _ in range(items_count):
+            OrderItem.objects.create(order=order, product=self.product, quantity=1)
+        return order
+
+    def count_queries(self, order):
+        with CaptureQueriesContext(connection) as context:
+            order.calculate_materials()
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_items_and_batches(self):
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=1, price=100)
+        small_order = self.create_order(items_count=1)
+        small_order_queries = self.count_queries(small_order)
+
+        for _ in range(20):
+            WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=1, price=100)
+            WarehouseBatch.objects.create(raw_material=self.raw_material_2, remainder=1, price=200)
+        large_order = self.create_order(items_count=10)
+        large_order_queries = self.count_queries(large_order)
+
+        self.assertEqual(small_order_queries, large_order_queries)
+
+    def test_batches_are_consumed_in_fifo_order_without_changing_warehouse(self):
+        batch_1 = WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=3, price=100)
+        batch_2 = WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=10, price=150)
+        order = self.create_order(items_count=2)
+
+        order.calculate_materials()
+
+        rows = list(
+            OrderItemRawMaterials.objects.filter(raw_material=self.raw_material_1)
+            .order_by("id")
+            .values_list("warehouse_batch_id", "quantity", "price")
+        )
+        # 2 items * 2 m: first item takes 2 from batch 1, second takes 1 from batch 1 and 1 from batch 2
+        self.assertEqual(rows, [(batch_1.id, 2, 100), (batch_1.id, 1, 100), (batch_2.id, 1, 150)])
+        # Raw material 2 has no stock, so the whole quantity is added without a batch
+        self.assertEqual(
+            list(
+                OrderItemRawMaterials.objects.filter(raw_material=self.raw_material_2).values_list(
+                    "warehouse_batch_id", "quantity", "unit"
+                )
+            ),
+            [(None, 3, "kg"), (None, 3, "kg")],
+        )
+        batch_1.refresh_from_db()
+        batch_2.refresh_from_db()
+        self.assertEqual(batch_1.remainder, 3)
+        self.assertEqual(batch_2.remainder, 10)
+
+    def test_recalculation_replaces_previous_rows(self):
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=10, price=100)
+        order = self.create_order(items_count=1)
+
+        order.calculate_materials()
+        order.calculate_materials()
+
+        self.assertEqual(OrderItemRawMaterials.objects.filter(order_item__order=order).count(), 2)
+
+    def test_totals_are_stored_with_the_rows(self):
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=3, price=1.1)
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=10, price=150)
+        order = self.create_order(items_count=2)
+        empty_order = Order.objects.create(user=self.user)
+
+        allocate_orders([order, empty_order])
+
+        # Item 1 takes 2 m at 1.1, item 2 takes 1 m at 1.1 and 1 m at 150; 3 kg of raw material 2 are missing each
+        item_1, item_2 = order.items.order_by("id")
+        self.assertEqual(
+            (item_1.materials_count, item_1.shortage_quantity, item_1.total_cost), (2, Decimal(3), Decimal("2.20"))
+        )
+        self.assertEqual(
+            (item_2.materials_count, item_2.shortage_quantity, item_2.total_cost), (3, Decimal(3), Decimal("151.10"))
+        )
+        stored_order = Order.objects.get(pk=order.pk)
+        self.assertEqual(
+            (stored_order.items_count, stored_order.materials_count, stored_order.shortage_quantity),
+            (2, 5, Decimal(6)),
+        )
+        self.assertEqual(stored_order.total_cost, Decimal("153.30"))
+        self.assertEqual((order.items_count, order.total_cost), (2, Decimal("153.30")))
+        empty_order.refresh_from_db()
+        self.assertEqual((empty_order.items_count, empty_order.materials_count, empty_order.total_cost), (0, 0, 0))
+
+        # Recalculation replaces the totals with the ones of the new rows
+        WarehouseBatch.objects.create(raw_material=self.raw_material_2, remainder=100, price=2)
+        order.calculate_materials()
+        stored_order.refresh_from_db()
+        self.assertEqual((stored_order.materials_count, stored_order.shortage_quantity), (5, 0))
+        self.assertEqual(stored_order.total_cost, Decimal("165.30"))
+
+
+class OrderReserveMaterialsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material, quantity=2)
+        self.batch_1 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=3, price=100)
+        self.batch_2 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=10, price=150)
+
+    def create_order(self, quantity):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+        return order
+
+    def assertRemainders(self, remainder_1, remainder_2):
+        self.batch_1.refresh_from_db()
+        self.batch_2.refresh_from_db()
+        self.assertEqual(self.batch_1.remainder, remainder_1)
+        self.assertEqual(self.batch_2.remainder, remainder_2)
+
+    def test_reserve_takes_stock_from_batches(self):
+        order = self.create_order(quantity=2)
+
+        order.calculate_materials(reserve=True)
+
+        self.assertTrue(Order.objects.get(pk=order.pk).materials_reserved)
+        self.assertRemainders(0, 9)
+        # The next order can not be promised the same stock
+        next_order = self.create_order(quantity=5)
+        next_order.calculate_materials(reserve=True)
+        self.assertEqual(
+            list(
+                OrderItemRawMaterials.objects.filter(order_item__order=next_order)
+                .order_by("id")
+                .values_list("warehouse_batch_id", "quantity")
+            ),
+            [(self.batch_2.id, 9), (None, 1)],
+        )
+        self.assertRemainders(0, 0)
+
+    def test_recalculation_returns_previous_reservation(self):
+        order = self.create_order(quantity=2)
+        order.calculate_materials(reserve=True)
+        order.items.update(quantity=1)
+
+        order.calculate_materials(reserve=True)
+        self.assertRemainders(1, 10)
+
+        order.calculate_materials()
+        self.assertRemainders(3, 10)
+        self.assertFalse(Order.objects.get(pk=order.pk).materials_reserved)
+
+
+class OrderReallocateMaterialsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material, quantity=2)
+        self.batch_1 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=5, price=100)
+        self.batch_2 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=20, price=150)
+
+    def create_order(self, quantities):
+        order = Order.objects.create(user=self.user)
+        for quantity in quantities:
+            OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+        return order
+
+    def get_rows(self, order):
+        return list(
+            OrderItemRawMaterials.objects.filter(order_item__order=order)
+            .order_by("order_item_id", "id")
+            .values_list("id", "order_item_id", "warehouse_batch_id", "quantity", "updated_at")
+        )
+
+    def test_only_changed_items_are_reallocated(self):
+        order = self.create_order([1, 1, 1])
+        order.calculate_materials()
+        item_1, item_2, item_3 = order.items.order_by("id")
+        rows = self.get_rows(order)
+        OrderItem.objects.filter(pk=item_2.pk).update(quantity=2)
+
+        self.assertEqual(order.reallocate_materials(), [item_2])
+
+        new_rows = self.get_rows(order)
+        # Rows of the other items are untouched
+        self.assertEqual([row for row in new_rows if row[1] != item_2.id], [row for row in rows if row[1] != item_2.id])
+        # Item 2 gets what is left after items 1 and 3, its row of batch 1 is kept as it is
+        self.assertEqual(
+            [row[2:4] for row in new_rows if row[1] == item_2.id], [(self.batch_1.id, 2), (self.batch_2.id, 2)]
+        )
+        self.assertIn([row for row in rows if row[1] == item_2.id][0], new_rows)
+        self.assertEqual(order.reallocate_materials(), [])
+
+    def test_reallocation_updates_totals(self):
+        order = self.create_order([1, 1, 1])
+        order.calculate_materials()
+        item_1, item_2, item_3 = order.items.order_by("id")
+        OrderItem.objects.filter(pk=item_2.pk).update(quantity=2)
+        item_3.delete()
+
+        order.reallocate_materials()
+
+        # Item 1 takes 2 m at 100, item 2 takes 3 m at 100 and 1 m at 150
+        item_1.refresh_from_db()
+        item_2.refresh_from_db()
+        self.assertEqual((item_1.materials_count, item_1.total_cost), (1, 200))
+        self.assertEqual((item_2.materials_count, item_2.total_cost), (2, 450))
+        stored_order = Order.objects.get(pk=order.pk)
+        self.assertEqual((stored_order.items_count, stored_order.materials_count, stored_order.total_cost), (2, 3, 650))
+        self.assertEqual((order.items_count, order.total_cost), (2, 650))
+
+        # Deleting an item changes only the totals of the order
+        item_2.delete()
+        self.assertEqual(order.reallocate_materials(), [])
+        stored_order.refresh_from_db()
+        self.assertEqual((stored_order.items_count, stored_order.materials_count, stored_order.total_cost), (1, 1, 200))
+
+    def test_reserved_order_takes_only_the_difference(self):
+        order = self.create_order([1, 1])
+        order.calculate_materials(reserve=True)
+        item_1, item_2 = order.items.order_by("id")
+        OrderItem.objects.filter(pk=item_1.pk).update(quantity=3)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1)
+
+        order.reallocate_materials()
+
+        self.batch_1.refresh_from_db()
+        self.batch_2.refresh_from_db()
+        # 5 items * 2 m are reserved in total
+        self.assertEqual((self.batch_1.remainder, self.batch_2.remainder), (0, 15))
+        self.assertEqual(
+            OrderItemRawMaterials.objects.filter(order_item__order=order).aggregate(total=Sum("quantity"))["total"], 10
+        )
+        self.assertTrue(Order.objects.get(pk=order.pk).materials_reserved)
+        self.assertEqual(rebuild_stock(dry_run=True), [])
+
+    def test_query_count_does_not_depend_on_order_size(self):
+        query_counts = []
+        for items_count in [1, 50]:
+            # Every order is allocated from a single batch, so the same rows are written
+            WarehouseBatch.objects.filter(pk=self.batch_1.pk).update(remainder=1000)
+            order = self.create_order([1] * items_count)
+            order.calculate_materials(reserve=True)
+            OrderItem.objects.filter(pk=order.items.order_by("id").first().pk).update(quantity=2)
+            with CaptureQueriesContext(connection) as context:
+                order.reallocate_materials()
+            query_counts.append(len(context.captured_queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_admin_inline_edit_reallocates_order(self):
+        order = self.create_order([1, 1])
+        order.calculate_materials(reserve=True)
+        item_1, item_2 = order.items.order_by("id")
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse("admin:warehouse_order_change", args=[order.pk]),
+            {
+                "user": self.user.pk,
+                "items-TOTAL_FORMS": 2,
+                "items-INITIAL_FORMS": 2,
+                "items-0-id": item_1.pk,
+                "items-0-order": order.pk,
+                "items-0-product": self.product.pk,
+                "items-0-quantity": 4,
+                "items-1-id": item_2.pk,
+                "items-1-order": order.pk,
+                "items-1-product": self.product.pk,
+                "items-1-quantity": 1,
+                "items-1-DELETE": "on",
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        # The reservation of the deleted item is returned, the changed one takes 8 m
+        self.batch_1.refresh_from_db()
+        self.batch_2.refresh_from_db()
+        self.assertEqual((self.batch_1.remainder, self.batch_2.remainder), (0, 17))
+        self.assertEqual(
+            list(OrderItemRawMaterials.objects.filter(order_item__order=order).values_list("order_item_id", flat=True)),
+            [item_1.pk, item_1.pk],
+        )
+        self.assertEqual(rebuild_stock(dry_run=True), [])
+        self.assertEqual(Order.objects.get(pk=order.pk).allocation_status, Order.AllocationStatus.DONE)
+
+    def test_admin_add_allocates_order(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse("admin:warehouse_order_add"),
+            {
+                "user": self.user.pk,
+                "items-TOTAL_FORMS": 1,
+                "items-INITIAL_FORMS": 0,
+                "items-0-product": self.product.pk,
+                "items-0-quantity": 3,
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get()
+        self.assertEqual(order.allocation_status, Order.AllocationStatus.DONE)
+        self.assertEqual((order.items_count, order.materials_count, order.total_cost), (1, 2, 650))
+        self.assertFalse(order.materials_reserved)
+
+    def test_deleting_orders_returns_their_reservations(self):
+        orders = [self.create_order([1, 2]) for _ in range(3)]
+        for order in orders:
+            order.calculate_materials(reserve=True)
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse("admin:warehouse_order_delete", args=[orders[0].pk]), {"post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.batch_1.refresh_from_db()
+        self.batch_2.refresh_from_db()
+        # 6 m of every order are reserved, the first one took 5 m from the first batch
+        self.assertEqual((self.batch_1.remainder, self.batch_2.remainder), (5, 8))
+        self.assertEqual(rebuild_stock(dry_run=True), [])
+
+        # The bulk delete action of the admin and cascades from the user
+        Order.objects.filter(pk=orders[1].pk).delete()
+        self.user.delete()
+        self.batch_1.refresh_from_db()
+        self.batch_2.refresh_from_db()
+        self.assertEqual((self.batch_1.remainder, self.batch_2.remainder), (5, 20))
+        self.assertFalse(OrderItemRawMaterials.objects.exists())
+        self.assertEqual(rebuild_stock(dry_run=True), [])
+
+    def test_reallocation_marks_pending_order_as_allocated(self):
+        order = self.create_order([1])
+        order.calculate_materials()
+        Order.objects.filter(pk=order.pk).update(allocation_status=Order.AllocationStatus.FAILED)
+
+        # Nothing changed, only the status is written
+        self.assertEqual(order.reallocate_materials(), [])
+        self.assertEqual(Order.objects.get(pk=order.pk).allocation_status, Order.AllocationStatus.DONE)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class AllocateOrderMaterialsTaskTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material, quantity=2)
+        self.batch = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=10, price=100)
+        self.order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2)
+
+    def test_repeated_delivery_allocates_once(self):
+        allocate_order_materials.delay(self.order.id, reserve=True)
+        allocate_order_materials.delay(self.order.id, reserve=True)
+
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.remainder, 6)
+        self.assertEqual(OrderItemRawMaterials.objects.filter(order_item__order=self.order).count(), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.allocation_status, Order.AllocationStatus.DONE)
+        self.assertTrue(self.order.materials_reserved)
+
+    def test_failed_allocation_is_reported(self):
+        with mock.patch("apps.warehouse.tasks.allocate_orders", side_effect=ValueError):
+            result = allocate_order_materials.delay(self.order.id)
+
+        self.assertTrue(result.failed())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.allocation_status, Order.AllocationStatus.FAILED)
+        self.assertFalse(OrderItemRawMaterials.objects.exists())
+
+
+class BOMExplosionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material_1 = RawMaterial.objects.create(name="RawMaterial1", unit="m")
+        self.raw_material_2 = RawMaterial.objects.create(name="RawMaterial2", unit="kg")
+        # chair -> 4 legs + seat, seat -> 2 legs; leg -> 0.5 m; seat -> 1 kg
+        self.leg = Product.objects.create(name="Leg", code="Leg")
+        self.seat = Product.objects.create(name="Seat", code="Seat")
+        self.chair = Product.objects.create(name="Chair", code="Chair")
+        ProductRawMaterial.objects.create(product=self.leg, raw_material=self.raw_material_1, quantity="0.5")
+        ProductRawMaterial.objects.create(product=self.seat, raw_material=self.raw_material_2, quantity=1)
+        ProductComponent.objects.create(product=self.seat, component=self.leg, quantity=2)
+        ProductComponent.objects.create(product=self.chair, component=self.leg, quantity=4)
+        ProductComponent.objects.create(product=self.chair, component=self.seat, quantity=1)
+
+    def test_explode_flattens_all_levels(self):
+        with self.assertNumQueries(2):
+            bom = explode_bom([self.chair.id, self.seat.id])
+
+        # Lines of the same raw material are not merged
+        self.assertEqual(
+            bom[self.chair.id],
+            [
+                BOMLine(self.raw_material_1.id, Decimal(2), "m"),
+                BOMLine(self.raw_material_2.id, Decimal(1), "kg"),
+                BOMLine(self.raw_material_1.id, Decimal(1), "m"),
+            ],
+        )
+        self.assertEqual(
+            bom[self.seat.id],
+            [BOMLine(self.raw_material_2.id, Decimal(1), "kg"), BOMLine(self.raw_material_1.id, Decimal(1), "m")],
+        )
+
+    def test_explode_detects_cycles(self):
+        # Bypasses the validation of the admin
+        ProductComponent.objects.create(product=self.leg, component=self.chair, quantity=1)
+
+        with self.assertRaisesMessage(BOMCycleError, "contains itself"):
+            explode_bom([self.chair.id])
+        with self.assertRaises(ValidationError):
+            ProductComponent(product=self.leg, component=self.seat, quantity=1).full_clean()
+
+    def test_calculate_materials_uses_flattened_bom(self):
+        WarehouseBatch.objects.create(raw_material=self.raw_material_1, remainder=100, price=10)
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.chair, quantity=2)
+
+        order.calculate_materials()
+
+        self.assertEqual(
+            list(
+                OrderItemRawMaterials.objects.filter(order_item__order=order)
+                .order_by("id")
+                .values_list("raw_material_id", "quantity")
+            ),
+            [(self.raw_material_1.id, 4), (self.raw_material_2.id, 2), (self.raw_material_1.id, 2)],
+        )
+
+    def test_quantities_are_rounded_after_the_order_quantity(self):
+        # A quarter of a meter per leg, half a leg per bracket
+        bracket = Product.objects.create(name="Bracket", code="Bracket")
+        ProductComponent.objects.create(product=bracket, component=self.leg, quantity="0.5")
+        ProductRawMaterial.objects.filter(product=self.leg).update(quantity="0.25")
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=bracket, quantity=1000)
+
+        self.assertEqual(
+            explode_bom([bracket.id])[bracket.id], [BOMLine(self.raw_material_1.id, Decimal("0.125"), "m")]
+        )
+        order.calculate_materials()
+
+        self.assertEqual(
+            list(OrderItemRawMaterials.objects.filter(order_item__order=order).values_list("quantity", flat=True)),
+            [125],
+        )
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class BOMCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_bom_cache.clear()
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        self.products = [Product.objects.create(name=f"Product{index}", code="ProductCode") for index in range(3)]
+        self.product_raw_materials = [
+            ProductRawMaterial.objects.create(product=product, raw_material=self.raw_material, quantity=index + 1)
+            for index, product in enumerate(self.products)
+        ]
+        self.product_ids = [product.id for product in self.products]
+
+    def test_misses_are_loaded_together_and_cached(self):
+        with self.assertNumQueries(2):
+            bom = get_bom(self.product_ids)
+        self.assertEqual(bom[self.products[2].id], [BOMLine(self.raw_material.id, Decimal(3), "m")])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_bom(self.product_ids), bom)
+        # The per-process layer answers without the shared cache
+        cache.delete_many([f"bom:{get_bom_version()}:{product_id}" for product_id in self.product_ids])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_bom(self.product_ids), bom)
+
+    def test_changes_invalidate_cached_boms(self):
+        get_bom(self.product_ids)
+
+        self.product_raw_materials[0].quantity = 5
+        self.product_raw_materials[0].save()
+
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                get_bom([self.products[0].id]), {self.products[0].id: [BOMLine(self.raw_material.id, 5, "m")]}
+            )
+        self.raw_material.name = "RawMaterial2"
+        self.raw_material.save()
+        with self.assertNumQueries(2):
+            get_bom([self.products[0].id])
+
+    def test_local_cache_keeps_recently_used_entries(self):
+        local_cache = LRUCache(maxsize=2)
+        local_cache.set_many({"a": 1, "b": 2})
+        local_cache.get_many(["a"])
+        local_cache.set_many({"c": 3})
+        self.assertEqual(local_cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+
+
+class AllocationStrategyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material, quantity=1)
+        now = timezone.now()
+        # (days ago created, price, expires in days)
+        self.batches = []
+        for created_days_ago, price, expires_in_days in [(3, 30, None), (2, 10, 20), (1, 20, 10)]:
+            batch = WarehouseBatch.objects.create(
+                raw_material=self.raw_material,
+                remainder=1,
+                price=price,
+                expiry_date=expires_in_days and (now + timedelta(days=expires_in_days)).date(),
+            )
+            WarehouseBatch.objects.filter(pk=batch.pk).update(created_at=now - timedelta(days=created_days_ago))
+            self.batches.append(batch)
+        self.order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=3)
+
+    def get_batch_order(self):
+        return [
+            self.batches.index(row.warehouse_batch)
+            for row in OrderItemRawMaterials.objects.filter(order_item__order=self.order).order_by("id")
+        ]
+
+    def test_strategies_order_batches(self):
+        expected = {
+            RawMaterial.AllocationStrategy.FIFO: [0, 1, 2],
+            RawMaterial.AllocationStrategy.LIFO: [2, 1, 0],
+            RawMaterial.AllocationStrategy.CHEAPEST: [1, 2, 0],
+            RawMaterial.AllocationStrategy.FEFO: [2, 1, 0],
+        }
+        for strategy, batch_order in expected.items():
+            with self.subTest(strategy=strategy):
+                self.order.calculate_materials(strategy=strategy)
+                self.assertEqual(self.get_batch_order(), batch_order)
+                # Locked batches are sorted in memory in the same order
+                self.order.calculate_materials(reserve=True, strategy=strategy)
+                self.assertEqual(self.get_batch_order(), batch_order)
+                self.order.calculate_materials(strategy=strategy)
+
+    def test_raw_material_strategy_is_used_by_default(self):
+        self.raw_material.allocation_strategy = RawMaterial.AllocationStrategy.CHEAPEST
+        self.raw_material.save()
+
+        self.order.calculate_materials()
+        self.assertEqual(self.get_batch_order(), [1, 2, 0])
+
+        self.order.calculate_materials(strategy=RawMaterial.AllocationStrategy.LIFO)
+        self.assertEqual(self.get_batch_order(), [2, 1, 0])
+
+
+class QueryPlanTest(TestCase):
+    """
+    Hot queries of allocation must be answered from indexes. A sequential scan of a table fails the test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        raw_materials = [RawMaterial.objects.create(name=f"RawMaterial{index}", unit="m") for index in range(5)]
+        products = [Product.objects.create(name=f"Product{index}", code="ProductCode") for index in range(5)]
+        for product, raw_material in zip(products, raw_materials):
+            ProductRawMaterial.objects.create(product=product, raw_material=raw_material, quantity=1)
+        ProductComponent.objects.create(product=products[0], component=products[1], quantity=2)
+        WarehouseBatch.objects.bulk_create(
+            [
+                WarehouseBatch(raw_material=raw_material, remainder=index % 3, unit="m", price=index)
+                for index in range(200)
+                for raw_material in raw_materials
+            ]
+        )
+        cls.orders = []
+        for _ in range(20):
+            order = Order.objects.create(user=user)
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1)
+            cls.orders.append(order)
+        allocate_orders(cls.orders, reserve=True)
+        cls.user = user
+        cls.raw_material_ids = [raw_material.id for raw_material in raw_materials]
+        cls.product_ids = [product.id for product in products]
+
+    def assertNoSequentialScan(self, queryset):
+        if connection.vendor == "postgresql":
+            # Small tables are cheaper to scan, only check that an index can be used at all
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            # SQLite reports "SCAN <table>" without an index, PostgreSQL "Seq Scan on <table>"
+            sqlite_scan = re.search(r"\bSCAN (\S+)$", line)
+            if "Seq Scan" in line or (sqlite_scan and sqlite_scan.group(1) != "tree"):
+                self.fail(f"Sequential scan in the plan of {queryset.query}:\n{plan}")
+
+    def test_candidate_batches(self):
+        for strategy in STRATEGIES.values():
+            with self.subTest(strategy=strategy.name):
+                self.assertNoSequentialScan(
+                    WarehouseBatch.objects.filter(raw_material_id__in=self.raw_material_ids, remainder__gt=0).order_by(
+                        "raw_material_id", *strategy.ordering
+                    )
+                )
+        self.assertNoSequentialScan(
+            WarehouseBatch.objects.filter(
+                Q(raw_material_id__in=self.raw_material_ids, remainder__gt=0) | Q(id__in=[1, 2])
+            ).order_by("id")
+        )
+        self.assertNoSequentialScan(
+            RawMaterial.objects.filter(pk__in=self.raw_material_ids).annotate(oldest_batch_id=oldest_batch_subquery())
+        )
+
+    def test_order_items_and_rows(self):
+        order_ids = [order.id for order in self.orders[:3]]
+        self.assertNoSequentialScan(OrderItem.objects.filter(order_id__in=order_ids).order_by("id"))
+        self.assertNoSequentialScan(OrderItem.objects.filter(order_id=order_ids[0], order__user=self.user))
+        self.assertNoSequentialScan(OrderItemRawMaterials.objects.filter(order_item__order_id__in=order_ids))
+        self.assertNoSequentialScan(
+            OrderItemRawMaterials.objects.filter(order_item__order_id__in=order_ids, warehouse_batch__isnull=False)
+            .values("warehouse_batch_id")
+            .annotate(total=Sum("quantity"))
+        )
+        self.assertNoSequentialScan(OrderItemRawMaterials.objects.filter(warehouse_batch_id__in=[1, 2]))
+
+    def test_bom(self):
+        self.assertNoSequentialScan(ProductComponent.objects.filter(product_id__in=subtree_sql(self.product_ids)))
+        self.assertNoSequentialScan(ProductRawMaterial.objects.filter(product_id__in=self.product_ids).order_by("id"))
+
+
+class OrderReserveMaterialsStressTest(TransactionTestCase):
+    def test_concurrent_reservations_do_not_over_allocate(self):
+        stdout = StringIO()
+        call_command("stress_order_reservations", orders=40, workers=4, stdout=stdout)
+        self.assertIn("no over-allocation", stdout.getvalue())
+
+
+@skipIf(kernels.np is None, "NumPy is not installed")
+class VectorizedKernelTest(TestCase):
+    def allocate(self, vectorize, remainders, required_quantities):
+        batches = [
+            WarehouseBatch(id=index, raw_material_id=1, remainder=remainder, price=1)
+            for index, remainder in enumerate(remainders)
+        ]
+        snapshot = StockSnapshot(batches, vectorize=vectorize)
+        takes = []
+        # Several calls on the same snapshot, as the planner does for different orders
+        for chunk_start in range(0, len(required_quantities), 3):
+            chunk_end = chunk_start + 3
+            takes += snapshot.take_many(1, required_quantities[chunk_start:chunk_end])
+        snapshot.sync_remainders()
+        return (
+            [[(batch and batch.id, quantity) for batch, quantity in pieces] for pieces in takes],
+            [batch.remainder for batch in batches],
+        )
+
+    def test_vectorized_kernel_matches_python_kernel(self):
+        random.seed(0)
+        for _ in range(50):
+            remainders = [
+                Decimal(random.choice([0, random.randint(1, 500)])).scaleb(-2)
+                for _ in range(kernels.VECTORIZE_MIN_BATCHES + random.randint(0, 100))
+            ]
+            total = sum(remainders)
+            required_quantities = [
+                random.choice(
+                    [
+                        Decimal(0),
+                        remainders[random.randrange(len(remainders))],
+                        Decimal(random.randint(1, 3000)).scaleb(-2),
+                    ]
+                )
+                for _ in range(random.randint(1, 12))
+            ]
+            if random.random() < 0.3:
+                # Exactly the whole stock
+                required_quantities.append(total)
+
+            self.assertEqual(
+                self.allocate(False, remainders, required_quantities),
+                self.allocate(True, remainders, required_quantities),
+            )
+
+    def test_vectorized_kernel_falls_back_on_fractional_hundredths(self):
+        remainders = [Decimal("1.00")] * kernels.VECTORIZE_MIN_BATCHES
+        required_quantities = [Decimal("1.005"), Decimal("2")]
+
+        self.assertEqual(
+            self.allocate(False, remainders, required_quantities),
+            self.allocate(True, remainders, required_quantities),
+        )
+
+
+class BuildableTest(TestCase):
+    def test_computation_matches_per_product_one(self):
+        seed(SeedSize(products=40, raw_materials=12, bom_lines=4, batches=2, orders=0, items=0, assemblies=0.5))
+        # Some raw materials run out, some BOM lines need nothing
+        WarehouseBatch.objects.filter(raw_material__in=RawMaterial.objects.order_by("id")[:3]).delete()
+        line_ids = list(ProductRawMaterial.objects.order_by("id").values_list("id", flat=True))
+        ProductRawMaterial.objects.filter(pk__in=line_ids[:10:3]).update(quantity=0)
+        invalidate_bom_cache()
+        Product.objects.create(name="Empty", code="EmptyCode")
+
+        buildable = compute_buildable()
+
+        available = dict(RawMaterialStock.objects.values_list("raw_material_id", "total_remainder"))
+        for product in buildable:
+            required = defaultdict(Decimal)
+            for line in explode_bom([product.product_id])[product.product_id]:
+                required[line.raw_material_id] += line.quantity
+            quantities = [int(available.get(pk, 0) // quantity) for pk, quantity in required.items() if quantity > 0]
+            self.assertEqual(product.quantity, min(quantities) if quantities else None, product)
+        self.assertEqual(len(buildable), 41)
+        self.assertIn(0, [product.quantity for product in buildable])
+        self.assertEqual(buildable[-1].quantity, None)
+
+    def test_query_count_does_not_depend_on_products(self):
+        seed(SeedSize(products=5, raw_materials=4, bom_lines=2, batches=1, orders=0, items=0), username="small")
+        with CaptureQueriesContext(connection) as small:
+            compute_buildable()
+        seed(SeedSize(products=50, raw_materials=20, bom_lines=5, batches=2, orders=0, items=0), username="large")
+        with CaptureQueriesContext(connection) as large:
+            compute_buildable()
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class RawMaterialStockTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword",
+        )
+        self.raw_material = RawMaterial.objects.create(name="RawMaterial", unit="m")
+        self.product = Product.objects.create(name="Product", code="ProductCode")
+        ProductRawMaterial.objects.create(product=self.product, raw_material=self.raw_material, quantity=2)
+
+    def assertStock(self, total_remainder, batches_count, oldest_batch):
+        stock = RawMaterialStock.objects.get(raw_material=self.raw_material)
+        self.assertEqual(
+            (stock.total_remainder, stock.batches_count, stock.oldest_batch_id),
+            (total_remainder, batches_count, oldest_batch and oldest_batch.id),
+        )
+
+    def test_stock_follows_batch_changes(self):
+        batch_1 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=3, price=100)
+        batch_2 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=10, price=150)
+        self.assertStock(13, 2, batch_1)
+
+        batch_1 = WarehouseBatch.objects.get(pk=batch_1.pk)
+        batch_1.remainder = 0
+        batch_1.save()
+        self.assertStock(10, 1, batch_2)
+
+        batch_2.delete()
+        self.assertStock(0, 0, None)
+
+    def test_stock_follows_saves_of_stale_instances(self):
+        batch = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=10, price=100)
+        other = WarehouseBatch.objects.get(pk=batch.pk)
+        other.remainder = 4
+        other.save()
+
+        batch.refresh_from_db()
+        batch.remainder = 6
+        batch.save()
+        self.assertStock(6, 1, batch)
+
+        # The remainder loaded with the instance was taken by a reservation in the meantime
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1)
+        order.calculate_materials(reserve=True)
+        batch.remainder = 7
+        batch.save()
+        self.assertStock(7, 1, batch)
+        self.assertEqual(rebuild_stock(dry_run=True), [])
+
+    def test_stock_follows_reservations(self):
+        batch_1 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=3, price=100)
+        batch_2 = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=10, price=150)
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2)
+
+        order.calculate_materials(reserve=True)
+        self.assertStock(9, 1, batch_2)
+
+        order.calculate_materials()
+        self.assertStock(13, 2, batch_1)
+
+    def test_rebuild_stock_reports_and_fixes_drift(self):
+        batch = WarehouseBatch.objects.create(raw_material=self.raw_material, remainder=3, price=100)
+        # Queryset updates bypass the stock
+        WarehouseBatch.objects.filter(pk=batch.pk).update(remainder=5)
+        stdout = StringIO()
+
+        call_command("rebuild_stock", "--dry-run", stdout=stdout)
+        self.assertIn(f"Raw material {self.raw_material.id}: stored total 3.00", stdout.getvalue())
+        self.assertStock(3, 1, batch)
+
+        call_command("rebuild_stock", stdout=stdout)
+        self.assertStock(5, 1, batch)
+        self.assertEqual(rebuild_stock(), [])
+
+
+class SeedWarehouseTest(TestCase):
+    def test_seed(self):
+        size = SeedSize.scaled(20)
+        data = seed(size, username="seed-test")
+
+        self.assertEqual(Product.objects.filter(id__in=data.product_ids).count(), 20)
+        self.assertEqual(ProductRawMaterial.objects.filter(product_id__in=data.product_ids).count(), 20 * 5)
+        self.assertEqual(WarehouseBatch.objects.filter(raw_material_id__in=data.raw_material_ids).count(), 10 * 20)
+        self.assertEqual(OrderItem.objects.filter(order__user=data.user).count(), 20 * 5)
+        # Stock is consistent with the bulk inserted batches and the BOMs have no cycles
+        self.assertEqual(rebuild_stock(), [])
+        explode_bom(data.product_ids)
+
+    def test_seed_command(self):
+        stdout = StringIO()
+        call_command("seed_warehouse", products=10, orders=3, username="seed-test", allocate=True, stdout=stdout)
+        self.assertEqual(Order.objects.filter(user__username="seed-test", allocation_status="done").count(), 3)
+
+    def test_benchmark_command(self):
+        stdout = StringIO()
+        call_command("bench_warehouse", "--products", "10", "--repeat", "2", stdout=stdout)
+        self.assertIn("order-product-materials", stdout.getvalue())
+        self.assertFalse(Product.objects.exists())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class QueryBudgetTest(QueryBudgetMixin, APITestCase):
+    # Queries of each endpoint whatever the size of the data, see QueryBudgetMixin
+    query_budgets = {
+        "product-list": 2,
+        "product-detail": 5,
+        "product-buildable": 4,
+        "order-create": 19,
+        "order-import": 18,
+        "order-plan": 15,
+        "order-list": 2,
+        "order-allocation-status": 1,
+        "order-product-materials": 3,
+        "batch-receive": 6,
+        "stock-list": 2,
+    }
+    small_size = SeedSize(products=3, raw_materials=4, bom_lines=4, batches=1, orders=2, items=1, assemblies=0)
+    large_size = SeedSize(products=60, raw_materials=40, bom_lines=15, batches=10, orders=30, items=15, assemblies=0.5)
+
+    def test_every_endpoint_has_a_budget(self):
+        self.assertEqual(set(self.query_budgets), {pattern.name for pattern in urls.urlpatterns})
+
+    def test_query_count_does_not_grow_with_data(self):
+        small = self.seed(self.small_size, "small")
+        small_queries = self.measure_queries(small)
+        large = self.seed(self.large_size, "large")
+        large_queries = self.measure_queries(large)
+        self.assertQueryBudgets(small_queries, large_queries)
+
+    def seed(self, size, username):
+        data = seed(size, username=username)
+        # Batches are loaded with a query per allocation strategy, both datasets use all of them
+        strategies = RawMaterial.AllocationStrategy.values
+        for index, strategy in enumerate(strategies):
+            raw_material_ids = data.raw_material_ids[index :: len(strategies)]  # noqa: E203
+            RawMaterial.objects.filter(pk__in=raw_material_ids).update(allocation_strategy=strategy)
+        allocate_orders(data.order_ids)
+        return data
+
+    def request(self, url_name, data):
+        # Cold caches are the worst case
+        cache.clear()
+        local_bom_cache.clear()
+        self.client.force_authenticate(user=data.user)
+        product_ids = data.product_ids[-self.large_size.items :]  # noqa: E203
+        items = [{"product": product_id, "quantity": 2} for product_id in product_ids]
+        url = reverse(f"warehouse:{url_name}", kwargs=self.url_kwargs(url_name, data))
+        if url_name == "order-create":
+            return self.client.post(url, {"items": items}, format="json")
+        if url_name == "order-import":
+            lines = "\n".join(json.dumps({"items": items}) for _ in range(3))
+            return self.client.post(url, data=lines.encode(), content_type="application/x-ndjson")
+        if url_name == "order-plan":
+            return self.client.post(url, {"orders": data.order_ids}, format="json")
+        if url_name == "batch-receive":
+            lines = "\n".join(
+                json.dumps({"raw_material": raw_material_id, "remainder": 5, "price": 1})
+                for raw_material_id in data.raw_material_ids
+            )
+            return self.client.post(url, data=lines.encode(), content_type="application/x-ndjson")
+        return self.client.get(url)
+
+    def url_kwargs(self, url_name, data):
+        # Sub-assemblies only point to earlier products, the last product is likely to have the deepest BOM
+        return {
+            "product-detail": {"pk": data.product_ids[-1]},
+            "order-allocation-status": {"pk": data.order_ids[-1]},
+            "order-product-materials": {"order_id": data.order_ids[-1]},
+        }.get(url_name, {})
+
+
+class AsyncViewsLoadTest(TransactionTestCase):
+    def test_load_test_command(self):
+        seed(SeedSize.scaled(4), username="load-test")
+        stdout = StringIO()
+        call_command(
+            "bench_async_views", username="load-test", requests=8, concurrency=4, workers=2, db_latency=0, stdout=stdout
+        )
+        self.assertIn("wsgi:", stdout.getvalue())
+        self.assertIn("asgi:", stdout.getvalue())
+        self.assertEqual(stdout.getvalue().count(", 0 failed"), 2)
@@ -0,0 +1,99 @@
+"""
+Rollups of the allocated materials stored on orders and order items: the number of OrderItemRawMaterials rows, the
+quantity missing from the warehouse and the cost of the materials taken from the warehouse batches.
+
+They are computed in memory from the rows while they are allocated and written in the same transaction, see
+``apps.warehouse.allocation``, so lists of orders read them without aggregating the rows.
+"""
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, NamedTuple, Type
+
+from django.db.models import Case, F, Model, Value, When
+
+from apps.warehouse.models import OrderItem, OrderItemRawMaterials
+
+# Costs are stored with 2 decimal places
+COST_STEP = Decimal("0.01")
+
+
+class ItemTotals(NamedTuple):
+    materials_count: int
+    shortage_quantity: Decimal
+    total_cost: Decimal
+
+
+class OrderTotals(NamedTuple):
+    items_count: int
+    materials_count: int
+    shortage_quantity: Decimal
+    total_cost: Decimal
+
+
+EMPTY_ITEM_TOTALS = ItemTotals(0, Decimal(0), Decimal(0))
+EMPTY_ORDER_TOTALS = OrderTotals(0, 0, Decimal(0), Decimal(0))
+
+
+def row_cost(row: OrderItemRawMaterials) -> Decimal:
+    if row.price is None:
+        # Shortage rows have no batch and no price
+        return Decimal(0)
+    # Prices are floats, their shortest representation is the price which was entered
+    return row.quantity * Decimal(repr(row.price))
+
+
+def item_totals(rows: Iterable[OrderItemRawMaterials]) -> Dict[int, ItemTotals]:
+    """
+    Totals of the order items of the rows by order item id. Items without rows are not included.
+    """
+    counts: Dict[int, int] = defaultdict(int)
+    shortages: Dict[int, Decimal] = defaultdict(Decimal)
+    costs: Dict[int, Decimal] = defaultdict(Decimal)
+    for row in rows:
+        counts[row.order_item_id] += 1
+        if row.warehouse_batch_id is None:
+            shortages[row.order_item_id] += row.quantity
+        costs[row.order_item_id] += row_cost(row)
+    return {
+        item_id: ItemTotals(count, shortages[item_id], costs[item_id].quantize(COST_STEP, rounding=ROUND_HALF_UP))
+        for item_id, count in counts.items()
+    }
+
+
+def order_totals(items: Iterable[OrderItem], totals: Dict[int, ItemTotals]) -> Dict[int, OrderTotals]:
+    """
+    Totals of the orders of the items by order id, summed up from the totals of the items. Orders without items are
+    not included.
+    """
+    result: Dict[int, OrderTotals] = {}
+    for item in items:
+        item_total = totals.get(item.id, EMPTY_ITEM_TOTALS)
+        order_total = result.get(item.order_id, EMPTY_ORDER_TOTALS)
+        result[item.order_id] = OrderTotals(
+            order_total.items_count + 1,
+            order_total.materials_count + item_total.materials_count,
+            order_total.shortage_quantity + item_total.shortage_quantity,
+            order_total.total_cost + item_total.total_cost,
+        )
+    return result
+
+
+def set_totals(instance: Model, totals: NamedTuple) -> None:
+    for field, value in totals._asdict().items():
+        setattr(instance, field, value)
+
+
+def totals_update(model: Type[Model], totals: Dict[int, NamedTuple]) -> dict:
+    """
+    Keyword arguments of ``QuerySet.update`` which write the totals of many rows of the model, given by primary key,
+    with a single query: a CASE over the primary keys per field.
+    """
+    fields = next(iter(totals.values()))._fields
+    return {
+        field: Case(
+            *[When(pk=pk, then=Value(getattr(row_totals, field))) for pk, row_totals in totals.items()],
+            default=F(field),
+            output_field=model._meta.get_field(field),
+        )
+        for field in fields
+    }
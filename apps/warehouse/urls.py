@@ -1,20 +1,54 @@
+from django.conf import settings
 from django.urls import path
 
 from apps.warehouse import api_endpoints
 
 app_name = "warehouse"
 
-urlpatterns = [
-    # product urls
-    path("products/list/", api_endpoints.ProductListAPIView.as_view(), name="product-list"),
-    path("products/detail/<int:pk>/", api_endpoints.ProductDetailAPIView.as_view(), name="product-detail"),
-    # order urls
-    path("orders/create/", api_endpoints.OrderCreateAPIView.as_view(), name="order-create"),
-    path("orders/list/", api_endpoints.OrderListAPIView.as_view(), name="order-list"),
-    path(
-        "orders/product-materials/<int:order_id>/",
-        api_endpoints.OrderProductMaterialListAPIView.as_view(),
-        name="order-product-materials",
-    ),
-    # warehouse batch urls
-]
+
+def get_urlpatterns(async_views: bool) -> list:
+    """
+    With ``async_views`` the read endpoints are served by their async views, see ``WAREHOUSE_ASYNC_VIEWS``.
+    """
+    if async_views:
+        ProductListView = api_endpoints.AsyncProductListAPIView
+        ProductDetailView = api_endpoints.AsyncProductDetailAPIView
+        OrderListView = api_endpoints.AsyncOrderListAPIView
+        OrderProductMaterialListView = api_endpoints.AsyncOrderProductMaterialListAPIView
+    else:
+        ProductListView = api_endpoints.ProductListAPIView
+        ProductDetailView = api_endpoints.ProductDetailAPIView
+        OrderListView = api_endpoints.OrderListAPIView
+        OrderProductMaterialListView = api_endpoints.OrderProductMaterialListAPIView
+
+    return [
+        # product urls
+        path("products/list/", ProductListView.as_view(), name="product-list"),
+        path("products/detail/<int:pk>/", ProductDetailView.as_view(), name="product-detail"),
+        path("products/buildable/", api_endpoints.ProductBuildableListAPIView.as_view(), name="product-buildable"),
+        # order urls
+        path("orders/create/", api_endpoints.OrderCreateAPIView.as_view(), name="order-create"),
+        path("orders/import/", api_endpoints.OrderImportAPIView.as_view(), name="order-import"),
+        path("orders/plan/", api_endpoints.OrderPlanAPIView.as_view(), name="order-plan"),
+        path("orders/list/", OrderListView.as_view(), name="order-list"),
+        path(
+            "orders/allocation-status/<int:pk>/",
+            api_endpoints.OrderAllocationStatusAPIView.as_view(),
+            name="order-allocation-status",
+        ),
+        path(
+            "orders/product-materials/<int:order_id>/",
+            OrderProductMaterialListView.as_view(),
+            name="order-product-materials",
+        ),
+        # warehouse batch urls
+        path(
+            "warehouse-batches/receive/",
+            api_endpoints.WarehouseBatchReceiveAPIView.as_view(),
+            name="batch-receive",
+        ),
+        path("warehouse-batches/stock/", api_endpoints.RawMaterialStockListAPIView.as_view(), name="stock-list"),
+    ]
+
+
+urlpatterns = get_urlpatterns(settings.WAREHOUSE_ASYNC_VIEWS)
@@ -1,7 +1,9 @@
 """
 ASGI config for project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``. Serve it with uvicorn workers and
+``WAREHOUSE_ASYNC_VIEWS=True``, e.g.
+``gunicorn -c core/gunicorn.py -k uvicorn.workers.UvicornWorker core.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -11,6 +13,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.production")
 
 application = get_asgi_application()
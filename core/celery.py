@@ -0,0 +1,16 @@
+"""
+Celery application of the project.
+
+Tasks are discovered in the ``tasks`` modules of the installed apps. Start a worker with
+``celery -A core worker --loglevel=info``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.production")
+
+app = Celery("core")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -12,6 +12,11 @@ urlpatterns = [
 
 urlpatterns += swagger_urlpatterns
 
+if settings.METRICS_ENABLED:
+    from apps.common.metrics import metrics_view
+
+    urlpatterns += [path("metrics", metrics_view, name="metrics")]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)